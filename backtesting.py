@@ -0,0 +1,202 @@
+"""
+HUTANO Rolling-Origin Backtesting
+Scores every forecaster over many forecast origins and hospitals.
+
+A single 80/20 split per model (as in test_all_models_comparison and
+test_xgboost_integration) is one noisy sample. The backtester places a
+series of forecast origins along each hospital's history (expanding or
+sliding training window), forecasts `horizon` days from each, and records
+fold-level metrics in one tidy table. (hospital, model) pairs run in
+parallel worker processes. The direct tree forecasters build their feature
+matrix once per series and reuse it for every fold.
+
+Usage:
+    backtester = HutanoBacktester(['xgboost', 'direct_xgboost', 'prophet'], horizon=30)
+    folds = backtester.run({1: data_1, 2: data_2})
+    print(backtester.summary(folds))
+"""
+import time
+import logging
+import importlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from forecast_metrics import score_arrays, score_forecasts, seasonal_naive_scale
+
+logger = logging.getLogger(__name__)
+
+# model name -> (module, class)
+FORECASTERS = {
+    'xgboost': ('prediction.xgboost_forecasting', 'HutanoXGBoostForecaster'),
+    'random_forest': ('prediction.random_forest_forecasting', 'HutanoRandomForestForecaster'),
+    'prophet': ('prediction.prophet_forecasting', 'HutanoProphetForecaster'),
+    'ensemble': ('prediction.ensemble_forecasting', 'HutanoEnsembleForecaster'),
+    'direct_xgboost': ('direct_forecasting', 'HutanoDirectXGBoostForecaster'),
+    'direct_random_forest': ('direct_forecasting', 'HutanoDirectRandomForestForecaster'),
+}
+
+
+def _forecaster_class(model_name):
+    module_name, class_name = FORECASTERS[model_name]
+    if module_name.startswith('prediction.'):
+        from forecast_runner import setup_django
+        setup_django()
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def _fit_and_forecast(model_name, forecaster_class, hospital_id, data_type, train, horizon):
+    """Train an opaque forecaster on one fold and return yhat for the next `horizon` days."""
+    forecaster = forecaster_class(hospital_id=hospital_id, data_type=data_type)
+    if model_name == 'ensemble':
+        forecaster.train_ensemble(train, validation_split=0.2)
+        return forecaster.generate_ensemble_forecast(train, periods=horizon)['yhat'].to_numpy()
+    if model_name == 'prophet':
+        forecaster.train_model(train)
+        return forecaster.generate_forecast(periods=horizon)['yhat'].to_numpy()[-horizon:]
+    forecaster.train_model(train, tune_hyperparameters=False)
+    return forecaster.generate_forecast(train, periods=horizon)['yhat'].to_numpy()
+
+
+def _backtest_series(model_name, hospital_id, data_type, data, cutoffs, horizon, window, time_budget):
+    """Worker: run every fold of one model on one hospital's series."""
+    forecaster_class = _forecaster_class(model_name)
+    data = data.sort_values('ds').reset_index(drop=True)
+    y = data['y'].to_numpy(dtype=float)
+    dates = data['ds'].to_numpy()
+    direct = model_name.startswith('direct_')
+
+    if direct:
+        # One feature matrix for the whole series; each fold trains on a row subset
+        forecaster = forecaster_class(hospital_id=hospital_id, data_type=data_type, max_horizon=horizon)
+        X, y_matrix, origins = forecaster.build_training_matrix(data)
+        targets = origins + X[:, -1].astype(int)
+        origin_features = forecaster.engine.origin_features(y)
+
+    rows = []
+    task_start = time.perf_counter()
+    for fold, cutoff in enumerate(cutoffs):
+        if time_budget is not None and time.perf_counter() - task_start > time_budget:
+            logger.warning(f"{model_name} on hospital {hospital_id}: time budget reached after {fold} folds")
+            break
+
+        start = 0 if window is None else max(0, cutoff - window)
+        fold_start = time.perf_counter()
+        if direct:
+            mask = (targets < cutoff) & (origins >= start)
+            forecaster.fit_matrix(X[mask], y_matrix[mask])
+            yhat = forecaster.forecast_from_origin(origin_features[cutoff - 1], dates[cutoff - 1], horizon)['yhat'].to_numpy()
+        else:
+            train = data.iloc[start:cutoff].reset_index(drop=True)
+            yhat = _fit_and_forecast(model_name, forecaster_class, hospital_id, data_type, train, horizon)
+
+        rows.append({
+            'hospital_id': hospital_id,
+            'model': model_name,
+            'fold': fold,
+            'origin': pd.Timestamp(dates[cutoff - 1]),
+            'train_size': cutoff - start,
+            'actual': y[cutoff:cutoff + horizon],
+            'yhat': np.asarray(yhat, dtype=float)[:horizon],
+            'scale': seasonal_naive_scale(y[start:cutoff], season=7),
+            'fit_time': time.perf_counter() - fold_start,
+        })
+    return rows
+
+
+class HutanoBacktester:
+    """Rolling-origin evaluation of forecasters across hospitals."""
+
+    def __init__(self, models, data_type='admissions', horizon=30, initial_train=180, step=30,
+                 window='expanding', window_size=None, max_folds=None, time_budget=None, max_workers=None):
+        unknown = set(models) - set(FORECASTERS)
+        if unknown:
+            raise ValueError(f"Unknown models: {sorted(unknown)}")
+        if window not in ('expanding', 'sliding'):
+            raise ValueError(f"Unknown window: {window}")
+
+        self.models = list(models)
+        self.data_type = data_type
+        self.horizon = horizon
+        self.initial_train = initial_train
+        self.step = step
+        self.window_size = (window_size or initial_train) if window == 'sliding' else None
+        self.max_folds = max_folds
+        self.time_budget = time_budget
+        self.max_workers = max_workers
+
+    def cutoffs(self, n):
+        """Training-end indices for each fold; the most recent folds are kept if max_folds is set."""
+        cutoffs = list(range(self.initial_train, n - self.horizon + 1, self.step))
+        if self.max_folds is not None:
+            cutoffs = cutoffs[-self.max_folds:]
+        return cutoffs
+
+    def run(self, series):
+        """
+        Backtest every model on every series ({hospital_id: ds/y frame}).
+
+        Returns one row per (hospital, model, fold) with the fold's origin,
+        training size, fit time, actual and yhat arrays, and RMSE/MAE/MAPE/sMAPE/MASE
+        (MASE scaled by the weekly seasonal naive error on the fold's training window).
+        """
+        tasks = []
+        for hospital_id, data in series.items():
+            cutoffs = self.cutoffs(len(data))
+            if not cutoffs:
+                logger.warning(f"Hospital {hospital_id}: not enough data for a {self.horizon}-day backtest")
+                continue
+            for model_name in self.models:
+                tasks.append((model_name, hospital_id, self.data_type, data, cutoffs,
+                              self.horizon, self.window_size, self.time_budget))
+
+        rows = []
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(_backtest_series, *task): task for task in tasks}
+            for future in as_completed(futures):
+                model_name, hospital_id = futures[future][:2]
+                try:
+                    rows.extend(future.result())
+                except Exception as e:
+                    logger.error(f"Backtest of {model_name} on hospital {hospital_id} failed: {e}")
+
+        folds = pd.DataFrame(rows, columns=['hospital_id', 'model', 'fold', 'origin', 'train_size',
+                                            'actual', 'yhat', 'scale', 'fit_time'])
+        metrics = score_arrays(self._stack(folds['actual']), self._stack(folds['yhat']), scale=folds['scale'])
+        for name in ['rmse', 'mae', 'mape', 'smape', 'mase']:
+            folds[name] = metrics[name]
+        return folds.sort_values(['hospital_id', 'model', 'fold']).reset_index(drop=True)
+
+    def horizon_metrics(self, folds):
+        """Metrics per model and forecast horizon (day 1..horizon), pooled over folds and hospitals."""
+        actual, yhat = self._stack(folds['actual']), self._stack(folds['yhat'])
+        long = pd.DataFrame({
+            'model': np.repeat(folds['model'].to_numpy(), self.horizon),
+            'horizon': np.tile(np.arange(1, self.horizon + 1), len(folds)),
+            'actual': actual.ravel(),
+            'yhat': yhat.ravel(),
+        })
+        return score_forecasts(long, group_cols=['model', 'horizon'])
+
+    @staticmethod
+    def summary(folds):
+        """Mean and spread of fold metrics per model, best RMSE first."""
+        summary = folds.groupby('model').agg(
+            folds=('fold', 'count'),
+            rmse=('rmse', 'mean'),
+            rmse_std=('rmse', 'std'),
+            mae=('mae', 'mean'),
+            mape=('mape', 'mean'),
+            smape=('smape', 'mean'),
+            mase=('mase', 'mean'),
+            fit_time=('fit_time', 'mean'),
+        )
+        return summary.sort_values('rmse')
+
+    def _stack(self, arrays):
+        """Stack per-fold arrays into a (folds, horizon) matrix, NaN-padding short ones."""
+        stacked = np.full((len(arrays), self.horizon), np.nan)
+        for i, values in enumerate(arrays):
+            stacked[i, :len(values)] = values
+        return stacked
@@ -0,0 +1,143 @@
+"""
+HUTANO Capacity Constraints
+Bed occupancy forecasts that respect each hospital's bed capacity.
+
+Occupancy cannot go below zero or above the number of beds, but unconstrained
+Prophet and tree forecasts can do both, and the views used to clip them on
+every page render. Constraints now live in the forecasting layer:
+
+- capacities for all hospitals come from two batch queries: the count of
+  BedAllocation rows per hospital, falling back to Hospital.bed_capacity,
+- Prophet uses logistic growth with the capacity as cap (and a floor),
+- the direct tree forecasters train on a logit-transformed target scaled to
+  (floor, cap) and map predictions back, so forecasts stay inside the bounds,
+- forecasts are clipped once more when they are written, so the stored
+  predictions are already bounded.
+
+Usage:
+    caps = load_bed_capacities()
+    forecast = logistic_prophet_forecast(data, caps[hospital_id], hospital_id, 'bed_occupancy')
+
+    forecaster = HutanoDirectXGBoostForecaster(hospital_id=1, data_type='bed_occupancy',
+                                               bounds=(0, caps[1]))
+"""
+import os
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BED_CAPACITY = 100  # same default as the sample bed occupancy data
+LOGIT_EPS = 1e-3
+
+# data types whose forecasts are bounded by bed capacity
+CAPACITY_BOUNDED = ['bed_occupancy']
+
+
+def load_bed_capacities(hospital_ids=None):
+    """
+    Bed capacity per hospital id: the number of allocated beds where beds
+    are registered, otherwise Hospital.bed_capacity (or DEFAULT_BED_CAPACITY).
+    """
+    from django.db.models import Count
+    from core.models import Hospital, BedAllocation
+
+    hospitals = Hospital.objects.all()
+    allocations = BedAllocation.objects.all()
+    if hospital_ids is not None:
+        hospitals = hospitals.filter(id__in=list(hospital_ids))
+        allocations = allocations.filter(hospital_id__in=list(hospital_ids))
+
+    allocated = dict(allocations.values('hospital_id').annotate(beds=Count('id')).values_list('hospital_id', 'beds'))
+    return {
+        hospital_id: float(allocated.get(hospital_id) or bed_capacity or DEFAULT_BED_CAPACITY)
+        for hospital_id, bed_capacity in hospitals.values_list('id', 'bed_capacity')
+    }
+
+
+class HutanoBoundedTarget:
+    """Logit transform of a target bounded to (floor, cap), for models that cannot bound themselves."""
+
+    def __init__(self, floor, cap):
+        if not cap > floor:
+            raise ValueError(f"cap must exceed floor, got floor={floor}, cap={cap}")
+        self.floor = float(floor)
+        self.cap = float(cap)
+
+    def transform(self, y):
+        share = (np.asarray(y, dtype=float) - self.floor) / (self.cap - self.floor)
+        share = np.clip(share, LOGIT_EPS, 1 - LOGIT_EPS)
+        return np.log(share / (1 - share))
+
+    def inverse(self, z):
+        return self.floor + (self.cap - self.floor) / (1 + np.exp(-np.asarray(z, dtype=float)))
+
+
+def apply_bounds(forecast, cap, floor=0.0):
+    """Copy of a forecast frame with yhat and its interval clipped to [floor, cap]."""
+    forecast = forecast.copy()
+    for column in ('yhat', 'yhat_lower', 'yhat_upper'):
+        if column in forecast:
+            forecast[column] = forecast[column].clip(floor, cap)
+    return forecast
+
+
+def logistic_frame(data, cap, floor=0.0):
+    """ds/y frame with the cap and floor columns Prophet's logistic growth needs."""
+    return data.assign(cap=float(cap), floor=float(floor))
+
+
+def logistic_prophet_forecast(data, cap, hospital_id, data_type, periods=30, floor=0.0):
+    """
+    Fit (through the Prophet model cache) a logistic-growth Prophet model
+    saturating at cap and forecast the next `periods` days. A history above
+    cap raises the cap to the observed maximum; the cap used is in the
+    forecast's cap column, as in Prophet's own logistic forecasts.
+    Returns (model, forecast of the future rows).
+    """
+    from prophet import Prophet
+    from prophet_cache import HutanoProphetCache
+    from prophet_fast import fast_prophet_forecast
+
+    observed_max = float(data['y'].max())
+    if observed_max > cap:
+        logger.warning(f"{data_type} for hospital {hospital_id} reaches {observed_max:.0f}, "
+                       f"above its capacity of {cap:.0f}; using the observed maximum as cap")
+        cap = observed_max
+
+    def make_model():
+        return Prophet(
+            growth='logistic',
+            yearly_seasonality=True,
+            weekly_seasonality=True,
+            daily_seasonality=False,
+            seasonality_mode='additive',
+        )
+
+    model = HutanoProphetCache().fit(make_model, logistic_frame(data, cap, floor), hospital_id, data_type)
+    future = pd.DataFrame({'ds': pd.date_range(model.history['ds'].max() + pd.Timedelta(days=1),
+                                               periods=periods, freq='D')})
+    forecast = fast_prophet_forecast(model, periods=periods, future=logistic_frame(future, cap, floor))
+    return model, apply_bounds(forecast, cap, floor).assign(cap=cap)
+
+
+def save_logistic_plots(model, hospital_id, data_type, periods=30):
+    """Save forecast and components plots of a fitted logistic model to prediction/forecasts."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    history = model.history
+    future = logistic_frame(model.make_future_dataframe(periods=periods),
+                            history['cap'].iloc[-1], history['floor'].iloc[-1])
+    forecast = model.predict(future)
+
+    forecasts_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prediction', 'forecasts')
+    os.makedirs(forecasts_dir, exist_ok=True)
+    model.plot(forecast)
+    plt.savefig(os.path.join(forecasts_dir, f"{data_type}_{hospital_id}_forecast.png"), dpi=300, bbox_inches='tight')
+    model.plot_components(forecast)
+    plt.savefig(os.path.join(forecasts_dir, f"{data_type}_{hospital_id}_components.png"), dpi=300, bbox_inches='tight')
+    plt.close('all')
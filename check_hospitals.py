@@ -20,14 +20,12 @@ for hospital in hospitals:
     print(f"ID: {hospital.id}, Name: {hospital.name}")
 
 # Check data files
-data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prediction', 'data')
-print(f"\nChecking data files in {data_dir}:")
+from series_store import DATA_DIR, list_series
+print(f"\nChecking data files in {DATA_DIR}:")
 
-# List all admissions_*_processed.csv files
-import glob
-data_files = glob.glob(os.path.join(data_dir, "admissions_*_processed.csv"))
-print(f"Found {len(data_files)} data files:")
+# List all stored admissions series
+data_series = list_series('admissions')
+print(f"Found {len(data_series)} data files:")
 
-for file in data_files:
-    filename = os.path.basename(file)
-    print(f"- {filename}")
+for hospital_id, data_type in data_series:
+    print(f"- {data_type} (hospital {hospital_id})")
@@ -12,6 +12,10 @@ django.setup()
 # Import models after Django setup
 from prediction.models import PatientAdmissionPrediction, PredictionModel
 from core.models import Hospital
+from drift_detection import HutanoDriftMonitor
+from series_store import read_series, series_path
+from forecast_runner import ForecastJob, prophet_forecast_job
+from prediction_writer import write_admission_predictions
 
 def check_predictions():
     """Check the current prediction values in the database."""
@@ -78,19 +82,18 @@ def fix_predictions():
             parameters={'seasonality_mode': 'additive', 'horizon': 30}
         )
     
+    # Running statistics of each hospital's admissions series
+    monitor = HutanoDriftMonitor()
+    
     # Process each hospital
     for hospital in hospitals:
         print(f"\nProcessing hospital: {hospital.name} (ID: {hospital.id})")
         
-        # Check if there's a processed data file for this hospital
-        data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prediction', 'data')
-        data_file = os.path.join(data_dir, f"admissions_{hospital.id}_processed.csv")
+        # Load the hospital's processed admissions series, if there is one
+        data = read_series(hospital.id, 'admissions')
         
-        if os.path.exists(data_file):
-            print(f"Found data file: {data_file}")
-            
-            # Load the data
-            data = pd.read_csv(data_file)
+        if data is not None:
+            print(f"Found data file: {series_path(hospital.id, 'admissions')}")
             print(f"Loaded {len(data)} records")
             
             # Check the data values
@@ -103,17 +106,35 @@ def fix_predictions():
             )
             print(f"Found {hospital_predictions.count()} existing predictions for this hospital")
             
-            # Delete existing predictions if they don't match the data
-            if hospital_predictions.exists():
-                first_pred = hospital_predictions.first()
-                if first_pred.predicted_admissions > 30:  # Assuming your data is in the range 5-27
-                    print(f"Existing predictions seem too high (e.g., {first_pred.predicted_admissions})")
-                    print("Deleting existing predictions...")
-                    hospital_predictions.delete()
-                    print(f"Deleted {hospital_predictions.count()} predictions")
+            # Regenerate existing predictions if the data has drifted since they were made
+            # or they fall outside the range the data supports
+            drifted = monitor.update(hospital.id, 'admissions', data)
+            stats = monitor.stats(hospital.id, 'admissions')
+            if stats is not None and stats['reason'] == 'new':
+                # First check of this series: its current data becomes the baseline
+                monitor.mark_retrained(hospital.id, 'admissions')
+                drifted = False
+            if hospital_predictions.exists() and stats is not None:
+                predicted = pd.Series(hospital_predictions.values_list('predicted_admissions', flat=True), dtype=float)
+                out_of_range = abs(predicted.mean() - stats['mean']) > 4 * max(stats['std'], 1.0)
+                if drifted or out_of_range:
+                    reason = stats['reason'] if drifted else 'out of range'
+                    print(f"Existing predictions are stale ({reason}; mean {predicted.mean():.2f} "
+                          f"vs data mean {stats['mean']:.2f})")
+                    print("Regenerating predictions...")
+                    try:
+                        forecast = prophet_forecast_job(ForecastJob(hospital.id, 'admissions'))
+                    except Exception as e:
+                        # Keep the old predictions; the series stays flagged and is retried next run
+                        print(f"Could not regenerate predictions: {e}")
+                        continue
+                    result = write_admission_predictions(hospital, prophet_model, forecast)
+                    monitor.mark_retrained(hospital.id, 'admissions')
+                    print(f"Replaced {result['rows_deleted']} predictions with {result['rows_written']} new ones")
         else:
             print(f"No data file found for hospital {hospital.id}")
     
+    monitor.save()
     print("\nPrediction check and fix completed.")
 
 if __name__ == "__main__":
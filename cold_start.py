@@ -0,0 +1,230 @@
+"""
+HUTANO Cold-Start Forecasting
+Forecasts for new hospitals from the most similar existing hospitals.
+
+A newly registered hospital (pilot sites, the ML demo hospital) has little
+or no history, so per-hospital training fails or overfits. The cold-start
+index stores, for every hospital with a cached model, its profile (bed
+capacity, rural flag, province, staff count, admission scale) and the shape
+of its current forecast divided by its own level. A new hospital is matched
+to its k nearest profiles with one vectorized distance computation, and
+their forecast shapes are blended and rescaled to the new hospital's
+expected level. No model is trained.
+
+The expected level comes from the hospital's own recent data if it has
+any, otherwise from the neighbours' level per bed times its bed capacity.
+
+Usage:
+    index = HutanoColdStartIndex.build('bed_occupancy')
+    forecast = index.forecast(hospital, periods=30)
+
+    python cold_start.py --data-types bed_occupancy medication staff
+"""
+import os
+import time
+import logging
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from forecast_runner import PREDICTION_MODELS, load_processed_data, setup_django
+from hierarchical_forecasting import province_name
+
+logger = logging.getLogger(__name__)
+
+COLD_START_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prediction', 'model_cache')
+PROFILE_FEATURES = ['bed_capacity', 'is_rural', 'staff_count', 'admission_scale']
+FEATURE_WEIGHTS = np.array([1.0, 1.0, 0.5, 1.0])
+PROVINCE_WEIGHT = 0.5
+LEVEL_WINDOW = 30
+
+
+def _level(y):
+    """Mean of the last LEVEL_WINDOW values, or NaN for no data."""
+    y = np.asarray(y, dtype=float)[-LEVEL_WINDOW:]
+    return float(np.nanmean(y)) if len(y) else np.nan
+
+
+def hospital_profile(hospital):
+    """Profile vector and province of a Hospital instance."""
+    admissions = load_processed_data(hospital.id, 'admissions')
+    return np.array([
+        hospital.bed_capacity or np.nan,
+        float(bool(hospital.is_rural)),
+        hospital.staff_count or np.nan,
+        _level(admissions['y']) if admissions is not None else np.nan,
+    ], dtype=float), province_name(hospital.province)
+
+
+def donor_forecast(hospital_id, data_type, periods):
+    """Current forecast of an existing hospital without fitting: cached Prophet model, else last week repeated."""
+    try:
+        from prophet_cache import HutanoProphetCache
+        forecast = HutanoProphetCache().forecast(hospital_id, data_type, periods=periods)
+        if forecast is not None:
+            return forecast['yhat'].to_numpy(dtype=float)
+    except ImportError:
+        pass
+
+    data = load_processed_data(hospital_id, data_type)
+    if data is None or len(data) < 7:
+        return None
+    last_week = data.sort_values('ds')['y'].to_numpy(dtype=float)[-7:]
+    return np.resize(last_week, periods)
+
+
+class HutanoColdStartIndex:
+    """Profiles and normalized forecast shapes of existing hospitals for k-NN lookups."""
+
+    def __init__(self, data_type, hospital_ids, profiles, provinces, shapes, levels, k=5):
+        self.data_type = data_type
+        self.hospital_ids = np.asarray(hospital_ids)
+        self.profiles = np.asarray(profiles, dtype=float)
+        self.provinces = np.asarray(provinces)
+        self.shapes = np.asarray(shapes, dtype=float)
+        self.levels = np.asarray(levels, dtype=float)
+        self.k = k
+
+        # Standardize features so bed counts and flags contribute comparably
+        self.center = np.nanmean(self.profiles, axis=0)
+        scale = np.nanstd(self.profiles, axis=0)
+        self.scale = np.where(scale > 0, scale, 1.0)
+
+    @classmethod
+    def build(cls, data_type, periods=90, k=5):
+        """Index every hospital that has a forecastable history for data_type."""
+        setup_django()
+        from core.models import Hospital
+
+        start_time = time.perf_counter()
+        ids, profiles, provinces, shapes, levels = [], [], [], [], []
+        for hospital in Hospital.objects.all():
+            data = load_processed_data(hospital.id, data_type)
+            forecast = donor_forecast(hospital.id, data_type, periods)
+            if data is None or forecast is None:
+                continue
+            level = _level(data.sort_values('ds')['y'])
+            if not level > 0:
+                continue
+            profile, province = hospital_profile(hospital)
+            ids.append(hospital.id)
+            profiles.append(profile)
+            provinces.append(province)
+            shapes.append(forecast / level)
+            levels.append(level)
+
+        if not ids:
+            raise ValueError(f"No hospitals with {data_type} history to build a cold-start index")
+
+        logger.info(f"Built {data_type} cold-start index of {len(ids)} hospitals "
+                    f"in {time.perf_counter() - start_time:.1f}s")
+        return cls(data_type, ids, profiles, provinces, shapes, levels, k=k)
+
+    @staticmethod
+    def _path(data_type, cache_dir=COLD_START_DIR):
+        return os.path.join(cache_dir, f"cold_start_{data_type}.npz")
+
+    def save(self, cache_dir=COLD_START_DIR):
+        os.makedirs(cache_dir, exist_ok=True)
+        np.savez(self._path(self.data_type, cache_dir), hospital_ids=self.hospital_ids, profiles=self.profiles,
+                 provinces=self.provinces, shapes=self.shapes, levels=self.levels, k=self.k)
+
+    @classmethod
+    def load(cls, data_type, cache_dir=COLD_START_DIR):
+        """Saved index for data_type, or None."""
+        try:
+            with np.load(cls._path(data_type, cache_dir)) as stored:
+                return cls(data_type, stored['hospital_ids'], stored['profiles'], stored['provinces'],
+                           stored['shapes'], stored['levels'], k=int(stored['k']))
+        except FileNotFoundError:
+            return None
+
+    def neighbours(self, profile, province, exclude_id=None):
+        """
+        Indices and weights of the k nearest indexed hospitals to one profile.
+        Raises ValueError if no hospital other than exclude_id is indexed.
+        """
+        z_index = (self.profiles - self.center) / self.scale
+        z_query = (np.asarray(profile, dtype=float) - self.center) / self.scale
+
+        # Weighted squared distance over the features both sides have
+        squared = FEATURE_WEIGHTS * (z_index - z_query) ** 2
+        known = ~np.isnan(squared)
+        distance = np.sqrt(np.where(known, squared, 0).sum(axis=1) / np.maximum(known.sum(axis=1), 1)
+                           + PROVINCE_WEIGHT * (self.provinces != province))
+        if exclude_id is not None:
+            distance[self.hospital_ids == exclude_id] = np.inf
+
+        k = min(self.k, int(np.isfinite(distance).sum()))
+        if k == 0:
+            # E.g. the first hospital of a fresh install, indexed on its own
+            raise ValueError(f"The {self.data_type} cold-start index has no other hospitals to borrow from")
+        nearest = np.argpartition(distance, k - 1)[:k]
+        weights = 1.0 / (distance[nearest] + 1e-6)
+        return nearest, weights / weights.sum()
+
+    def forecast(self, hospital, periods=30, start_date=None):
+        """
+        Cold-start forecast for a Hospital: blended neighbour shape times the
+        expected level. Returns ds, yhat, yhat_lower, yhat_upper (the
+        spread of the neighbours' scaled forecasts) and the neighbour ids.
+        """
+        if periods > self.shapes.shape[1]:
+            raise ValueError(f"periods={periods} exceeds the indexed horizon of {self.shapes.shape[1]} days")
+
+        profile, province = hospital_profile(hospital)
+        nearest, weights = self.neighbours(profile, province, exclude_id=hospital.id)
+
+        own = load_processed_data(hospital.id, self.data_type)
+        level = _level(own.sort_values('ds')['y']) if own is not None else np.nan
+        if not level > 0:
+            # Neighbours' level per bed, scaled to this hospital's capacity
+            per_bed = self.levels[nearest] / self.profiles[nearest, 0]
+            usable = np.isfinite(per_bed)
+            if profile[0] > 0 and usable.any():
+                level = np.average(per_bed[usable], weights=weights[usable]) * profile[0]
+            else:
+                level = weights @ self.levels[nearest]
+
+        scaled = self.shapes[nearest, :periods] * level
+        if start_date is None:
+            start_date = own['ds'].max() + pd.Timedelta(days=1) if own is not None else pd.Timestamp.now().normalize()
+
+        return pd.DataFrame({
+            'ds': pd.date_range(start_date, periods=periods, freq='D'),
+            'yhat': weights @ scaled,
+            'yhat_lower': scaled.min(axis=0),
+            'yhat_upper': scaled.max(axis=0),
+        }), self.hospital_ids[nearest].tolist()
+
+
+def cold_start_forecast(hospital, data_type, periods=30, rebuild=False):
+    """Forecast for a new hospital using the saved index, building it on first use."""
+    index = None if rebuild else HutanoColdStartIndex.load(data_type)
+    if index is None:
+        index = HutanoColdStartIndex.build(data_type)
+        index.save()
+    return index.forecast(hospital, periods=periods)
+
+
+def main():
+    """Rebuild the cold-start indexes (e.g. after the nightly forecasts)."""
+    parser = argparse.ArgumentParser(description="Build HUTANO cold-start indexes")
+    parser.add_argument('--data-types', nargs='+', default=list(PREDICTION_MODELS),
+                        choices=list(PREDICTION_MODELS))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    for data_type in args.data_types:
+        try:
+            index = HutanoColdStartIndex.build(data_type)
+        except ValueError as e:
+            print(e)
+            continue
+        index.save()
+        print(f"{data_type}: indexed {len(index.hospital_ids)} hospitals")
+
+
+if __name__ == "__main__":
+    main()
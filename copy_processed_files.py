@@ -2,10 +2,11 @@
 Script to copy processed data files to the prediction data directory.
 """
 import os
-import shutil
+
+from series_store import DATA_DIR, series_exists, series_path
 
 # Source directory (where the processed files are)
-source_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prediction', 'data')
+source_dir = DATA_DIR
 
 # Ensure the source directory exists
 os.makedirs(source_dir, exist_ok=True)
@@ -15,10 +16,10 @@ hospital_ids = range(1, 33)  # 1 through 32
 
 # Copy files for each hospital
 for hospital_id in hospital_ids:
-    source_file = os.path.join(source_dir, f'admissions_{hospital_id}_processed.csv')
+    source_file = series_path(hospital_id, 'admissions')
     
-    # Check if the source file exists
-    if os.path.exists(source_file):
+    # Check if the series exists (as a partition or a not yet converted CSV)
+    if series_exists(hospital_id, 'admissions'):
         print(f"File exists: {source_file}")
     else:
         print(f"File does not exist: {source_file}")
@@ -0,0 +1,358 @@
+"""
+HUTANO Direct Multi-Horizon Forecasting
+Tree forecasters that predict a whole horizon in one batched call.
+
+The recursive HutanoXGBoostForecaster predicts one day at a time and rebuilds
+its lag features after every step, so cost grows with the horizon and errors
+compound. The direct strategy trains a single model with the forecast
+horizon as a feature: every training row pairs the features known at an
+origin day with the value h days later. A 30- or 90-day forecast is then
+one predict call over a precomputed feature matrix.
+
+Features come from the shared HutanoFeatureEngine, so the XGBoost and
+Random Forest variants see exactly the same inputs.
+
+Usage:
+    forecaster = HutanoDirectXGBoostForecaster(hospital_id=1, data_type='admissions', max_horizon=90)
+    forecaster.train_model(data)
+    forecast = forecaster.generate_forecast(data, periods=90)
+
+    # Recursive mode for comparison
+    recursive = HutanoDirectXGBoostForecaster(hospital_id=1, strategy='recursive')
+
+    # Next day: fold in the new rows instead of retraining on the whole history
+    forecaster.update_model(data_with_new_day)
+
+    # 80% prediction intervals (yhat_lower / yhat_upper columns)
+    forecaster = HutanoDirectRandomForestForecaster(hospital_id=1, interval_width=0.8)
+
+    # Forecasts bounded to (floor, cap), e.g. bed occupancy within bed capacity
+    forecaster = HutanoDirectXGBoostForecaster(hospital_id=1, data_type='bed_occupancy', bounds=(0, 200))
+"""
+import time
+import logging
+import importlib
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.ensemble import RandomForestRegressor
+
+from capacity_constraints import HutanoBoundedTarget, apply_bounds
+from feature_engine import HutanoFeatureEngine
+from hyperparameter_tuning import HutanoHyperparameterTuner
+
+logger = logging.getLogger(__name__)
+
+
+class HutanoDirectForecaster:
+    """Base class for direct (horizon-as-feature) multi-step tree forecasters."""
+
+    model_name = None
+    recursive_class = None  # (module, class) of the existing step-by-step forecaster
+    DEFAULT_PARAMS = {}
+    PARAM_SPACE = {}  # sampled by HutanoHyperparameterTuner
+    TUNING_BUDGET = 300  # seconds per hospital for tune_hyperparameters=True
+    FULL_RETRAIN_DAYS = 28  # days of new data after which update_model retrains from scratch
+    RECENT_DAYS = 90  # target window used by incremental updates that refit on recent data
+
+    def __init__(self, hospital_id=None, data_type='admissions', max_horizon=30, strategy='direct',
+                 interval_width=None, bounds=None):
+        if strategy not in ('direct', 'recursive'):
+            raise ValueError(f"Unknown strategy: {strategy}")
+        if interval_width is not None and not 0 < interval_width < 1:
+            raise ValueError(f"interval_width must be between 0 and 1, got {interval_width}")
+
+        self.hospital_id = hospital_id
+        self.data_type = data_type
+        self.max_horizon = max_horizon
+        self.strategy = strategy
+        self.interval_width = interval_width
+        # Bounded targets are learned on a logit scale; predictions are mapped back in forecast_from_origin
+        self.bounded = HutanoBoundedTarget(*bounds) if bounds is not None else None
+        self.params = dict(self.DEFAULT_PARAMS)
+        self.engine = HutanoFeatureEngine()
+        self.model = None
+        self.feature_names = None
+        self.feature_importance = None
+        self.training_time = None
+        self.trained_until = None
+        self.last_full_train = None
+        self._recursive = None
+
+    def _recursive_forecaster(self):
+        """The existing step-by-step forecaster, used when strategy='recursive'."""
+        if self._recursive is None:
+            module_name, class_name = self.recursive_class
+            forecaster_class = getattr(importlib.import_module(module_name), class_name)
+            self._recursive = forecaster_class(hospital_id=self.hospital_id, data_type=self.data_type)
+        return self._recursive
+
+    def _fit(self, X, y, params):
+        raise NotImplementedError
+
+    def _update(self, X, y, target_dates):
+        """Extend the fitted model from (origin, horizon) rows of recent history."""
+        raise NotImplementedError
+
+    @property
+    def quantiles(self):
+        """(lower, median, upper) quantile levels for interval_width."""
+        tail = (1 - self.interval_width) / 2
+        return np.array([tail, 0.5, 1 - tail])
+
+    def predict(self, X, model=None):
+        """Point predictions for a feature matrix."""
+        return (model or self.model).predict(X)
+
+    def predict_interval(self, X):
+        """(lower, upper) prediction bounds for a feature matrix."""
+        raise NotImplementedError
+
+    def build_training_matrix(self, data):
+        """Stack (origin, horizon) pairs into one float32 training matrix."""
+        data = data.sort_values('ds').reset_index(drop=True)
+        y = data['y'].to_numpy(dtype=float)
+        n = len(y)
+
+        origin = self.engine.origin_features(y)
+        calendar = self.engine.calendar_features(data['ds'])
+        valid = np.flatnonzero(~np.isnan(origin).any(axis=1))
+
+        horizons = np.arange(1, self.max_horizon + 1)
+        origins = np.repeat(valid, len(horizons))
+        steps = np.tile(horizons, len(valid))
+        keep = origins + steps < n
+        origins, steps = origins[keep], steps[keep]
+        if len(origins) == 0:
+            raise ValueError(f"Need more than {self.engine.max_window} days of data to train")
+
+        X = np.hstack([
+            origin[origins],
+            calendar[origins + steps],
+            steps[:, None].astype(np.float32),
+        ])
+        self.feature_names = self.engine.origin_feature_names + self.engine.calendar_feature_names + ['horizon']
+        targets = y[origins + steps]
+        if self.bounded is not None:
+            targets = self.bounded.transform(targets)
+        return X, targets, origins
+
+    def train_model(self, train_data, tune_hyperparameters=False):
+        """Train the forecaster on a ds/y frame."""
+        if self.strategy == 'recursive':
+            return self._recursive_forecaster().train_model(train_data, tune_hyperparameters=tune_hyperparameters)
+
+        start_time = time.perf_counter()
+        X, y, origins = self.build_training_matrix(train_data)
+        if tune_hyperparameters:
+            self.params = HutanoHyperparameterTuner(self, time_budget=self.TUNING_BUDGET).tune(X, y, origins)
+
+        self.fit_matrix(X, y)
+        self.training_time = time.perf_counter() - start_time
+        self.trained_until = self.last_full_train = pd.Timestamp(train_data['ds'].max())
+
+        logger.info(f"Trained direct {self.model_name} on {len(y)} (origin, horizon) rows "
+                    f"in {self.training_time:.2f}s")
+        return self.model
+
+    def needs_full_retrain(self, last_date, drift_detected=False):
+        """A full retrain is due with no model, on drift, or FULL_RETRAIN_DAYS after the last one."""
+        if self.model is None or self.trained_until is None or drift_detected:
+            return True
+        return (pd.Timestamp(last_date) - self.last_full_train).days >= self.FULL_RETRAIN_DAYS
+
+    def update_model(self, train_data, drift_detected=False):
+        """
+        Bring the model up to date with train_data (the full history including
+        newly arrived days). Only the recent tail of the series is turned into
+        training rows and passed to _update, so a daily update costs in
+        proportion to the new data rather than the whole history. Falls back
+        to train_model on schedule or when drift_detected is set.
+
+        Returns 'full', 'incremental' or 'unchanged'.
+        """
+        if self.strategy == 'recursive':
+            self._recursive_forecaster().train_model(train_data, tune_hyperparameters=False)
+            return 'full'
+
+        data = train_data.sort_values('ds').reset_index(drop=True)
+        last_date = pd.Timestamp(data['ds'].iloc[-1])
+        if self.needs_full_retrain(last_date, drift_detected):
+            self.train_model(data)
+            return 'full'
+        if last_date <= self.trained_until:
+            return 'unchanged'
+
+        start_time = time.perf_counter()
+        # Enough history for the features of every origin that can reach the recent targets
+        new_days = int((data['ds'] > self.trained_until).sum())
+        tail = data.iloc[-(self.engine.max_window + self.max_horizon + self.RECENT_DAYS + new_days):]
+        tail = tail.reset_index(drop=True)
+        X, y, origins = self.build_training_matrix(tail)
+        target_dates = tail['ds'].to_numpy()[origins + X[:, -1].astype(int)]
+
+        self._update(X, y, target_dates)
+        self._refresh_importance()
+        self.trained_until = last_date
+        self.training_time = time.perf_counter() - start_time
+        logger.info(f"Updated direct {self.model_name} with {new_days} new days in {self.training_time:.2f}s")
+        return 'incremental'
+
+    def fit_matrix(self, X, y):
+        """Fit on rows of a prebuilt training matrix (e.g. one backtest fold)."""
+        self.model = self._fit(X, y, self.params)
+        self._refresh_importance()
+        return self.model
+
+    def _refresh_importance(self):
+        self.feature_importance = pd.DataFrame({
+            'feature': self.feature_names,
+            'importance': self.model.feature_importances_,
+        }).sort_values('importance', ascending=False).reset_index(drop=True)
+
+    def horizon_matrix(self, origin, last_date, periods):
+        """Feature matrix for horizons 1..periods from one origin feature row."""
+        future_dates = pd.date_range(pd.Timestamp(last_date) + pd.Timedelta(days=1), periods=periods, freq='D')
+        X = np.hstack([
+            np.repeat(np.atleast_2d(origin), periods, axis=0),
+            self.engine.calendar_features(future_dates),
+            np.arange(1, periods + 1, dtype=np.float32)[:, None],
+        ])
+        return X, future_dates
+
+    def build_forecast_matrix(self, history, periods):
+        """Feature matrix for horizons 1..periods from the last day of history."""
+        history = history.sort_values('ds').reset_index(drop=True)
+        y = history['y'].to_numpy(dtype=float)
+        origin = self.engine.origin_features(y, rows=[len(y) - 1])
+        return self.horizon_matrix(origin, history['ds'].iloc[-1], periods)
+
+    def forecast_from_origin(self, origin, last_date, periods):
+        """Forecast from a precomputed origin feature row with one predict call."""
+        if self.model is None:
+            raise ValueError("Model has not been trained. Call train_model first.")
+        if periods > self.max_horizon:
+            raise ValueError(f"periods={periods} exceeds max_horizon={self.max_horizon}")
+
+        X, future_dates = self.horizon_matrix(origin, last_date, periods)
+        forecast = pd.DataFrame({'ds': future_dates, 'yhat': self.predict(X)})
+        if self.interval_width is not None:
+            forecast['yhat_lower'], forecast['yhat_upper'] = self.predict_interval(X)
+        if self.bounded is not None:
+            for column in forecast.columns.drop('ds'):
+                forecast[column] = self.bounded.inverse(forecast[column])
+        return forecast
+
+    def generate_forecast(self, train_data, periods=30):
+        """Forecast the next `periods` days after train_data."""
+        if self.strategy == 'recursive':
+            forecast = self._recursive_forecaster().generate_forecast(train_data, periods=periods)
+            if self.bounded is not None:
+                # The recursive forecasters train on the raw target, so bound their output instead
+                forecast = apply_bounds(forecast, self.bounded.cap, self.bounded.floor)
+            return forecast
+
+        history = train_data.sort_values('ds').reset_index(drop=True)
+        origin = self.engine.origin_features(history['y'].to_numpy(dtype=float), rows=[len(history) - 1])
+        return self.forecast_from_origin(origin, history['ds'].iloc[-1], periods)
+
+
+class HutanoDirectXGBoostForecaster(HutanoDirectForecaster):
+    """XGBoost forecaster with a direct multi-step strategy."""
+
+    model_name = 'XGBoost'
+    recursive_class = ('prediction.xgboost_forecasting', 'HutanoXGBoostForecaster')
+    DEFAULT_PARAMS = {
+        'n_estimators': 300,
+        'max_depth': 6,
+        'learning_rate': 0.05,
+        'subsample': 0.8,
+        'colsample_bytree': 0.8,
+    }
+    PARAM_SPACE = {
+        'max_depth': (3, 8),
+        'learning_rate': (0.02, 0.3, 'log'),
+        'subsample': (0.6, 1.0),
+        'colsample_bytree': (0.6, 1.0),
+        'min_child_weight': (1, 10),
+    }
+
+    UPDATE_ROUNDS = 20  # boosting rounds added per incremental update
+
+    def _regressor(self, params):
+        """XGBRegressor for params; with interval_width, one multi-quantile model (lower, median, upper)."""
+        if self.interval_width is None:
+            return xgb.XGBRegressor(objective='reg:squarederror', random_state=42, **{'n_jobs': -1, **params})
+        return xgb.XGBRegressor(objective='reg:quantileerror', quantile_alpha=self.quantiles,
+                                random_state=42, **{'n_jobs': -1, **params})
+
+    def _fit(self, X, y, params):
+        model = self._regressor(params)
+        model.fit(X, y)
+        return model
+
+    def predict(self, X, model=None):
+        predictions = (model or self.model).predict(X)
+        return predictions[:, 1] if predictions.ndim == 2 else predictions
+
+    def predict_interval(self, X):
+        predictions = self.model.predict(X)
+        # Quantile models can cross; sort so lower <= median <= upper
+        predictions = np.sort(predictions, axis=1)
+        return predictions[:, 0], predictions[:, 2]
+
+    def _update(self, X, y, target_dates):
+        # Continue boosting from the current booster on the rows it has not seen
+        new = target_dates > np.datetime64(self.trained_until)
+        if not new.any():
+            return
+        model = self._regressor({**self.params, 'n_estimators': self.UPDATE_ROUNDS})
+        model.fit(X[new], y[new], xgb_model=self.model.get_booster())
+        self.model = model
+
+
+class HutanoDirectRandomForestForecaster(HutanoDirectForecaster):
+    """Random Forest forecaster with a direct multi-step strategy."""
+
+    model_name = 'Random Forest'
+    recursive_class = ('prediction.random_forest_forecasting', 'HutanoRandomForestForecaster')
+    DEFAULT_PARAMS = {
+        'n_estimators': 100,
+        'max_depth': None,
+        'min_samples_leaf': 2,
+        'max_features': 'sqrt',
+    }
+    PARAM_SPACE = {
+        'max_depth': [6, 10, 15, None],
+        'min_samples_leaf': (1, 8),
+        'max_features': ['sqrt', 0.5, 1.0],
+    }
+
+    UPDATE_TREES = 10  # trees added per incremental update
+
+    def _fit(self, X, y, params):
+        model = RandomForestRegressor(random_state=42, **{'n_jobs': -1, **params})
+        model.fit(X, y)
+        return model
+
+    def _update(self, X, y, target_dates):
+        # Grow extra trees on the recent window; existing trees are kept as they are
+        self.model.set_params(warm_start=True, n_estimators=self.model.n_estimators + self.UPDATE_TREES)
+        self.model.fit(X, y)
+
+    def tree_predictions(self, X):
+        """
+        Predictions of every tree, shape (n_trees, n_rows). Leaf indices for
+        all trees come from one apply call, and every tree's leaf values are
+        concatenated so the lookup is a single fancy-indexing operation.
+        """
+        trees = [estimator.tree_ for estimator in self.model.estimators_]
+        leaf_values = np.concatenate([tree.value[:, 0, 0] for tree in trees])
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees[:-1]])
+        leaves = self.model.apply(X.astype(np.float32))
+        return leaf_values[leaves + offsets].T
+
+    def predict_interval(self, X):
+        lower, upper = np.quantile(self.tree_predictions(X), self.quantiles[[0, 2]], axis=0)
+        return lower, upper
@@ -0,0 +1,200 @@
+"""
+HUTANO Drift Detection
+Decides which (hospital, data_type) series actually need retraining.
+
+The nightly jobs retrain every hospital whether or not its data has changed.
+The drift monitor keeps a few running statistics per series and updates them
+incrementally with only the days added since the last update:
+
+- mean and variance of the series (Welford / Chan batch updates),
+- a day-of-week mean profile, and the squared error of each new day against
+  the profile as it stood before that day (the seasonal residual error),
+- exponentially weighted recent level and residual error.
+
+A series is marked as drifted when its recent level leaves the EWMA control
+limits around the level it was trained on, when its recent residual error
+grows well beyond the error at training time, or when it has never been
+trained. Only drifted series are retrained; mark_retrained() makes the
+current statistics the new baseline.
+
+Usage:
+    monitor = HutanoDriftMonitor()
+    drifted = monitor.scan(hospital_ids, ['staff'])
+    ... retrain drifted pairs ...
+    monitor.mark_retrained(hospital_id, 'staff')
+    monitor.save()
+"""
+import os
+import json
+import time
+import logging
+
+import numpy as np
+import pandas as pd
+
+from forecast_runner import load_processed_data
+
+logger = logging.getLogger(__name__)
+
+DRIFT_STATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prediction', 'model_cache',
+                                'drift_state.json')
+SEASON = 7
+
+
+class HutanoDriftMonitor:
+    """Running statistics and drift flags per (hospital, data_type) series, persisted as JSON."""
+
+    def __init__(self, state_path=DRIFT_STATE_PATH, window=14, level_limit=3.0, residual_ratio=2.0):
+        self.state_path = state_path
+        self.alpha = 2.0 / (window + 1)
+        self.level_limit = level_limit
+        self.residual_ratio = residual_ratio
+        try:
+            with open(self.state_path) as f:
+                self.state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.state = {}
+
+    @staticmethod
+    def _key(hospital_id, data_type):
+        return f"{data_type}:{hospital_id}"
+
+    @staticmethod
+    def _new_entry():
+        return {
+            'n': 0, 'mean': 0.0, 'm2': 0.0,
+            'season_count': [0] * SEASON, 'season_mean': [0.0] * SEASON,
+            'n_residuals': 0, 'residual_sq_sum': 0.0,
+            'recent_level': None, 'recent_mse': None,
+            'last_date': None, 'baseline': None, 'drifted': True, 'reason': 'new',
+        }
+
+    def update(self, hospital_id, data_type, data):
+        """
+        Fold the days of data (ds, y) newer than the last update into the
+        series statistics and re-evaluate drift. Returns the drift flag.
+        """
+        entry = self.state.setdefault(self._key(hospital_id, data_type), self._new_entry())
+        data = data.assign(ds=pd.to_datetime(data['ds'])).dropna(subset=['y']).sort_values('ds')
+        if entry['last_date'] is not None:
+            data = data[data['ds'] > pd.Timestamp(entry['last_date'])]
+        if data.empty:
+            return entry['drifted']
+
+        y = data['y'].to_numpy(dtype=float)
+        weekdays = pd.DatetimeIndex(data['ds']).dayofweek.to_numpy()
+
+        # Chan et al. batch merge of the new values into the running mean/variance
+        n_a, n_b = entry['n'], len(y)
+        delta = y.mean() - entry['mean']
+        n = n_a + n_b
+        entry['mean'] += delta * n_b / n
+        entry['m2'] += ((y - y.mean()) ** 2).sum() + delta ** 2 * n_a * n_b / n
+        entry['n'] = n
+
+        # Residual of each day against the weekday profile seen so far, then the profile update
+        counts = np.array(entry['season_count'], dtype=float)
+        means = np.array(entry['season_mean'])
+        level, mse = entry['recent_level'], entry['recent_mse']
+        for value, weekday in zip(y, weekdays):
+            if counts[weekday] > 0:
+                residual_sq = (value - means[weekday]) ** 2
+                entry['n_residuals'] += 1
+                entry['residual_sq_sum'] += residual_sq
+                mse = residual_sq if mse is None else mse + self.alpha * (residual_sq - mse)
+            counts[weekday] += 1
+            means[weekday] += (value - means[weekday]) / counts[weekday]
+            level = value if level is None else level + self.alpha * (value - level)
+
+        entry.update(season_count=counts.astype(int).tolist(), season_mean=means.tolist(),
+                     recent_level=float(level), recent_mse=None if mse is None else float(mse),
+                     last_date=str(data['ds'].max()))
+        self._evaluate(entry)
+        return entry['drifted']
+
+    def _evaluate(self, entry):
+        """Set the drift flag and reason of one entry against its training baseline."""
+        baseline = entry['baseline']
+        if baseline is None:
+            entry['drifted'], entry['reason'] = True, 'new'
+            return
+
+        # EWMA control limits: the smoothed level has variance var * alpha / (2 - alpha)
+        limit = self.level_limit * np.sqrt(baseline['var'] * self.alpha / (2 - self.alpha))
+        level_shift = abs(entry['recent_level'] - baseline['mean']) > max(limit, 1e-9)
+        residual_growth = (entry['recent_mse'] is not None and baseline['mse'] > 0
+                           and entry['recent_mse'] > self.residual_ratio * baseline['mse'])
+
+        if level_shift or residual_growth:
+            entry['drifted'] = True
+            entry['reason'] = 'level_shift' if level_shift else 'residual_error'
+        else:
+            entry['drifted'], entry['reason'] = False, None
+
+    def update_from_file(self, hospital_id, data_type):
+        """Update from the processed data file; series without data are left as they are."""
+        data = load_processed_data(hospital_id, data_type)
+        if data is None:
+            return self.is_drifted(hospital_id, data_type)
+        return self.update(hospital_id, data_type, data)
+
+    def scan(self, hospital_ids, data_types):
+        """Update every series from its processed data, save, and return the drifted pairs."""
+        start_time = time.perf_counter()
+        drifted = [
+            (hospital_id, data_type)
+            for hospital_id in hospital_ids
+            for data_type in data_types
+            if self.update_from_file(hospital_id, data_type)
+        ]
+        self.save()
+        logger.info(f"Drift scan: {len(drifted)} of {len(hospital_ids) * len(data_types)} series need "
+                    f"retraining ({time.perf_counter() - start_time:.2f}s)")
+        return drifted
+
+    def is_drifted(self, hospital_id, data_type):
+        """Drift flag of a series; series never seen count as drifted."""
+        entry = self.state.get(self._key(hospital_id, data_type))
+        return True if entry is None else entry['drifted']
+
+    def stats(self, hospital_id, data_type):
+        """Current mean, std, recent level, drift flag and reason of a series, or None."""
+        entry = self.state.get(self._key(hospital_id, data_type))
+        if entry is None or entry['n'] == 0:
+            return None
+        return {
+            'mean': entry['mean'],
+            'std': float(np.sqrt(entry['m2'] / max(entry['n'] - 1, 1))),
+            'recent_level': entry['recent_level'],
+            'drifted': entry['drifted'],
+            'reason': entry['reason'],
+        }
+
+    def mark_retrained(self, hospital_id, data_type):
+        """Make the series' current statistics the baseline of its freshly trained model."""
+        entry = self.state.get(self._key(hospital_id, data_type))
+        if entry is None or entry['n'] == 0:
+            return
+        entry['baseline'] = {
+            'mean': entry['mean'],
+            'var': entry['m2'] / max(entry['n'] - 1, 1),
+            'mse': entry['residual_sq_sum'] / entry['n_residuals'] if entry['n_residuals'] else 0.0,
+            'trained_until': entry['last_date'],
+        }
+        entry['drifted'], entry['reason'] = False, None
+
+    def drifted(self, data_types=None):
+        """(hospital_id, data_type) pairs currently flagged for retraining."""
+        pairs = []
+        for key, entry in self.state.items():
+            data_type, hospital_id = key.rsplit(':', 1)
+            if entry['drifted'] and (data_types is None or data_type in data_types):
+                pairs.append((int(hospital_id), data_type))
+        return pairs
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.state_path)
@@ -0,0 +1,130 @@
+"""
+HUTANO Feature Engine
+Vectorized feature engineering shared by the tree-based forecasters.
+
+Lags and rolling mean/std/min/max are all read from one NumPy sliding-window
+view of the series instead of repeated pandas shift/rolling calls. EMAs are
+a single linear filter pass. Everything is emitted as float32.
+
+Origin features at row t summarise the series up to and including day t,
+so they are the inputs for forecasting any day after t. Passing `rows`
+computes only those rows, e.g. rows=[len(y) - 1] for the next forecast.
+
+Usage:
+    engine = HutanoFeatureEngine()
+    X_origin = engine.origin_features(data['y'].to_numpy())
+    X_calendar = engine.calendar_features(data['ds'])
+"""
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import lfilter
+
+LAGS = [1, 2, 3, 7, 14, 30]
+ROLLING_WINDOWS = [7, 14, 30]
+ROLLING_STATS = ['mean', 'std', 'min', 'max']
+EMA_ALPHAS = [0.1, 0.3, 0.5]
+
+# Fixed-date Zimbabwe public holidays encoded as month * 100 + day
+ZIMBABWE_HOLIDAYS = [101, 221, 418, 501, 525, 1222, 1225, 1226]
+RAINY_SEASON_MONTHS = [11, 12, 1, 2, 3]
+
+CALENDAR_FEATURES = [
+    'year', 'month', 'day', 'dayofweek', 'dayofyear', 'is_weekend',
+    'month_sin', 'month_cos', 'dayofweek_sin', 'dayofweek_cos',
+    'dayofyear_sin', 'dayofyear_cos', 'is_rainy_season', 'is_holiday',
+]
+
+
+class HutanoFeatureEngine:
+    """Computes lag, rolling, EMA and calendar features as float32 matrices."""
+
+    def __init__(self, lags=LAGS, windows=ROLLING_WINDOWS, ema_alphas=EMA_ALPHAS):
+        self.lags = list(lags)
+        self.windows = list(windows)
+        self.ema_alphas = list(ema_alphas)
+        self.max_window = max(self.lags + self.windows)
+
+    @property
+    def origin_feature_names(self):
+        names = [f'y_lag_{lag}' for lag in self.lags]
+        names += [f'y_rolling_{stat}_{window}' for window in self.windows for stat in ROLLING_STATS]
+        names += [f'y_ema_{alpha}' for alpha in self.ema_alphas]
+        return names
+
+    @property
+    def calendar_feature_names(self):
+        return list(CALENDAR_FEATURES)
+
+    def origin_features(self, y, rows=None):
+        """
+        Lag, rolling and EMA features for each origin row of a series.
+
+        Rows without a full window of history are NaN. Returns an array of
+        shape (len(rows), len(origin_feature_names)).
+        """
+        y = np.asarray(y, dtype=np.float64)
+        n = len(y)
+        rows = np.arange(n) if rows is None else np.asarray(rows)
+
+        # Row t of the view is y[t - max_window + 1 .. t], NaN-padded at the start
+        padded = np.concatenate([np.full(self.max_window - 1, np.nan), y])
+        windows = sliding_window_view(padded, self.max_window)[rows]
+
+        columns = [windows[:, self.max_window - lag] for lag in self.lags]
+        for window in self.windows:
+            block = windows[:, self.max_window - window:]
+            columns += [block.mean(axis=1), block.std(axis=1, ddof=1), block.min(axis=1), block.max(axis=1)]
+        for alpha in self.ema_alphas:
+            columns.append(self.ema(y, alpha)[rows])
+
+        return np.column_stack(columns).astype(np.float32)
+
+    @staticmethod
+    def ema(y, alpha):
+        """Exponential moving average (adjust=False) as one linear filter pass."""
+        y = np.asarray(y, dtype=np.float64)
+        if len(y) == 0:
+            return y
+        ema, _ = lfilter([alpha], [1, alpha - 1], y, zi=[(1 - alpha) * y[0]])
+        return ema
+
+    def calendar_features(self, dates):
+        """Time, cyclical, rainy-season and public holiday features for each date."""
+        dates = pd.DatetimeIndex(dates)
+        month = dates.month.to_numpy()
+        day = dates.day.to_numpy()
+        dayofweek = dates.dayofweek.to_numpy()
+        dayofyear = dates.dayofyear.to_numpy()
+
+        # Heroes Day is the second Monday of August, Defence Forces Day the day after
+        heroes = (month == 8) & (((dayofweek == 0) & (day >= 8) & (day <= 14)) |
+                                 ((dayofweek == 1) & (day >= 9) & (day <= 15)))
+        is_holiday = np.isin(month * 100 + day, ZIMBABWE_HOLIDAYS) | heroes
+
+        return np.column_stack([
+            dates.year.to_numpy(),
+            month,
+            day,
+            dayofweek,
+            dayofyear,
+            dayofweek >= 5,
+            np.sin(2 * np.pi * month / 12),
+            np.cos(2 * np.pi * month / 12),
+            np.sin(2 * np.pi * dayofweek / 7),
+            np.cos(2 * np.pi * dayofweek / 7),
+            np.sin(2 * np.pi * dayofyear / 365.25),
+            np.cos(2 * np.pi * dayofyear / 365.25),
+            np.isin(month, RAINY_SEASON_MONTHS),
+            is_holiday,
+        ]).astype(np.float32)
+
+    def transform(self, data, rows=None):
+        """Origin and calendar features for rows of a ds/y frame, as a DataFrame."""
+        data = data.sort_values('ds').reset_index(drop=True)
+        rows = np.arange(len(data)) if rows is None else np.asarray(rows)
+        X = np.hstack([
+            self.origin_features(data['y'].to_numpy(), rows),
+            self.calendar_features(data['ds'].to_numpy()[rows]),
+        ])
+        return pd.DataFrame(X, columns=self.origin_feature_names + self.calendar_feature_names)
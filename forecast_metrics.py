@@ -0,0 +1,131 @@
+"""
+HUTANO Forecast Metrics
+Vectorized scoring of many forecasts at once.
+
+All metrics are computed from stacked NumPy arrays: score_arrays takes
+(n_series, horizon) matrices and score_forecasts takes a long frame and
+reduces every group with np.bincount, so scoring thousands of
+(hospital, model, horizon) series is a handful of array operations.
+
+Zero actuals are handled safely: MAPE skips zero-admission days (NaN when
+every actual is zero) and sMAPE counts a zero forecast of a zero actual as
+a perfect score instead of dividing by zero.
+
+Usage:
+    metrics = forecast_metrics(test_data['y'], forecast['yhat'])
+    print(metrics['rmse'], metrics['mape'])
+
+    scores = score_forecasts(long_frame, group_cols=['hospital_id', 'model'])
+"""
+import numpy as np
+
+METRICS = ['count', 'rmse', 'mae', 'mape', 'smape', 'bias', 'mase', 'coverage']
+
+
+def seasonal_naive_scale(y, season=1):
+    """In-sample MAE of the seasonal naive forecast, the MASE denominator."""
+    y = np.asarray(y, dtype=float)
+    if len(y) <= season:
+        return np.nan
+    return float(np.nanmean(np.abs(y[season:] - y[:-season])))
+
+
+def _reduce(codes, n_groups, actual, predicted, lower, upper, scale):
+    """Per-group metrics from flat arrays and integer group codes."""
+    valid = ~(np.isnan(actual) | np.isnan(predicted))
+    codes, actual, predicted = codes[valid], actual[valid], predicted[valid]
+    errors = predicted - actual
+    abs_errors = np.abs(errors)
+
+    def group_sum(weights):
+        return np.bincount(codes, weights=weights, minlength=n_groups)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        count = group_sum(None)
+        nonzero = actual != 0
+        nonzero_count = np.bincount(codes[nonzero], minlength=n_groups)
+        denominator = np.abs(actual) + np.abs(predicted)
+        smape_terms = np.where(denominator == 0, 0.0, 2 * abs_errors / np.where(denominator == 0, 1, denominator))
+
+        mae = group_sum(abs_errors) / count
+        result = {
+            'count': count.astype(int),
+            'rmse': np.sqrt(group_sum(errors ** 2) / count),
+            'mae': mae,
+            'mape': np.bincount(codes[nonzero], weights=abs_errors[nonzero] / np.abs(actual[nonzero]),
+                                minlength=n_groups) / nonzero_count * 100,
+            'smape': group_sum(smape_terms) / count * 100,
+            'bias': group_sum(errors) / count,
+            'mase': mae / scale if scale is not None else np.full(n_groups, np.nan),
+            'coverage': np.full(n_groups, np.nan),
+        }
+
+        if lower is not None and upper is not None:
+            lower, upper = lower[valid], upper[valid]
+            covered = (actual >= lower) & (actual <= upper)
+            result['coverage'] = group_sum(covered.astype(float)) / count
+
+    return result
+
+
+def score_arrays(actual, predicted, lower=None, upper=None, scale=None):
+    """
+    Score stacked series. actual/predicted (and optional interval bounds)
+    have shape (n_series, horizon); NaN marks missing points. scale is an
+    optional per-series MASE denominator. Returns {metric: array(n_series)}.
+    """
+    actual = np.atleast_2d(np.asarray(actual, dtype=float))
+    predicted = np.atleast_2d(np.asarray(predicted, dtype=float))
+    n_series, horizon = actual.shape
+    codes = np.repeat(np.arange(n_series), horizon)
+
+    def flat(values):
+        return None if values is None else np.atleast_2d(np.asarray(values, dtype=float)).ravel()
+
+    if scale is not None:
+        scale = np.broadcast_to(np.asarray(scale, dtype=float), (n_series,))
+    return _reduce(codes, n_series, actual.ravel(), predicted.ravel(), flat(lower), flat(upper), scale)
+
+
+def forecast_metrics(actual, predicted, lower=None, upper=None, scale=None):
+    """Score a single forecast. Returns {metric: float}."""
+    scores = score_arrays(actual, predicted, lower, upper, scale)
+    return {name: float(values[0]) for name, values in scores.items()}
+
+
+def score_forecasts(frame, group_cols, actual_col='actual', predicted_col='yhat',
+                    lower_col='yhat_lower', upper_col='yhat_upper', scale_col='scale'):
+    """
+    Score a long frame with one row per forecast point, grouped by group_cols
+    (e.g. hospital_id, model, horizon). Interval coverage and MASE are filled
+    in when the interval and scale columns are present.
+    Rows with a NaN in any group column are left out.
+    Returns one row per group with the METRICS columns.
+    """
+    grouped = frame.groupby(list(group_cols), sort=True)
+    codes = grouped.ngroup().to_numpy()
+    n_groups = grouped.ngroups
+    # Rows with a NaN group key belong to no group; ngroup() marks them -1, which np.bincount rejects
+    keep = codes >= 0
+    codes = codes[keep]
+
+    def column(name):
+        return frame[name].to_numpy(dtype=float)[keep] if name in frame else None
+
+    scale = None
+    if scale_col in frame:
+        scale = grouped[scale_col].first().to_numpy(dtype=float)
+
+    scores = _reduce(codes, n_groups, column(actual_col), column(predicted_col),
+                     column(lower_col), column(upper_col), scale)
+    result = grouped.size().reset_index()[list(group_cols)]
+    for name in METRICS:
+        result[name] = scores[name]
+    return result
+
+
+def accuracy_from_mape(mape):
+    """Accuracy percentage (100 - MAPE, floored at 0) as shown on PredictionComparison."""
+    if mape is None or np.isnan(mape):
+        return None
+    return round(max(0.0, 100.0 - mape), 1)
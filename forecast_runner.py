@@ -0,0 +1,314 @@
+"""
+HUTANO Parallel Forecast Runner
+Fans (hospital, data_type) forecasting jobs out across worker processes.
+
+Each job runs in its own process so a crashed or hung Prophet fit cannot take
+the rest of the nightly run down with it. Forecasts are sent back to the
+parent process, which is the only place that writes to the database.
+
+Usage:
+    python forecast_runner.py --data-types bed_occupancy medication staff --workers 8
+    python forecast_runner.py --drifted-only
+"""
+import os
+import time
+import logging
+import argparse
+import multiprocessing
+from collections import namedtuple
+from multiprocessing.connection import wait
+
+import pandas as pd
+
+from capacity_constraints import CAPACITY_BOUNDED, apply_bounds, load_bed_capacities
+from series_store import read_series
+
+logger = logging.getLogger(__name__)
+
+# data_type -> (resource_type, prediction model name, description)
+PREDICTION_MODELS = {
+    'bed_occupancy': ('bed', "Prophet Bed Occupancy Forecast",
+                      "Facebook Prophet model for forecasting bed occupancy"),
+    'medication': ('medication', "Prophet Medication Demand Forecast",
+                   "Facebook Prophet model for forecasting medication demand"),
+    'staff': ('staff', "Prophet Staff Requirement Forecast",
+              "Facebook Prophet model for forecasting staff requirements"),
+}
+
+# cap: capacity bounding the forecast (bed occupancy), looked up in batch by the parent process
+ForecastJob = namedtuple('ForecastJob', ['hospital_id', 'data_type', 'periods', 'save_plots', 'cap'])
+ForecastJob.__new__.__defaults__ = (30, False, None)
+
+
+def setup_django():
+    """Configure Django in a worker process if the parent has not already done so."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hutano.settings')
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def load_processed_data(hospital_id, data_type):
+    """
+    Load a processed series from the series store merged with the
+    hospital's DailyMetrics aggregates by date (the aggregates win, since
+    uploads update them), or None if there is neither.
+    """
+    from django.apps import apps
+    from daily_metrics import DATA_TYPE_METRICS, load_daily_series
+
+    data = read_series(hospital_id, data_type)
+    if not (apps.ready and data_type in DATA_TYPE_METRICS):
+        return data
+    metrics = load_daily_series(hospital_id, DATA_TYPE_METRICS[data_type])
+    if metrics is None:
+        return data
+    if data is None:
+        return metrics
+    merged = pd.concat([data, metrics], ignore_index=True).drop_duplicates('ds', keep='last')
+    return merged.sort_values('ds').reset_index(drop=True)
+
+
+def prophet_forecast_job(job):
+    """Fit a HutanoProphetForecaster for one job and return its future rows."""
+    setup_django()
+    from prediction.prophet_forecasting import HutanoProphetForecaster
+    from model_registry import HutanoModelRegistry
+    from prophet_fast import fast_prophet_forecast
+    from prophet_cache import HutanoProphetCache
+
+    data = load_processed_data(job.hospital_id, job.data_type)
+    if data is None:
+        raise FileNotFoundError(f"No processed {job.data_type} data for hospital {job.hospital_id}")
+
+    if job.cap is not None:
+        # Bounded series: logistic growth saturating at the hospital's capacity
+        from capacity_constraints import logistic_prophet_forecast, save_logistic_plots
+        model, forecast = logistic_prophet_forecast(data, job.cap, job.hospital_id, job.data_type, job.periods)
+        if job.save_plots:
+            save_logistic_plots(model, job.hospital_id, job.data_type, job.periods)
+        # The cap column carries the cap the model used, which save_resource_predictions clips to
+        return forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper', 'cap']].reset_index(drop=True)
+
+    # Unchanged series reuse the fitted model from the previous run
+    forecaster = HutanoProphetForecaster(hospital_id=job.hospital_id, data_type=job.data_type)
+    HutanoModelRegistry().train(forecaster, data)
+
+    if job.save_plots or getattr(forecaster, 'model', None) is None:
+        # Plots need the full history forecast
+        forecast = forecaster.generate_forecast(periods=job.periods)
+        if job.save_plots:
+            forecaster.plot_forecast()
+            forecaster.plot_components()
+    else:
+        # Only the future rows are stored, so skip history prediction and trajectory sampling
+        forecast = fast_prophet_forecast(forecaster.model, periods=job.periods)
+
+    if getattr(forecaster, 'model', None) is not None:
+        # Keep the fitted model so the dashboard can forecast without refitting
+        HutanoProphetCache().save(forecaster.model, job.hospital_id, job.data_type, data)
+
+    return forecast.tail(job.periods)[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].reset_index(drop=True)
+
+
+def get_prediction_model(data_type):
+    """Get or create the PredictionModel row that a data type's forecasts are stored under."""
+    from prediction.models import PredictionModel
+
+    _, name, description = PREDICTION_MODELS[data_type]
+    model, _ = PredictionModel.objects.get_or_create(
+        name=name,
+        model_type="prophet",
+        defaults={
+            'description': description,
+            'parameters': {'seasonality_mode': 'additive', 'horizon': 30}
+        }
+    )
+    return model
+
+
+def save_resource_predictions(job, forecast):
+    """
+    Replace a hospital's ResourceDemandPrediction rows with a job's forecast,
+    bounded by the cap its model used (the forecast's cap column) or job.cap.
+    """
+    from prediction_writer import write_resource_predictions
+
+    if 'cap' in forecast:
+        forecast = apply_bounds(forecast, float(forecast['cap'].max()))
+    elif job.cap is not None:
+        forecast = apply_bounds(forecast, job.cap)
+    model = get_prediction_model(job.data_type)
+    resource_type = PREDICTION_MODELS[job.data_type][0]
+    return write_resource_predictions(job.hospital_id, model, resource_type, forecast)
+
+
+def _run_job(job_func, job, conn):
+    """Worker entry point: run one job and send (status, payload) back to the parent."""
+    try:
+        conn.send(('success', job_func(job)))
+    except Exception as e:
+        conn.send(('failed', f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+class HutanoForecastRunner:
+    """Runs forecasting jobs in parallel worker processes with per-job timeouts."""
+
+    def __init__(self, job_func=prophet_forecast_job, max_workers=None, timeout=900):
+        self.job_func = job_func
+        self.max_workers = max(1, max_workers or os.cpu_count() or 1)
+        self.timeout = timeout
+        self.context = multiprocessing.get_context()
+
+    def run(self, jobs, on_result=None):
+        """
+        Run all jobs and return one result dict per job.
+
+        on_result(job, forecast) is called in this (parent) process for every
+        successful job, so database writes never happen inside a worker. A job
+        that raises, crashes its worker or exceeds the timeout is recorded as
+        failed without affecting the others.
+        """
+        pending = list(jobs)
+        running = {}
+        results = []
+
+        self._close_db_connections()
+        logger.info(f"Running {len(pending)} forecast jobs on {self.max_workers} workers")
+        run_start = time.monotonic()
+
+        while pending or running:
+            while pending and len(running) < self.max_workers:
+                job = pending.pop(0)
+                parent_conn, child_conn = self.context.Pipe(duplex=False)
+                process = self.context.Process(
+                    target=_run_job, args=(self.job_func, job, child_conn), daemon=True
+                )
+                process.start()
+                child_conn.close()
+                running[parent_conn] = (process, job, time.monotonic())
+
+            wait_for = None
+            if self.timeout is not None:
+                next_deadline = min(started for _, _, started in running.values()) + self.timeout
+                wait_for = max(0.0, next_deadline - time.monotonic())
+
+            for conn in wait(list(running), timeout=wait_for):
+                process, job, started = running.pop(conn)
+                try:
+                    status, payload = conn.recv()
+                except EOFError:
+                    status, payload = 'failed', f"Worker exited with code {process.exitcode}"
+                conn.close()
+                process.join()
+                results.append(self._finish(job, status, payload, started, on_result))
+
+            if self.timeout is not None:
+                now = time.monotonic()
+                for conn, (process, job, started) in list(running.items()):
+                    if now - started >= self.timeout:
+                        process.terminate()
+                        process.join()
+                        conn.close()
+                        del running[conn]
+                        results.append(self._finish(
+                            job, 'timeout', f"Timed out after {self.timeout}s", started, on_result
+                        ))
+
+        succeeded = sum(1 for r in results if r['status'] == 'success')
+        logger.info(f"Completed {succeeded}/{len(results)} forecast jobs in "
+                    f"{time.monotonic() - run_start:.1f}s")
+        return results
+
+    def _finish(self, job, status, payload, started, on_result):
+        """Build the result record for a job and write back successful forecasts."""
+        result = {
+            'hospital_id': job.hospital_id,
+            'data_type': job.data_type,
+            'status': status,
+            'forecast': payload if status == 'success' else None,
+            'error': None if status == 'success' else payload,
+            'elapsed': time.monotonic() - started,
+        }
+
+        if status == 'success' and on_result is not None:
+            try:
+                on_result(job, payload)
+            except Exception as e:
+                result['status'] = 'failed'
+                result['error'] = f"Saving results failed: {type(e).__name__}: {e}"
+
+        if result['status'] == 'success':
+            logger.info(f"{job.data_type} forecast for hospital {job.hospital_id} "
+                        f"done in {result['elapsed']:.1f}s")
+        else:
+            logger.error(f"{job.data_type} forecast for hospital {job.hospital_id} "
+                         f"{result['status']}: {result['error']}")
+        return result
+
+    @staticmethod
+    def _close_db_connections():
+        """Close inherited database connections so forked workers do not share sockets."""
+        try:
+            from django.db import connections
+            connections.close_all()
+        except Exception:
+            pass
+
+
+def main():
+    """Run the nightly forecasts for every hospital and data type."""
+    parser = argparse.ArgumentParser(description="Run HUTANO resource forecasts in parallel")
+    parser.add_argument('--data-types', nargs='+', default=list(PREDICTION_MODELS),
+                        choices=list(PREDICTION_MODELS))
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Number of worker processes (default: CPU count)")
+    parser.add_argument('--timeout', type=float, default=900,
+                        help="Per-job timeout in seconds")
+    parser.add_argument('--periods', type=int, default=30)
+    parser.add_argument('--drifted-only', action='store_true',
+                        help="Only forecast series the drift monitor flags for retraining")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    setup_django()
+    from core.models import Hospital
+
+    pairs = [
+        (hospital_id, data_type)
+        for hospital_id in Hospital.objects.values_list('id', flat=True)
+        for data_type in args.data_types
+    ]
+    if args.drifted_only:
+        from drift_detection import HutanoDriftMonitor
+        monitor = HutanoDriftMonitor()
+        pairs = monitor.scan(sorted({hospital_id for hospital_id, _ in pairs}), args.data_types)
+    caps = {}
+    if set(args.data_types) & set(CAPACITY_BOUNDED):
+        caps = load_bed_capacities()
+    jobs = [
+        ForecastJob(hospital_id, data_type, args.periods,
+                    cap=caps.get(hospital_id) if data_type in CAPACITY_BOUNDED else None)
+        for hospital_id, data_type in pairs
+    ]
+
+    runner = HutanoForecastRunner(max_workers=args.workers, timeout=args.timeout)
+    results = runner.run(jobs, on_result=save_resource_predictions)
+
+    if args.drifted_only:
+        for r in results:
+            if r['status'] == 'success':
+                monitor.mark_retrained(r['hospital_id'], r['data_type'])
+        monitor.save()
+
+    failed = [r for r in results if r['status'] != 'success']
+    print(f"\n{len(results) - len(failed)} of {len(results)} forecasts completed")
+    for r in failed:
+        print(f"- Hospital {r['hospital_id']} ({r['data_type']}): {r['status']} - {r['error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+HUTANO Global Cross-Hospital Forecasting
+One pooled XGBoost model trained on every hospital's series at once.
+
+HutanoXGBoostForecaster trains a separate model per hospital, so N hospitals
+mean N nightly training jobs and small or new hospitals learn from very
+little history. The global forecaster stacks the direct (origin, horizon)
+training rows of all hospitals into one matrix and adds hospital attributes
+(bed capacity, rural flag, province) so the model can tell them apart.
+
+Each series is divided by its own level (mean of the last 30 days) before
+stacking, so large referral hospitals and rural clinics share one target
+scale; the level is also kept as a feature and multiplied back at predict
+time. Forecasts for every hospital come from a single batched predict call.
+
+Usage:
+    forecaster = HutanoGlobalForecaster(data_type='bed_occupancy', max_horizon=30)
+    forecaster.train_model(series)  # {hospital_id: ds/y frame}
+    forecasts = forecaster.generate_forecasts(series, periods=30)
+
+    python global_forecasting.py --data-types bed_occupancy medication
+"""
+import time
+import logging
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from direct_forecasting import HutanoDirectXGBoostForecaster
+from hierarchical_forecasting import province_name
+
+logger = logging.getLogger(__name__)
+
+ZIMBABWE_PROVINCES = [
+    'Bulawayo', 'Harare', 'Manicaland', 'Mashonaland Central', 'Mashonaland East',
+    'Mashonaland West', 'Masvingo', 'Matabeleland North', 'Matabeleland South', 'Midlands',
+]
+ATTRIBUTE_FEATURES = ['bed_capacity', 'is_rural', 'province', 'log_level']
+LEVEL_WINDOW = 30
+
+
+def province_code(province):
+    """Index of a province in ZIMBABWE_PROVINCES ('Harare' and 'Harare Province' match), NaN if unknown."""
+    name = province_name(province)
+    return float(ZIMBABWE_PROVINCES.index(name)) if name in ZIMBABWE_PROVINCES else np.nan
+
+
+def load_hospital_attributes(hospital_ids=None):
+    """bed_capacity, is_rural and province code per hospital, indexed by hospital id."""
+    from forecast_runner import setup_django
+    setup_django()
+    from core.models import Hospital
+
+    hospitals = Hospital.objects.all()
+    if hospital_ids is not None:
+        hospitals = hospitals.filter(id__in=list(hospital_ids))
+
+    attributes = pd.DataFrame.from_records(
+        hospitals.values('id', 'bed_capacity', 'is_rural', 'province'),
+        columns=['id', 'bed_capacity', 'is_rural', 'province'],
+    ).set_index('id')
+    attributes['province'] = attributes['province'].map(province_code)
+    return attributes.astype(float)
+
+
+def series_level(y):
+    """Scale of a series: mean of its last LEVEL_WINDOW days, at least 1."""
+    y = np.asarray(y, dtype=float)[-LEVEL_WINDOW:]
+    level = np.nanmean(y) if len(y) else np.nan
+    return float(level) if np.isfinite(level) and level > 1 else 1.0
+
+
+class HutanoGlobalForecaster:
+    """Pooled direct multi-horizon XGBoost forecaster over all hospitals."""
+
+    def __init__(self, data_type='admissions', max_horizon=30, params=None, interval_width=None):
+        self.data_type = data_type
+        self.max_horizon = max_horizon
+        self.builder = HutanoDirectXGBoostForecaster(data_type=data_type, max_horizon=max_horizon,
+                                                     interval_width=interval_width)
+        if params:
+            self.builder.params.update(params)
+        self.attributes = None
+        self.feature_names = None
+        self.training_time = None
+
+    @property
+    def model(self):
+        return self.builder.model
+
+    @property
+    def feature_importance(self):
+        return self.builder.feature_importance
+
+    def _attribute_rows(self, hospital_id, level, n):
+        """Hospital attribute columns repeated for n rows; unknown hospitals are NaN."""
+        if self.attributes is not None and hospital_id in self.attributes.index:
+            static = self.attributes.loc[hospital_id, ['bed_capacity', 'is_rural', 'province']].to_numpy(dtype=float)
+        else:
+            static = np.full(3, np.nan)
+        row = np.append(static, np.log1p(level)).astype(np.float32)
+        return np.repeat(row[None, :], n, axis=0)
+
+    def _scale_origin(self, X, level):
+        """Divide the level-dependent origin features (lags, rolling stats, EMAs) by the series level."""
+        n_origin = len(self.builder.engine.origin_feature_names)
+        X[:, :n_origin] /= level
+        return X
+
+    def _with_attributes(self, X, hospital_id, level):
+        # Keep 'horizon' as the last column so fold/horizon bookkeeping matches the direct forecasters
+        return np.hstack([X[:, :-1], self._attribute_rows(hospital_id, level, len(X)), X[:, -1:]])
+
+    def build_training_matrix(self, series):
+        """Stack every hospital's scaled (origin, horizon) rows with its attributes."""
+        blocks, targets, hospitals = [], [], []
+        for hospital_id, data in series.items():
+            try:
+                X, y, _ = self.builder.build_training_matrix(data)
+            except ValueError:
+                logger.warning(f"Hospital {hospital_id}: too little {self.data_type} history, skipped in training")
+                continue
+            level = series_level(data.sort_values('ds')['y'])
+            blocks.append(self._with_attributes(self._scale_origin(X, level), hospital_id, level))
+            targets.append(y / level)
+            hospitals.append(np.full(len(y), hospital_id))
+
+        if not blocks:
+            raise ValueError("No hospital has enough history to train the global model")
+
+        names = self.builder.feature_names
+        self.feature_names = names[:-1] + ATTRIBUTE_FEATURES + names[-1:]
+        return np.vstack(blocks), np.concatenate(targets), np.concatenate(hospitals)
+
+    def train_model(self, series, attributes=None):
+        """
+        Train one model on {hospital_id: ds/y frame}. Hospital attributes are
+        read from the Hospital table unless an attributes frame is passed.
+        """
+        start_time = time.perf_counter()
+        self.attributes = attributes if attributes is not None else load_hospital_attributes(series.keys())
+
+        X, y, hospitals = self.build_training_matrix(series)
+        self.builder.feature_names = self.feature_names
+        self.builder.fit_matrix(X, y)
+        self.training_time = time.perf_counter() - start_time
+
+        logger.info(f"Trained global {self.data_type} model on {len(np.unique(hospitals))} hospitals "
+                    f"({len(y)} rows) in {self.training_time:.2f}s")
+        return self.model
+
+    def generate_forecasts(self, series, periods=30):
+        """
+        Forecast the next `periods` days for every hospital in one predict call.
+        Hospitals with short histories still get a forecast (missing lag
+        features are left as NaN for XGBoost). Returns hospital_id, ds, yhat
+        and, with interval_width, yhat_lower/yhat_upper.
+        """
+        if self.model is None:
+            raise ValueError("Model has not been trained. Call train_model first.")
+        if periods > self.max_horizon:
+            raise ValueError(f"periods={periods} exceeds max_horizon={self.max_horizon}")
+
+        blocks, levels, index = [], [], []
+        for hospital_id, data in series.items():
+            history = data.sort_values('ds').reset_index(drop=True)
+            y = history['y'].to_numpy(dtype=float)
+            level = series_level(y)
+            origin = self.builder.engine.origin_features(y, rows=[len(y) - 1])
+            X, future_dates = self.builder.horizon_matrix(origin, history['ds'].iloc[-1], periods)
+            blocks.append(self._with_attributes(self._scale_origin(X, level), hospital_id, level))
+            levels.append(np.full(periods, level))
+            index.append(pd.DataFrame({'hospital_id': hospital_id, 'ds': future_dates}))
+
+        X, levels = np.vstack(blocks), np.concatenate(levels)
+        forecasts = pd.concat(index, ignore_index=True)
+        forecasts['yhat'] = np.maximum(self.builder.predict(X) * levels, 0)
+        if self.builder.interval_width is not None:
+            lower, upper = self.builder.predict_interval(X)
+            forecasts['yhat_lower'] = np.maximum(lower * levels, 0)
+            forecasts['yhat_upper'] = np.maximum(upper * levels, 0)
+        return forecasts
+
+    def generate_forecast(self, hospital_id, history, periods=30):
+        """Forecast a single hospital; same columns as the per-hospital forecasters."""
+        forecast = self.generate_forecasts({hospital_id: history}, periods=periods)
+        return forecast.drop(columns='hospital_id')
+
+
+def main():
+    """Nightly job: one global model per data type, forecasts written for every hospital."""
+    from forecast_runner import PREDICTION_MODELS, setup_django, load_processed_data
+
+    parser = argparse.ArgumentParser(description="Train global HUTANO forecasters across all hospitals")
+    parser.add_argument('--data-types', nargs='+', default=list(PREDICTION_MODELS),
+                        choices=list(PREDICTION_MODELS))
+    parser.add_argument('--periods', type=int, default=30)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    setup_django()
+    from core.models import Hospital
+    from prediction.models import PredictionModel
+    from prediction_writer import write_resource_predictions
+
+    hospital_ids = list(Hospital.objects.values_list('id', flat=True))
+    for data_type in args.data_types:
+        series = {}
+        for hospital_id in hospital_ids:
+            data = load_processed_data(hospital_id, data_type)
+            if data is not None and len(data):
+                series[hospital_id] = data
+        if not series:
+            print(f"No processed {data_type} data found, skipping")
+            continue
+
+        forecaster = HutanoGlobalForecaster(data_type=data_type, max_horizon=args.periods, interval_width=0.8)
+        forecaster.train_model(series)
+        forecasts = forecaster.generate_forecasts(series, periods=args.periods)
+
+        resource_type = PREDICTION_MODELS[data_type][0]
+        model, _ = PredictionModel.objects.get_or_create(
+            name=f"Global XGBoost {data_type.replace('_', ' ').title()} Forecast",
+            model_type="xgboost",
+            defaults={
+                'description': f"Cross-hospital XGBoost model for forecasting {data_type.replace('_', ' ')}",
+                'parameters': {**forecaster.builder.params, 'horizon': args.periods, 'strategy': 'global_direct'}
+            }
+        )
+        for hospital_id, forecast in forecasts.groupby('hospital_id'):
+            write_resource_predictions(hospital_id, model, resource_type, forecast)
+        print(f"{data_type}: trained on {len(series)} hospitals in {forecaster.training_time:.1f}s, "
+              f"wrote {len(forecasts)} predictions")
+
+
+if __name__ == "__main__":
+    main()
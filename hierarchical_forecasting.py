@@ -0,0 +1,263 @@
+"""
+HUTANO Hierarchical Forecasting
+Coherent forecasts at hospital, district, province and national level.
+
+Summing per-hospital forecasts gives coherent totals but ignores what the
+aggregate series themselves show; refitting at each level gives province and
+national numbers that do not add up. This module forecasts every node of the
+hierarchy in one batch and reconciles them:
+
+- the summing matrix S (nodes x hospitals) is built from Hospital.district
+  and Hospital.province as a scipy.sparse matrix,
+- all node histories are S @ Y for the hospital history matrix Y,
+- base forecasts for every node come from one vectorized call,
+- reconciliation is bottom-up or MinT (ols, wls_struct or wls_var), solved
+  with sparse linear algebra:  y_tilde = S (S' W^-1 S)^-1 S' W^-1 y_hat.
+
+Usage:
+    hierarchy = HutanoHierarchy.from_database(hospital_ids)
+    reconciler = HutanoHierarchicalForecaster(hierarchy, method='wls_var')
+    forecasts = reconciler.forecast(Y, dates, periods=30)
+
+    python hierarchical_forecasting.py --data-type bed_occupancy --method wls_var
+"""
+import os
+import logging
+import argparse
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.linalg import splu
+
+logger = logging.getLogger(__name__)
+
+METHODS = ['bottom_up', 'ols', 'wls_struct', 'wls_var']
+LEVELS = ['national', 'province', 'district', 'hospital']
+MIN_SHARED_DAYS = 28  # shortest common history worth reconciling (four weekly seasons)
+MIN_COVERAGE = 0.9  # share of the common window a hospital must report to be included
+
+
+def province_name(province):
+    """'Harare Province' and 'Harare' name the same province."""
+    name = (province or 'Unknown').strip()
+    return name[:-len(' Province')] if name.endswith(' Province') else name
+
+
+class HutanoHierarchy:
+    """Nodes of the national -> province -> district -> hospital tree and its summing matrix."""
+
+    def __init__(self, hospitals):
+        """hospitals: frame with id, district and province columns, one row per bottom-level series."""
+        hospitals = hospitals.reset_index(drop=True).copy()
+        hospitals['province'] = hospitals['province'].map(province_name)
+        hospitals['district'] = hospitals['district'].fillna('Unknown').str.strip()
+        self.hospital_ids = hospitals['id'].tolist()
+
+        provinces = sorted(hospitals['province'].unique())
+        districts = sorted(set(zip(hospitals['province'], hospitals['district'])))
+        self.nodes = pd.DataFrame(
+            [('national', 'Zimbabwe', None)]
+            + [('province', province, 'Zimbabwe') for province in provinces]
+            + [('district', f"{district} ({province})", province) for province, district in districts]
+            + [('hospital', str(hospital_id), f"{district} ({province})")
+               for hospital_id, district, province in zip(hospitals['id'], hospitals['district'], hospitals['province'])],
+            columns=['level', 'name', 'parent'],
+        )
+
+        # Row of each aggregate node that every hospital rolls up into
+        n = len(hospitals)
+        province_row = {province: 1 + i for i, province in enumerate(provinces)}
+        district_row = {key: 1 + len(provinces) + i for i, key in enumerate(districts)}
+        bottom_offset = 1 + len(provinces) + len(districts)
+        columns = np.arange(n)
+        rows = np.concatenate([
+            np.zeros(n, dtype=int),
+            hospitals['province'].map(province_row).to_numpy(),
+            np.array([district_row[key] for key in zip(hospitals['province'], hospitals['district'])]),
+            bottom_offset + columns,
+        ])
+        self.S = sparse.csr_matrix((np.ones(len(rows)), (rows, np.tile(columns, 4))),
+                                   shape=(bottom_offset + n, n))
+
+    @classmethod
+    def from_database(cls, hospital_ids=None):
+        """Hierarchy of the Hospital table (optionally only the given hospitals)."""
+        from forecast_runner import setup_django
+        setup_django()
+        from core.models import Hospital
+
+        hospitals = Hospital.objects.all()
+        if hospital_ids is not None:
+            hospitals = hospitals.filter(id__in=list(hospital_ids))
+        frame = pd.DataFrame.from_records(hospitals.values('id', 'district', 'province'),
+                                          columns=['id', 'district', 'province'])
+        if hospital_ids is not None:
+            # Keep the caller's column order for the bottom-level series
+            frame = frame.set_index('id').loc[[h for h in hospital_ids if h in set(frame['id'])]].reset_index()
+        return cls(frame)
+
+    def aggregate(self, Y):
+        """Series of every node from the hospital series Y (n_hospitals x T)."""
+        return np.asarray(self.S @ Y)
+
+
+def seasonal_level_forecast(Y, periods, alpha=0.2, season=7):
+    """
+    Batch base forecasts for many series: an exponentially smoothed level
+    times the average weekly profile of the last 8 weeks. Returns
+    (forecasts, one-step in-sample residuals).
+    """
+    Y = np.asarray(Y, dtype=float)
+    n, T = Y.shape
+    recent = Y[:, -(season * min(8, T // season)):] if T >= season else Y
+    with np.errstate(divide='ignore', invalid='ignore'):
+        profile = recent.reshape(n, -1, season).mean(axis=1) if recent.shape[1] >= season else np.ones((n, season))
+        profile = np.nan_to_num(profile / profile.mean(axis=1, keepdims=True), nan=1.0)
+
+    # Profile phase of every historical day, aligned so day T-1 ends the last full season
+    phase = (np.arange(T) - T) % season
+    deseasonalized = Y / np.where(profile[:, phase] > 0, profile[:, phase], 1.0)
+
+    level = deseasonalized[:, 0].copy()
+    residuals = np.zeros((n, T))
+    for t in range(1, T):
+        residuals[:, t] = Y[:, t] - level * profile[:, phase[t]]
+        level += alpha * (deseasonalized[:, t] - level)
+
+    future_phase = np.arange(periods) % season
+    return level[:, None] * profile[:, future_phase], residuals[:, 1:]
+
+
+class HutanoHierarchicalForecaster:
+    """Forecasts every hierarchy node in batch and reconciles them."""
+
+    def __init__(self, hierarchy, method='wls_var', base_forecaster=seasonal_level_forecast):
+        if method not in METHODS:
+            raise ValueError(f"Unknown method: {method}")
+        self.hierarchy = hierarchy
+        self.method = method
+        self.base_forecaster = base_forecaster
+
+    def _weights(self, residuals):
+        """Diagonal of W for MinT: ones (ols), node sizes (wls_struct) or residual variances (wls_var)."""
+        S = self.hierarchy.S
+        if self.method == 'ols':
+            return np.ones(S.shape[0])
+        if self.method == 'wls_struct':
+            return np.asarray(S.sum(axis=1)).ravel()
+        variance = residuals.var(axis=1)
+        return np.where(variance > 0, variance, max(variance.max(), 1e-9))
+
+    def reconcile(self, base, residuals=None, non_negative=True):
+        """
+        Reconcile base forecasts of all nodes (n_nodes x periods) into coherent
+        ones. With non_negative, negative hospital forecasts are set to zero
+        before aggregating, so the totals stay the sums of their hospitals.
+        """
+        S = self.hierarchy.S
+        n_bottom = S.shape[1]
+        if self.method == 'bottom_up':
+            bottom = base[-n_bottom:]
+        else:
+            W_inv = sparse.diags(1.0 / self._weights(residuals))
+            # (S' W^-1 S) is n_hospitals x n_hospitals; factorize once, solve for every horizon column
+            gram = (S.T @ W_inv @ S).tocsc()
+            bottom = splu(gram).solve(np.asarray(S.T @ (W_inv @ base)))
+        if non_negative:
+            bottom = np.maximum(bottom, 0)
+        return np.asarray(S @ bottom)
+
+    def forecast(self, Y, dates, periods=30):
+        """
+        Reconciled forecasts for every node from hospital series Y
+        (n_hospitals x T, columns aligned to dates).
+        Returns node level, name, ds, yhat_base and yhat.
+        """
+        history = self.hierarchy.aggregate(Y)
+        base, residuals = self.base_forecaster(history, periods)
+        reconciled = self.reconcile(base, residuals)
+
+        future_dates = pd.date_range(pd.Timestamp(dates[-1]) + pd.Timedelta(days=1), periods=periods, freq='D')
+        nodes = self.hierarchy.nodes
+        forecasts = nodes.loc[nodes.index.repeat(periods), ['level', 'name']].reset_index(drop=True)
+        forecasts['ds'] = np.tile(future_dates, len(nodes))
+        forecasts['yhat_base'] = base.ravel()
+        forecasts['yhat'] = reconciled.ravel()
+        return forecasts
+
+
+def load_hospital_matrix(hospital_ids, data_type):
+    """
+    Stack processed series into (hospitals x days) over a common window: the
+    dates at least half of the hospitals report. Hospitals covering less than
+    MIN_COVERAGE of it are left out and the remaining gaps are interpolated.
+    Raises ValueError if fewer than MIN_SHARED_DAYS days are left.
+    """
+    from forecast_runner import load_processed_data
+
+    series = {}
+    for hospital_id in hospital_ids:
+        data = load_processed_data(hospital_id, data_type)
+        if data is not None and len(data):
+            series[hospital_id] = data.set_index('ds')['y']
+    if not series:
+        return None, [], None
+
+    wide = pd.DataFrame(series).sort_index()
+    shared = wide.index[wide.notna().mean(axis=1) >= 0.5]
+    window = wide.loc[shared[0]:shared[-1]] if len(shared) else wide.iloc[:0]
+
+    coverage = window.notna().mean()
+    excluded = coverage.index[coverage < MIN_COVERAGE].tolist()
+    if excluded:
+        logger.warning(f"Leaving out hospitals {excluded}: their {data_type} history covers less than "
+                       f"{MIN_COVERAGE:.0%} of the common window")
+    window = window.drop(columns=excluded).interpolate(limit_direction='both').dropna()
+
+    if window.shape[1] == 0 or len(window) < MIN_SHARED_DAYS:
+        raise ValueError(f"Not enough {data_type} history shared across hospitals: {len(window)} common days "
+                         f"for {window.shape[1]} hospitals, at least {MIN_SHARED_DAYS} needed")
+    return window.to_numpy(dtype=float).T, list(window.columns), window.index
+
+
+def main():
+    """Reconciled forecasts for one data type across the whole hospital network."""
+    parser = argparse.ArgumentParser(description="Hierarchical HUTANO forecasts")
+    parser.add_argument('--data-type', default='bed_occupancy')
+    parser.add_argument('--method', default='wls_var', choices=METHODS)
+    parser.add_argument('--periods', type=int, default=30)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    from forecast_runner import setup_django
+    setup_django()
+    from core.models import Hospital
+
+    try:
+        Y, hospital_ids, dates = load_hospital_matrix(Hospital.objects.values_list('id', flat=True), args.data_type)
+    except ValueError as e:
+        print(e)
+        return
+    if Y is None:
+        print(f"No processed {args.data_type} data found")
+        return
+
+    hierarchy = HutanoHierarchy.from_database(hospital_ids)
+    Y = Y[[hospital_ids.index(hospital_id) for hospital_id in hierarchy.hospital_ids]]
+    forecaster = HutanoHierarchicalForecaster(hierarchy, method=args.method)
+    forecasts = forecaster.forecast(Y, dates, periods=args.periods)
+
+    output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prediction', 'forecasts')
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, f"{args.data_type}_hierarchical_forecast.csv")
+    forecasts.to_csv(output_path, index=False)
+
+    totals = forecasts[forecasts['level'] != 'hospital'].groupby(['level', 'name'])['yhat'].sum()
+    print(f"Reconciled {len(hierarchy.nodes)} nodes ({len(hospital_ids)} hospitals) with {args.method}")
+    print(totals.head(20).to_string())
+    print(f"Forecasts saved to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+HUTANO Hyperparameter Tuning
+Time-budgeted successive halving for the direct tree forecasters.
+
+A full grid search refits every combination on every fold with the full
+number of trees, which is too slow to run nightly. The tuner instead:
+
+- samples candidate parameters from each forecaster's PARAM_SPACE,
+- scores every candidate with few trees (n_estimators is the resource),
+  keeps the best 1/eta and repeats with eta times more trees,
+- fits the time-series CV folds of each rung in parallel threads,
+- stops at a wall-clock budget and returns the best candidate of the last
+  completed rung; fits still queued when it expires are cancelled, so the
+  budget is overrun by at most the fits already running,
+- stores the winner per (model, hospital, data_type), so later runs start
+  from the stored parameters instead of searching again.
+
+CV folds are split on forecast origin day, and training rows whose target
+falls inside the test period are dropped so no fold sees its own future.
+
+Usage:
+    tuner = HutanoHyperparameterTuner(forecaster, time_budget=120)
+    params = tuner.tune(X, y, origins)
+"""
+import os
+import json
+import time
+import math
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+from sklearn.model_selection import TimeSeriesSplit
+
+logger = logging.getLogger(__name__)
+
+TUNED_PARAMS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prediction', 'tuned_params')
+
+
+def sample_params(space, rng):
+    """Draw one candidate from a parameter space of lists (choices) and (low, high[, 'log']) ranges."""
+    params = {}
+    for name, spec in space.items():
+        if isinstance(spec, list):
+            params[name] = spec[rng.integers(len(spec))]
+        elif len(spec) == 3 and spec[2] == 'log':
+            params[name] = float(np.exp(rng.uniform(np.log(spec[0]), np.log(spec[1]))))
+        elif isinstance(spec[0], int) and isinstance(spec[1], int):
+            params[name] = int(rng.integers(spec[0], spec[1] + 1))
+        else:
+            params[name] = float(rng.uniform(spec[0], spec[1]))
+    return params
+
+
+class HutanoTunedParamsStore:
+    """Best parameters per (model, hospital, data_type) as small JSON files."""
+
+    def __init__(self, store_dir=TUNED_PARAMS_DIR):
+        self.store_dir = store_dir
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    def _path(self, model_name, hospital_id, data_type):
+        slug = model_name.lower().replace(' ', '_')
+        return os.path.join(self.store_dir, f"{slug}_{data_type}_{hospital_id}.json")
+
+    def load(self, model_name, hospital_id, data_type):
+        """Stored record ({'params', 'cv_rmse', ...}) or None."""
+        try:
+            with open(self._path(model_name, hospital_id, data_type)) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def save(self, model_name, hospital_id, data_type, record):
+        path = self._path(model_name, hospital_id, data_type)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(record, f, indent=2, default=str)
+        os.replace(tmp_path, path)
+
+
+class HutanoHyperparameterTuner:
+    """Successive-halving search over a direct forecaster's PARAM_SPACE."""
+
+    def __init__(self, forecaster, n_candidates=27, eta=3, n_splits=3, time_budget=300,
+                 max_workers=None, store=None, retune=False, random_state=42):
+        self.forecaster = forecaster
+        self.n_candidates = n_candidates
+        self.eta = eta
+        self.n_splits = n_splits
+        self.time_budget = time_budget
+        self.max_workers = max_workers or min(n_splits * 4, os.cpu_count() or 1)
+        self.store = store or HutanoTunedParamsStore()
+        self.retune = retune
+        self.rng = np.random.default_rng(random_state)
+
+    def _folds(self, X, origins):
+        """(train_mask, test_mask) pairs split on origin day, without target leakage into the test period."""
+        targets = origins + X[:, -1].astype(int)
+        unique_origins = np.unique(origins)
+        folds = []
+        for train_idx, test_idx in TimeSeriesSplit(n_splits=self.n_splits).split(unique_origins):
+            test_start = unique_origins[test_idx[0]]
+            train_mask = np.isin(origins, unique_origins[train_idx]) & (targets < test_start)
+            test_mask = np.isin(origins, unique_origins[test_idx])
+            folds.append((train_mask, test_mask))
+        return folds
+
+    def _candidates(self, stored):
+        candidates = [dict(self.forecaster.DEFAULT_PARAMS)]
+        if stored is not None:
+            candidates.append({**self.forecaster.DEFAULT_PARAMS, **stored['params']})
+        while len(candidates) < self.n_candidates:
+            candidates.append({**self.forecaster.DEFAULT_PARAMS,
+                               **sample_params(self.forecaster.PARAM_SPACE, self.rng)})
+        return candidates
+
+    def _fold_rmse(self, params, X, y, fold):
+        train_mask, test_mask = fold
+        # Parallelism comes from running folds concurrently, so each fit is single-threaded
+        model = self.forecaster._fit(X[train_mask], y[train_mask], {**params, 'n_jobs': 1})
+        errors = self.forecaster.predict(X[test_mask], model) - y[test_mask]
+        return float(np.sqrt(np.mean(errors ** 2)))
+
+    def tune(self, X, y, origins):
+        """
+        Return tuned parameters for the forecaster. Stored parameters are
+        reused without searching unless retune=True; a new search includes
+        them as a candidate and stores its winner.
+        """
+        forecaster = self.forecaster
+        key = (forecaster.model_name, forecaster.hospital_id, forecaster.data_type)
+        stored = self.store.load(*key)
+        if stored is not None and not self.retune:
+            logger.info(f"Using stored parameters for {key}: {stored['params']}")
+            return {**forecaster.DEFAULT_PARAMS, **stored['params']}
+
+        start_time = time.perf_counter()
+        deadline = start_time + self.time_budget
+        folds = self._folds(X, origins)
+        candidates = self._candidates(stored)
+
+        max_resource = forecaster.DEFAULT_PARAMS['n_estimators']
+        n_rungs = int(math.log(len(candidates), self.eta)) + 1
+        best_params, best_rmse, rungs_done = candidates[0], np.inf, 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for rung in range(n_rungs):
+                if time.perf_counter() > deadline:
+                    logger.warning(f"Tuning budget of {self.time_budget}s reached after {rungs_done} rungs")
+                    break
+
+                n_estimators = max(10, int(max_resource / self.eta ** (n_rungs - 1 - rung)))
+                rung_params = [{**params, 'n_estimators': n_estimators} for params in candidates]
+                futures = [[executor.submit(self._fold_rmse, params, X, y, fold) for fold in folds]
+                           for params in rung_params]
+                _, not_done = wait([future for row in futures for future in row],
+                                   timeout=max(0.0, deadline - time.perf_counter()))
+                if not_done:
+                    # Running fits finish when the executor shuts down; queued ones never start
+                    for future in not_done:
+                        future.cancel()
+                    logger.warning(f"Tuning budget of {self.time_budget}s reached during rung {rung + 1}; "
+                                   f"keeping the result of {rungs_done} rungs")
+                    break
+                scores = np.array([np.mean([future.result() for future in row]) for row in futures])
+
+                order = np.argsort(scores)
+                best_params, best_rmse = rung_params[order[0]], float(scores[order[0]])
+                rungs_done = rung + 1
+                candidates = [candidates[i] for i in order[:max(1, len(candidates) // self.eta)]]
+
+        elapsed = time.perf_counter() - start_time
+        if rungs_done == 0:
+            return dict(forecaster.DEFAULT_PARAMS)
+
+        # Candidates are compared at reduced tree counts; the final model keeps the full count
+        best_params = {**best_params, 'n_estimators': max_resource}
+        logger.info(f"Tuned {key} in {elapsed:.1f}s over {rungs_done} rungs: {best_params} (CV RMSE {best_rmse:.4f})")
+
+        self.store.save(*key, {
+            'params': best_params,
+            'cv_rmse': best_rmse,
+            'rungs': rungs_done,
+            'search_time': elapsed,
+            'n_rows': int(len(y)),
+            'tuned_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        })
+        return best_params
@@ -16,7 +16,10 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hutano.settings')
 django.setup()
 
 # Import models after Django setup
-from prediction.models import PredictionModel, ResourceDemandPrediction
+from prediction.models import PredictionModel
+from prediction_writer import write_resource_predictions
+from capacity_constraints import apply_bounds, load_bed_capacities
+from series_store import read_series, series_exists, write_series
 from core.models import Hospital, BedAllocation
 from prediction.prophet_forecasting import HutanoProphetForecaster
 
@@ -45,10 +48,6 @@ def generate_sample_bed_data(hospital_id):
     """Generate sample bed occupancy data for a hospital."""
     print(f"Generating sample bed occupancy data for hospital ID {hospital_id}...")
     
-    # Create data directory if it doesn't exist
-    data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prediction', 'data')
-    os.makedirs(data_dir, exist_ok=True)
-    
     # Generate sample data
     start_date = datetime.now() - timedelta(days=365)
     dates = pd.date_range(start=start_date, periods=365, freq='D')
@@ -98,9 +97,8 @@ def generate_sample_bed_data(hospital_id):
         'y': occupancy
     })
     
-    # Save to CSV
-    file_path = os.path.join(data_dir, f"bed_occupancy_{hospital_id}_processed.csv")
-    data.to_csv(file_path, index=False)
+    # Save to the series store
+    file_path = write_series(hospital_id, 'bed_occupancy', data)
     print(f"Sample data saved to {file_path}")
     
     return data, file_path
@@ -115,16 +113,10 @@ def generate_bed_occupancy_forecast(hospital_id):
     # Get the model
     model = create_bed_occupancy_model()
     
-    # Generate sample data if needed
-    data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prediction', 'data')
-    data_file = os.path.join(data_dir, f"bed_occupancy_{hospital_id}_processed.csv")
-    
-    if not os.path.exists(data_file):
+    # Load existing data, generating sample data if needed
+    data = read_series(hospital_id, 'bed_occupancy')
+    if data is None:
         data, _ = generate_sample_bed_data(hospital_id)
-    else:
-        # Load existing data
-        data = pd.read_csv(data_file)
-        data['ds'] = pd.to_datetime(data['ds'])
     
     # Create forecaster and train model
     print(f"Creating forecaster for hospital_id={hospital_id}")
@@ -146,42 +138,39 @@ def generate_bed_occupancy_forecast(hospital_id):
     # Save predictions to database
     print(f"Saving predictions to database")
     future_forecast = forecast.tail(30)  # Only future predictions
+    future_forecast = apply_bounds(future_forecast, load_bed_capacities([hospital_id])[hospital_id])
     
-    # Delete existing predictions
-    ResourceDemandPrediction.objects.filter(
-        hospital=hospital,
-        prediction_model=model,
-        resource_type='bed'
-    ).delete()
-    
-    for i, (_, row) in enumerate(future_forecast.iterrows()):
-        prediction_date = row['ds'].date()
-        
-        # Create prediction
-        prediction = ResourceDemandPrediction.objects.create(
-            hospital=hospital,
-            prediction_model=model,
-            resource_type='bed',
-            prediction_date=prediction_date,
-            predicted_demand=int(row['yhat']),
-            confidence_interval_lower=int(row['yhat_lower']),
-            confidence_interval_upper=int(row['yhat_upper'])
-        )
-        
-        if i < 5:  # Print first 5 predictions for debugging
-            print(f"Created prediction for {prediction_date}: {int(row['yhat'])}")
-    
-    print(f"Created {len(future_forecast)} bed occupancy predictions for {hospital.name}")
+    # Replace existing predictions in a single transaction
+    write_result = write_resource_predictions(hospital, model, 'bed', future_forecast)
+    
+    for _, row in future_forecast.head(5).iterrows():  # Print first 5 predictions for debugging
+        print(f"Created prediction for {row['ds'].date()}: {int(row['yhat'])}")
+    
+    print(f"Created {write_result['rows_written']} bed occupancy predictions for {hospital.name} "
+          f"in {write_result['elapsed']:.2f}s")
     return True
 
 if __name__ == "__main__":
+    from forecast_runner import HutanoForecastRunner, ForecastJob, save_resource_predictions
+
     # Process all hospitals
     hospitals = Hospital.objects.all()
     print(f"Found {hospitals.count()} hospitals")
     
+    # Make sure every hospital has data before fanning out the forecasts
     for hospital in hospitals:
-        print(f"\nProcessing hospital: {hospital.name} (ID: {hospital.id})")
-        generate_bed_occupancy_forecast(hospital.id)
+        if not series_exists(hospital.id, 'bed_occupancy'):
+            generate_sample_bed_data(hospital.id)
+    
+    # Bed capacities for every hospital in one batch; forecasts are bounded by them when saved
+    caps = load_bed_capacities()
+    jobs = [ForecastJob(hospital.id, 'bed_occupancy', periods=30, save_plots=True, cap=caps.get(hospital.id))
+            for hospital in hospitals]
+    results = HutanoForecastRunner().run(jobs, on_result=save_resource_predictions)
+    
+    for result in results:
+        if result['status'] != 'success':
+            print(f"Hospital ID {result['hospital_id']}: {result['status']} - {result['error']}")
     
     print("\nBed occupancy forecasting implemented successfully!")
     print("Now you need to update the dashboard template to enable the button.")
@@ -4,6 +4,7 @@ This script will:
 1. Create a model for medication demand forecasting
 2. Generate sample medication demand data
 3. Process the data and generate forecasts
+4. Forecast usage of each medication with the intermittent-demand engine
 """
 import os
 import django
@@ -16,9 +17,20 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hutano.settings')
 django.setup()
 
 # Import models after Django setup
-from prediction.models import PredictionModel, ResourceDemandPrediction
+from prediction.models import PredictionModel
+from prediction_writer import write_resource_predictions
+from series_store import read_series, series_exists, write_series
 from core.models import Hospital, MedicationInventory
 from prediction.prophet_forecasting import HutanoProphetForecaster
+from intermittent_demand import HutanoIntermittentForecaster
+
+# Medications tracked per hospital (as in data_collection_tools)
+MEDICATIONS = [
+    'Paracetamol', 'Amoxicillin', 'Chloroquine', 'Artemether',
+    'Efavirenz', 'Zidovudine', 'Isoniazid', 'Rifampin',
+    'Insulin', 'Metformin', 'Amlodipine', 'Enalapril',
+    'Salbutamol', 'Prednisolone', 'Diazepam'
+]
 
 def create_medication_model():
     """Create a model for medication demand forecasting."""
@@ -45,10 +57,6 @@ def generate_sample_medication_data(hospital_id):
     """Generate sample medication demand data for a hospital."""
     print(f"Generating sample medication demand data for hospital ID {hospital_id}...")
     
-    # Create data directory if it doesn't exist
-    data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prediction', 'data')
-    os.makedirs(data_dir, exist_ok=True)
-    
     # Generate sample data
     start_date = datetime.now() - timedelta(days=365)
     dates = pd.date_range(start=start_date, periods=365, freq='D')
@@ -96,13 +104,61 @@ def generate_sample_medication_data(hospital_id):
         'y': demand
     })
     
-    # Save to CSV
-    file_path = os.path.join(data_dir, f"medication_{hospital_id}_processed.csv")
-    data.to_csv(file_path, index=False)
+    # Save to the series store
+    file_path = write_series(hospital_id, 'medication', data)
     print(f"Sample data saved to {file_path}")
     
     return data, file_path
 
+def generate_sample_medication_usage(hospital_ids, days=365, save=True):
+    """Generate sparse daily usage for every medication at each hospital."""
+    print(f"Generating sample per-medication usage for {len(hospital_ids)} hospitals...")
+    
+    dates = pd.date_range(end=datetime.now().date(), periods=days, freq='D')
+    n_series = len(hospital_ids) * len(MEDICATIONS)
+    
+    # Each series has its own chance of any usage on a day and typical issue size
+    demand_probability = np.random.uniform(0.05, 0.9, size=(n_series, 1))
+    mean_size = np.random.uniform(1, 40, size=(n_series, 1))
+    occurs = np.random.random((n_series, days)) < demand_probability
+    usage = np.where(occurs, np.random.poisson(mean_size, size=(n_series, days)) + 1, 0)
+    
+    data = pd.DataFrame({
+        'hospital_id': np.repeat(np.repeat(hospital_ids, len(MEDICATIONS)), days),
+        'medication_name': np.repeat(np.tile(MEDICATIONS, len(hospital_ids)), days),
+        'date': np.tile(dates, n_series),
+        'daily_usage': usage.ravel(),
+    })
+    
+    if save:
+        # Usage spans every hospital, so it goes to the store's cross-hospital partition
+        file_path = write_series(None, 'medication_usage', data)
+        print(f"Sample usage saved to {file_path}")
+    
+    return data
+
+def generate_per_medication_forecasts(usage, periods=30):
+    """Forecast every medication x hospital usage series in one vectorized pass."""
+    import time
+    
+    start_time = time.perf_counter()
+    forecaster = HutanoIntermittentForecaster(method='auto')
+    forecasts = forecaster.forecast_frame(usage, ['hospital_id', 'medication_name'], 'date', 'daily_usage',
+                                          periods=periods)
+    elapsed = time.perf_counter() - start_time
+    
+    n_series = len(forecasts) // periods
+    print(f"Forecast {n_series} medication series in {elapsed * 1000:.1f} ms")
+    print(forecasts.groupby('demand_class')['medication_name'].count().div(periods).astype(int).to_string())
+    
+    forecasts_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prediction', 'forecasts')
+    os.makedirs(forecasts_dir, exist_ok=True)
+    file_path = os.path.join(forecasts_dir, "medication_usage_forecast.csv")
+    forecasts.to_csv(file_path, index=False)
+    print(f"Per-medication forecasts saved to {file_path}")
+    
+    return forecasts
+
 def generate_medication_forecast(hospital_id):
     """Generate medication demand forecast for a hospital."""
     print(f"Generating medication demand forecast for hospital ID {hospital_id}...")
@@ -113,16 +169,10 @@ def generate_medication_forecast(hospital_id):
     # Get the model
     model = create_medication_model()
     
-    # Generate sample data if needed
-    data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prediction', 'data')
-    data_file = os.path.join(data_dir, f"medication_{hospital_id}_processed.csv")
-    
-    if not os.path.exists(data_file):
+    # Load existing data, generating sample data if needed
+    data = read_series(hospital_id, 'medication')
+    if data is None:
         data, _ = generate_sample_medication_data(hospital_id)
-    else:
-        # Load existing data
-        data = pd.read_csv(data_file)
-        data['ds'] = pd.to_datetime(data['ds'])
     
     # Create forecaster and train model
     print(f"Creating forecaster for hospital_id={hospital_id}")
@@ -145,40 +195,39 @@ def generate_medication_forecast(hospital_id):
     print(f"Saving predictions to database")
     future_forecast = forecast.tail(30)  # Only future predictions
     
-    # Delete existing predictions
-    ResourceDemandPrediction.objects.filter(
-        hospital=hospital,
-        prediction_model=model,
-        resource_type='medication'
-    ).delete()
-    
-    for i, (_, row) in enumerate(future_forecast.iterrows()):
-        prediction_date = row['ds'].date()
-        
-        # Create prediction
-        prediction = ResourceDemandPrediction.objects.create(
-            hospital=hospital,
-            prediction_model=model,
-            resource_type='medication',
-            prediction_date=prediction_date,
-            predicted_demand=int(row['yhat']),
-            confidence_interval_lower=int(row['yhat_lower']),
-            confidence_interval_upper=int(row['yhat_upper'])
-        )
-        
-        if i < 5:  # Print first 5 predictions for debugging
-            print(f"Created prediction for {prediction_date}: {int(row['yhat'])}")
-    
-    print(f"Created {len(future_forecast)} medication demand predictions for {hospital.name}")
+    # Replace existing predictions in a single transaction
+    write_result = write_resource_predictions(hospital, model, 'medication', future_forecast)
+    
+    for _, row in future_forecast.head(5).iterrows():  # Print first 5 predictions for debugging
+        print(f"Created prediction for {row['ds'].date()}: {int(row['yhat'])}")
+    
+    print(f"Created {write_result['rows_written']} medication demand predictions for {hospital.name} "
+          f"in {write_result['elapsed']:.2f}s")
     return True
 
 if __name__ == "__main__":
+    from forecast_runner import HutanoForecastRunner, ForecastJob, save_resource_predictions
+
     # Process all hospitals
     hospitals = Hospital.objects.all()
     print(f"Found {hospitals.count()} hospitals")
     
+    # Make sure every hospital has data before fanning out the forecasts
     for hospital in hospitals:
-        print(f"\nProcessing hospital: {hospital.name} (ID: {hospital.id})")
-        generate_medication_forecast(hospital.id)
+        if not series_exists(hospital.id, 'medication'):
+            generate_sample_medication_data(hospital.id)
+    
+    jobs = [ForecastJob(hospital.id, 'medication', periods=30, save_plots=True) for hospital in hospitals]
+    results = HutanoForecastRunner().run(jobs, on_result=save_resource_predictions)
+    
+    for result in results:
+        if result['status'] != 'success':
+            print(f"Hospital ID {result['hospital_id']}: {result['status']} - {result['error']}")
+    
+    # Per-medication usage is sparse, so it uses the intermittent-demand engine instead of Prophet
+    usage = read_series(None, 'medication_usage')
+    if usage is None:
+        usage = generate_sample_medication_usage([hospital.id for hospital in hospitals])
+    generate_per_medication_forecasts(usage)
     
     print("\nMedication demand forecasting implemented successfully!")
@@ -16,7 +16,10 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hutano.settings')
 django.setup()
 
 # Import models after Django setup
-from prediction.models import PredictionModel, ResourceDemandPrediction
+from prediction.models import PredictionModel
+from prediction_writer import write_resource_predictions
+from prophet_cache import HutanoProphetCache
+from series_store import read_series, write_series
 from core.models import Hospital
 from prediction.prophet_forecasting import HutanoProphetForecaster
 
@@ -45,10 +48,6 @@ def generate_sample_staff_data(hospital_id):
     """Generate sample staff requirement data for a hospital."""
     print(f"Generating sample staff requirement data for hospital ID {hospital_id}...")
     
-    # Create data directory if it doesn't exist
-    data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prediction', 'data')
-    os.makedirs(data_dir, exist_ok=True)
-    
     # Generate sample data
     start_date = datetime.now() - timedelta(days=365)
     dates = pd.date_range(start=start_date, periods=365, freq='D')
@@ -97,9 +96,8 @@ def generate_sample_staff_data(hospital_id):
         'y': staff
     })
     
-    # Save to CSV
-    file_path = os.path.join(data_dir, f"staff_{hospital_id}_processed.csv")
-    data.to_csv(file_path, index=False)
+    # Save to the series store
+    file_path = write_series(hospital_id, 'staff', data)
     print(f"Sample data saved to {file_path}")
     
     return data, file_path
@@ -114,34 +112,29 @@ def generate_staff_forecast(hospital_id=2):
     # Get the model
     model = create_staff_model()
     
-    # Generate sample data if needed
-    data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prediction', 'data')
-    data_file = os.path.join(data_dir, f"staff_{hospital_id}_processed.csv")
-    
-    if not os.path.exists(data_file):
+    # Load existing data, generating sample data if needed
+    data = read_series(hospital_id, 'staff')
+    if data is None:
         data, _ = generate_sample_staff_data(hospital_id)
-    else:
-        # Load existing data
-        data = pd.read_csv(data_file)
-        data['ds'] = pd.to_datetime(data['ds'])
     
     # Create a simple model without hyperparameter tuning
     print(f"Creating a simple model without hyperparameter tuning")
     
     # Create a Prophet model with default parameters
     from prophet import Prophet
-    prophet_model = Prophet(
-        yearly_seasonality=True,
-        weekly_seasonality=True,
-        daily_seasonality=False,
-        seasonality_mode='additive',
-        changepoint_prior_scale=0.05,
-        seasonality_prior_scale=10.0
-    )
+    def make_model():
+        return Prophet(
+            yearly_seasonality=True,
+            weekly_seasonality=True,
+            daily_seasonality=False,
+            seasonality_mode='additive',
+            changepoint_prior_scale=0.05,
+            seasonality_prior_scale=10.0
+        )
     
-    # Fit the model
+    # Fit the model (reuses or warm-starts from the cached fit for this hospital)
     print(f"Fitting model with {len(data)} records")
-    prophet_model.fit(data)
+    prophet_model = HutanoProphetCache().fit(make_model, data, hospital_id, 'staff')
     
     # Generate forecast
     print(f"Generating forecast for 30 periods")
@@ -170,31 +163,14 @@ def generate_staff_forecast(hospital_id=2):
     print(f"Saving predictions to database")
     future_forecast = forecast.tail(30)  # Only future predictions
     
-    # Delete existing predictions
-    ResourceDemandPrediction.objects.filter(
-        hospital=hospital,
-        prediction_model=model,
-        resource_type='staff'
-    ).delete()
-    
-    for i, (_, row) in enumerate(future_forecast.iterrows()):
-        prediction_date = row['ds'].date()
-        
-        # Create prediction
-        prediction = ResourceDemandPrediction.objects.create(
-            hospital=hospital,
-            prediction_model=model,
-            resource_type='staff',
-            prediction_date=prediction_date,
-            predicted_demand=int(row['yhat']),
-            confidence_interval_lower=int(row['yhat_lower']),
-            confidence_interval_upper=int(row['yhat_upper'])
-        )
-        
-        if i < 5:  # Print first 5 predictions for debugging
-            print(f"Created prediction for {prediction_date}: {int(row['yhat'])}")
+    # Replace existing predictions in a single transaction
+    write_result = write_resource_predictions(hospital, model, 'staff', future_forecast)
+    
+    for _, row in future_forecast.head(5).iterrows():  # Print first 5 predictions for debugging
+        print(f"Created prediction for {row['ds'].date()}: {int(row['yhat'])}")
     
-    print(f"Created {len(future_forecast)} staff requirement predictions for {hospital.name}")
+    print(f"Created {write_result['rows_written']} staff requirement predictions for {hospital.name} "
+          f"in {write_result['elapsed']:.2f}s")
     return True
 
 if __name__ == "__main__":
@@ -0,0 +1,269 @@
+"""
+HUTANO Model Registry
+On-disk cache of fitted forecasters keyed by what they were trained on.
+
+A registry key covers the hospital, data type, forecaster class, its
+configuration and training arguments, and a hash of the training frame.
+Training the same forecaster on the same data again loads the fitted state
+from disk instead of refitting. Least recently used artifacts are evicted
+once the cache exceeds its entry or size limit.
+
+Usage:
+    registry = HutanoModelRegistry()
+    forecaster = HutanoXGBoostForecaster(hospital_id=1, data_type='admissions')
+    registry.train(forecaster, data, tune_hyperparameters=False)
+
+    # Next day: continue from the latest fitted model instead of retraining
+    registry.update(forecaster, data_with_new_day)
+"""
+import io
+import os
+import json
+import time
+import pickle
+import hashlib
+import logging
+
+import pandas as pd
+
+from capacity_constraints import HutanoBoundedTarget
+
+try:
+    from prophet import Prophet
+    from prophet.serialize import model_to_json, model_from_json
+    PROPHET_AVAILABLE = True
+except ImportError:
+    PROPHET_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+MODEL_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prediction', 'model_cache')
+
+# Training entry point for each forecaster class that does not use train_model
+TRAIN_METHODS = {
+    'HutanoEnsembleForecaster': 'train_ensemble',
+    'HutanoParallelEnsembleForecaster': 'train_ensemble',
+}
+
+
+def frame_fingerprint(data):
+    """Hash a training frame's columns, dtypes and values."""
+    digest = hashlib.sha256()
+    columns = sorted(data.columns)
+    digest.update(json.dumps([(col, str(data[col].dtype)) for col in columns]).encode())
+    digest.update(pd.util.hash_pandas_object(data[columns], index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def _prophet_from_json(model_json):
+    """Rebuild a fitted Prophet model from its JSON serialization."""
+    return model_from_json(model_json)
+
+
+class _ForecasterPickler(pickle.Pickler):
+    """Pickler that stores fitted Prophet models as JSON instead of raw objects."""
+
+    def reducer_override(self, obj):
+        if PROPHET_AVAILABLE and isinstance(obj, Prophet) and obj.history is not None:
+            return _prophet_from_json, (model_to_json(obj),)
+        return NotImplemented
+
+
+def dumps_forecaster_state(state):
+    """Serialize forecaster state, handling fitted Prophet models anywhere inside it."""
+    buffer = io.BytesIO()
+    _ForecasterPickler(buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(state)
+    return buffer.getvalue()
+
+
+class HutanoModelRegistry:
+    """Persistent, size-bounded cache of fitted forecasters."""
+
+    def __init__(self, cache_dir=MODEL_CACHE_DIR, max_entries=500, max_bytes=1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def forecaster_config(forecaster):
+        """Return the JSON-serializable configuration a forecaster was constructed with."""
+        config = {}
+        for name, value in vars(forecaster).items():
+            if name.startswith('_'):
+                continue
+            if isinstance(value, HutanoBoundedTarget):
+                # Bounds change what the model is trained on, so they must change the key
+                config[name] = {'floor': value.floor, 'cap': value.cap}
+                continue
+            try:
+                json.dumps(value)
+            except (TypeError, ValueError):
+                continue
+            config[name] = value
+        return config
+
+    def make_key(self, forecaster, data, train_kwargs=None):
+        """Build the registry key for training a forecaster on a frame."""
+        identity = {
+            'class': f"{type(forecaster).__module__}.{type(forecaster).__name__}",
+            'config': self.forecaster_config(forecaster),
+            'train_kwargs': train_kwargs or {},
+            'data': frame_fingerprint(data),
+        }
+        digest = hashlib.sha256(json.dumps(identity, sort_keys=True, default=str).encode()).hexdigest()
+        hospital_id = getattr(forecaster, 'hospital_id', 'all')
+        data_type = getattr(forecaster, 'data_type', 'data')
+        return f"{data_type}_{hospital_id}_{type(forecaster).__name__}_{digest[:24]}"
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def latest(self, prefix, config=None):
+        """Most recently written artifact whose key starts with prefix (and matches config), or None."""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.startswith(prefix) and entry.name.endswith('.pkl'):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.name[:-len('.pkl')]))
+                except FileNotFoundError:
+                    continue
+
+        for _, key in sorted(entries, reverse=True):
+            artifact = self.load(key)
+            if artifact is not None and (config is None or artifact.get('config') == config):
+                return artifact
+        return None
+
+    def load(self, key):
+        """Return a cached artifact, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                artifact = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable model artifact {key}: {e}")
+            self._remove(path)
+            return None
+
+        # Loading counts as a use for LRU eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return artifact
+
+    def save(self, key, artifact):
+        """Write an artifact atomically, then evict old entries if over the limits."""
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(dumps_forecaster_state(artifact))
+            os.replace(tmp_path, path)
+        finally:
+            self._remove(tmp_path)
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used artifacts until within max_entries and max_bytes."""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.pkl'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        entries.sort()
+        total_bytes = sum(size for _, size, _ in entries)
+        while entries and (len(entries) > self.max_entries or total_bytes > self.max_bytes):
+            _, size, path = entries.pop(0)
+            self._remove(path)
+            total_bytes -= size
+
+    def clear(self):
+        """Remove every cached artifact."""
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.pkl'):
+                self._remove(entry.path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def train(self, forecaster, train_data, **train_kwargs):
+        """
+        Train a forecaster, or restore it from the registry if it has already
+        been trained with the same configuration on the same data.
+
+        Returns whatever the forecaster's training method returns (the fitted
+        model for train_model, the performance dict for train_ensemble).
+        """
+        method = TRAIN_METHODS.get(type(forecaster).__name__, 'train_model')
+        config = self.forecaster_config(forecaster)
+        key = self.make_key(forecaster, train_data, train_kwargs)
+
+        artifact = self.load(key)
+        if artifact is not None:
+            vars(forecaster).update(artifact['state'])
+            logger.info(f"Loaded cached model {key}")
+            return artifact['result']
+
+        start_time = time.perf_counter()
+        result = getattr(forecaster, method)(train_data, **train_kwargs)
+        training_time = time.perf_counter() - start_time
+
+        self._save_forecaster(key, forecaster, result, training_time, config)
+        return result
+
+    def _save_forecaster(self, key, forecaster, result, training_time, config):
+        try:
+            self.save(key, {
+                'state': vars(forecaster),
+                'config': config,
+                'result': result,
+                'training_time': training_time,
+                'created': time.time(),
+            })
+        except Exception as e:
+            # A forecaster that cannot be serialized still trains; it just is not cached
+            logger.warning(f"Could not cache model {key}: {e}")
+
+    def update(self, forecaster, train_data, drift_detected=False):
+        """
+        Bring a forecaster up to date with train_data by continuing from the
+        latest cached fit of the same forecaster and configuration.
+
+        Forecasters with an update_model method (the direct tree forecasters)
+        are updated incrementally, which retrains in full only on their
+        schedule or when drift_detected is set. Anything else, or a forecaster
+        with no earlier fit, is trained as in train(). Returns 'cached',
+        'full', 'incremental' or 'unchanged'.
+        """
+        config = self.forecaster_config(forecaster)
+        key = self.make_key(forecaster, train_data)
+        artifact = self.load(key)
+        if artifact is not None and not drift_detected:
+            vars(forecaster).update(artifact['state'])
+            return 'cached'
+
+        previous = None
+        if hasattr(forecaster, 'update_model'):
+            previous = self.latest(key.rsplit('_', 1)[0] + '_', config)
+        if previous is None:
+            self.train(forecaster, train_data)
+            return 'full'
+
+        vars(forecaster).update(previous['state'])
+        start_time = time.perf_counter()
+        mode = forecaster.update_model(train_data, drift_detected=drift_detected)
+        self._save_forecaster(key, forecaster, forecaster.model, time.perf_counter() - start_time, config)
+        logger.info(f"{mode.capitalize()} update of {key}")
+        return mode
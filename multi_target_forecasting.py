@@ -0,0 +1,231 @@
+"""
+HUTANO Multi-Target Forecasting
+Admissions, bed occupancy, medication usage and staff needs from one model.
+
+Hospital data such as sample_hospital_data.csv carries all four targets side
+by side, yet each one used to be a separate forecaster run: its own file
+read, its own feature build and its own scheduled job. The multi-target
+forecaster reads the frame once, builds a single direct (origin, horizon)
+feature matrix containing the origin features of every target, and trains
+one multi-output model on all targets together:
+
+- Random Forest: native multi-output trees, one fit,
+- XGBoost: one fit on a 2-D target (shared histogram/DMatrix build).
+
+Targets are standardized before fitting so large-valued series such as
+medication usage do not dominate the split criterion. Each target's
+features also include the other targets' history (admissions lead bed
+occupancy and staff needs).
+
+Usage:
+    forecaster = HutanoMultiTargetForecaster(hospital_id=1)
+    forecaster.train_model(data)            # ds + one column per target
+    forecast = forecaster.generate_forecast(data, periods=30)
+
+    python multi_target_forecasting.py --data sample_hospital_data.csv --compare
+"""
+import os
+import time
+import logging
+import argparse
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.ensemble import RandomForestRegressor
+
+from direct_forecasting import HutanoDirectRandomForestForecaster, HutanoDirectXGBoostForecaster
+from feature_engine import HutanoFeatureEngine
+
+logger = logging.getLogger(__name__)
+
+TARGETS = ['admissions', 'bed_occupancy', 'medication_usage', 'staff_needs']
+MODEL_TYPES = {
+    'random_forest': HutanoDirectRandomForestForecaster,
+    'xgboost': HutanoDirectXGBoostForecaster,
+}
+
+
+def load_multi_target_data(path, date_col='date'):
+    """Read a multi-target CSV once, as ds plus target columns (and hospital_id if present)."""
+    data = pd.read_csv(path, parse_dates=[date_col]).rename(columns={date_col: 'ds'})
+    return data.sort_values('ds').reset_index(drop=True)
+
+
+class HutanoMultiTargetForecaster:
+    """Direct multi-horizon forecaster for several targets sharing one feature matrix."""
+
+    def __init__(self, hospital_id=None, targets=TARGETS, max_horizon=30, model_type='random_forest', params=None):
+        if model_type not in MODEL_TYPES:
+            raise ValueError(f"Unknown model type: {model_type}")
+        self.hospital_id = hospital_id
+        self.targets = list(targets)
+        self.max_horizon = max_horizon
+        self.model_type = model_type
+        self.params = {**MODEL_TYPES[model_type].DEFAULT_PARAMS, **(params or {})}
+        self.engine = HutanoFeatureEngine()
+        self.model = None
+        self.feature_names = None
+        self.y_mean = None
+        self.y_std = None
+        self.training_time = None
+
+    def origin_features(self, data, rows=None):
+        """Origin features of every target side by side, shape (n_rows, n_targets * n_origin_features)."""
+        return np.hstack([
+            self.engine.origin_features(data[target].to_numpy(dtype=float), rows)
+            for target in self.targets
+        ])
+
+    def build_training_matrix(self, data):
+        """One (origin, horizon) matrix and an (n_rows, n_targets) target matrix for all targets."""
+        data = data.sort_values('ds').reset_index(drop=True)
+        Y = data[self.targets].to_numpy(dtype=float)
+        n = len(data)
+
+        origin = self.origin_features(data)
+        calendar = self.engine.calendar_features(data['ds'])
+        valid = np.flatnonzero(~np.isnan(origin).any(axis=1))
+
+        horizons = np.arange(1, self.max_horizon + 1)
+        origins = np.repeat(valid, len(horizons))
+        steps = np.tile(horizons, len(valid))
+        keep = origins + steps < n
+        origins, steps = origins[keep], steps[keep]
+        if len(origins) == 0:
+            raise ValueError(f"Need more than {self.engine.max_window} days of data to train")
+
+        X = np.hstack([
+            origin[origins],
+            calendar[origins + steps],
+            steps[:, None].astype(np.float32),
+        ])
+        self.feature_names = ([f'{target}_{name}' for target in self.targets
+                               for name in self.engine.origin_feature_names]
+                              + self.engine.calendar_feature_names + ['horizon'])
+        targets = Y[origins + steps]
+        labelled = ~np.isnan(targets).any(axis=1)
+        return X[labelled], targets[labelled]
+
+    def _fit(self, X, Y):
+        if self.model_type == 'random_forest':
+            model = RandomForestRegressor(random_state=42, **{'n_jobs': -1, **self.params})
+        else:
+            model = xgb.XGBRegressor(objective='reg:squarederror', tree_method='hist',
+                                     random_state=42, **{'n_jobs': -1, **self.params})
+        model.fit(X, Y)
+        return model
+
+    def train_model(self, train_data):
+        """Train one model for all targets on a frame with ds and the target columns."""
+        start_time = time.perf_counter()
+        X, Y = self.build_training_matrix(train_data)
+
+        self.y_mean = Y.mean(axis=0)
+        std = Y.std(axis=0)
+        self.y_std = np.where(std > 0, std, 1.0)
+        self.model = self._fit(X, (Y - self.y_mean) / self.y_std)
+
+        self.training_time = time.perf_counter() - start_time
+        logger.info(f"Trained multi-target {self.model_type} for {len(self.targets)} targets on "
+                    f"{len(Y)} (origin, horizon) rows in {self.training_time:.2f}s")
+        return self.model
+
+    def predict(self, X):
+        """Predictions in the original units, shape (n_rows, n_targets)."""
+        return self.model.predict(X).reshape(len(X), -1) * self.y_std + self.y_mean
+
+    def generate_forecast(self, train_data, periods=30):
+        """Forecast every target for the next `periods` days: ds plus one column per target."""
+        if self.model is None:
+            raise ValueError("Model has not been trained. Call train_model first.")
+        if periods > self.max_horizon:
+            raise ValueError(f"periods={periods} exceeds max_horizon={self.max_horizon}")
+
+        history = train_data.sort_values('ds').reset_index(drop=True)
+        origin = self.origin_features(history, rows=[len(history) - 1])
+        future_dates = pd.date_range(history['ds'].iloc[-1] + pd.Timedelta(days=1), periods=periods, freq='D')
+        X = np.hstack([
+            np.repeat(origin, periods, axis=0),
+            self.engine.calendar_features(future_dates),
+            np.arange(1, periods + 1, dtype=np.float32)[:, None],
+        ])
+
+        forecast = pd.DataFrame(np.maximum(self.predict(X), 0), columns=self.targets)
+        forecast.insert(0, 'ds', future_dates)
+        return forecast
+
+    @property
+    def feature_importance(self):
+        return pd.DataFrame({
+            'feature': self.feature_names,
+            'importance': self.model.feature_importances_,
+        }).sort_values('importance', ascending=False).reset_index(drop=True)
+
+
+def forecast_hospitals(data, periods=30, model_type='random_forest', targets=TARGETS):
+    """
+    Train and forecast every hospital of a multi-target frame (one series
+    if there is no hospital_id column). Returns {hospital_id: forecast frame}.
+    """
+    groups = data.groupby('hospital_id') if 'hospital_id' in data.columns else [(None, data)]
+    forecasts = {}
+    for hospital_id, hospital_data in groups:
+        forecaster = HutanoMultiTargetForecaster(hospital_id=hospital_id, targets=targets,
+                                                 max_horizon=periods, model_type=model_type)
+        forecaster.train_model(hospital_data)
+        forecasts[hospital_id] = forecaster.generate_forecast(hospital_data, periods=periods)
+    return forecasts
+
+
+def compare_separate_runs(path, periods=30, model_type='random_forest', targets=TARGETS):
+    """Time one multi-target run against one direct forecaster run per target (single-hospital file), each reading the file."""
+    start_time = time.perf_counter()
+    forecast_hospitals(load_multi_target_data(path), periods, model_type, targets)
+    joint_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    for target in targets:
+        data = load_multi_target_data(path)
+        series = data[['ds', target]].rename(columns={target: 'y'}).dropna()
+        forecaster = MODEL_TYPES[model_type](data_type=target, max_horizon=periods)
+        forecaster.train_model(series)
+        forecaster.generate_forecast(series, periods=periods)
+    separate_time = time.perf_counter() - start_time
+    return joint_time, separate_time
+
+
+def main():
+    """Joint forecasts for all targets of a multi-target CSV."""
+    parser = argparse.ArgumentParser(description="Multi-target HUTANO forecasts")
+    parser.add_argument('--data', default='sample_hospital_data.csv')
+    parser.add_argument('--periods', type=int, default=30)
+    parser.add_argument('--model', default='random_forest', choices=list(MODEL_TYPES))
+    parser.add_argument('--compare', action='store_true',
+                        help="Also time separate per-target runs for comparison")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    data = load_multi_target_data(args.data)
+    targets = [target for target in TARGETS if target in data.columns]
+    forecasts = forecast_hospitals(data, args.periods, args.model, targets)
+
+    output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prediction', 'forecasts')
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, 'multi_target_forecast.csv')
+    pd.concat([forecast.assign(hospital_id=hospital_id) for hospital_id, forecast in forecasts.items()],
+              ignore_index=True).to_csv(output_path, index=False)
+
+    for hospital_id, forecast in forecasts.items():
+        print(f"Hospital {hospital_id if hospital_id is not None else '(all)'}: "
+              f"{len(forecast)} days, mean " + ", ".join(f"{t}={forecast[t].mean():.1f}" for t in targets))
+    print(f"Forecasts saved to {output_path}")
+
+    if args.compare:
+        joint_time, separate_time = compare_separate_runs(args.data, args.periods, args.model, targets)
+        print(f"Multi-target run: {joint_time:.2f}s, separate runs: {separate_time:.2f}s "
+              f"({separate_time / joint_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
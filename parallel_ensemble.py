@@ -0,0 +1,184 @@
+"""
+HUTANO Parallel Ensemble Forecasting
+Ensemble forecaster whose members are fitted concurrently.
+
+HutanoEnsembleForecaster fits its members one after another, so training
+takes as long as all of them combined (10-14 s, dominated by Prophet). Here
+every member is trained in its own worker process, together with its
+validation predictions, and then refitted on the full history in the same
+worker so forecasts start from the latest data. Weights are fitted from the
+validation predictions, so training takes about as long as the slowest
+member.
+
+Usage:
+    ensemble = HutanoParallelEnsembleForecaster(hospital_id=1, data_type='admissions')
+    performance = ensemble.train_ensemble(data, validation_split=0.2)
+    print(performance['prophet']['training_time'])
+    forecast = ensemble.generate_ensemble_forecast(data, periods=30)
+"""
+import time
+import pickle
+import logging
+import importlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from model_registry import dumps_forecaster_state
+from forecast_metrics import forecast_metrics
+
+logger = logging.getLogger(__name__)
+
+# member name -> (module, class)
+MEMBERS = {
+    'xgboost': ('prediction.xgboost_forecasting', 'HutanoXGBoostForecaster'),
+    'random_forest': ('prediction.random_forest_forecasting', 'HutanoRandomForestForecaster'),
+    'prophet': ('prediction.prophet_forecasting', 'HutanoProphetForecaster'),
+}
+
+
+def _member_forecast(name, forecaster, history, history_end, periods):
+    """Forecast `periods` days after history with a fitted member."""
+    if name == 'prophet':
+        # Prophet forecasts from the end of its own training data, so skip the gap
+        gap = (pd.Timestamp(history['ds'].max()) - history_end).days
+        forecast = forecaster.generate_forecast(periods=gap + periods)
+        return forecast['yhat'].to_numpy()[-periods:]
+    return forecaster.generate_forecast(history, periods=periods)['yhat'].to_numpy()
+
+
+def _fit_member(name, hospital_id, data_type, data):
+    """Construct and fit one member on data."""
+    module_name, class_name = MEMBERS[name]
+    forecaster_class = getattr(importlib.import_module(module_name), class_name)
+    forecaster = forecaster_class(hospital_id=hospital_id, data_type=data_type)
+    if name == 'prophet':
+        forecaster.train_model(data)
+    else:
+        forecaster.train_model(data, tune_hyperparameters=False)
+    return forecaster
+
+
+def _train_member(name, hospital_id, data_type, train_part, validation_part):
+    """Worker: fit one member, predict the validation window, then refit it on the full history."""
+    from forecast_runner import setup_django
+    setup_django()
+
+    start_time = time.perf_counter()
+    forecaster = _fit_member(name, hospital_id, data_type, train_part)
+    training_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    validation_pred = _member_forecast(name, forecaster, train_part, pd.Timestamp(train_part['ds'].max()),
+                                       len(validation_part))
+    validation_time = time.perf_counter() - start_time
+
+    # The weights come from the validation window; forecasts use a fit that has seen all of it
+    full_data = pd.concat([train_part, validation_part], ignore_index=True)
+    start_time = time.perf_counter()
+    forecaster = _fit_member(name, hospital_id, data_type, full_data)
+    refit_time = time.perf_counter() - start_time
+
+    # Fitted Prophet models are not safely picklable, so send the state pre-serialized
+    return {
+        'name': name,
+        'state': dumps_forecaster_state(forecaster),
+        'history_end': pd.Timestamp(full_data['ds'].max()),
+        'validation_pred': validation_pred,
+        'training_time': training_time,
+        'validation_time': validation_time,
+        'refit_time': refit_time,
+    }
+
+
+class HutanoParallelEnsembleForecaster:
+    """Weighted ensemble of XGBoost, Random Forest and Prophet trained in parallel."""
+
+    def __init__(self, hospital_id=None, data_type='admissions', members=None, max_workers=None):
+        self.hospital_id = hospital_id
+        self.data_type = data_type
+        self.members = list(members or MEMBERS)
+        self.max_workers = max_workers or len(self.members)
+        self.models = {}
+        self.history_end = {}
+        self.weights = {}
+        self.performance = {}
+
+    def train_ensemble(self, train_data, validation_split=0.2):
+        """
+        Train all members concurrently and fit inverse-RMSE weights on the
+        validation window. Returns a performance dict with per-member metrics
+        and timings plus an 'ensemble' entry.
+        """
+        start_time = time.perf_counter()
+        data = train_data.sort_values('ds').reset_index(drop=True)
+        split = int(len(data) * (1 - validation_split))
+        train_part, validation_part = data.iloc[:split], data.iloc[split:]
+        actual = validation_part['y'].to_numpy(dtype=float)
+
+        predictions = {}
+        self.models, self.history_end, self.performance = {}, {}, {}
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(_train_member, name, self.hospital_id, self.data_type,
+                                train_part, validation_part): name
+                for name in self.members
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"Ensemble member {name} failed: {e}")
+                    self.performance[name] = {'status': 'failed', 'error': str(e)}
+                    continue
+
+                self.models[name] = pickle.loads(result['state'])
+                self.history_end[name] = result['history_end']
+                predictions[name] = result['validation_pred']
+                self.performance[name] = {
+                    'status': 'success',
+                    **self._score(actual, result['validation_pred']),
+                    'training_time': result['training_time'],
+                    'validation_time': result['validation_time'],
+                    'refit_time': result['refit_time'],
+                }
+
+        if not predictions:
+            raise RuntimeError("All ensemble members failed to train")
+
+        inverse_rmse = {name: 1.0 / max(self.performance[name]['rmse'], 1e-9) for name in predictions}
+        total = sum(inverse_rmse.values())
+        self.weights = {name: inverse_rmse.get(name, 0.0) / total for name in self.members}
+
+        ensemble_pred = sum(self.weights[name] * predictions[name] for name in predictions)
+        self.performance['ensemble'] = {
+            'status': 'success',
+            **self._score(actual, ensemble_pred),
+            'training_time': time.perf_counter() - start_time,
+            'weights': dict(self.weights),
+        }
+        logger.info(f"Ensemble trained in {self.performance['ensemble']['training_time']:.2f}s "
+                    f"with weights {self.weights}")
+        return self.performance
+
+    def generate_ensemble_forecast(self, train_data, periods=30):
+        """Weighted forecast of the next `periods` days after train_data."""
+        if not self.models:
+            raise ValueError("Ensemble has not been trained. Call train_ensemble first.")
+
+        history = train_data.sort_values('ds').reset_index(drop=True)
+        yhat = np.zeros(periods)
+        for name, forecaster in self.models.items():
+            yhat += self.weights[name] * _member_forecast(
+                name, forecaster, history, self.history_end[name], periods
+            )
+
+        future_dates = pd.date_range(history['ds'].iloc[-1] + pd.Timedelta(days=1), periods=periods, freq='D')
+        return pd.DataFrame({'ds': future_dates, 'yhat': yhat})
+
+    @staticmethod
+    def _score(actual, predicted):
+        metrics = forecast_metrics(actual, predicted)
+        return {name: metrics[name] for name in ['rmse', 'mae', 'mape', 'smape']}
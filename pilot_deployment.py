@@ -97,7 +97,22 @@ class PilotDeploymentManager:
             is_rural=False
         )
         print(f"✅ Created sample hospital: {hospital.name}")
+        self.create_cold_start_forecasts(hospital)
         return hospital
+
+    def create_cold_start_forecasts(self, hospital):
+        """Initial forecasts for a new hospital from similar existing hospitals."""
+        from cold_start import cold_start_forecast
+        from forecast_runner import PREDICTION_MODELS, ForecastJob, save_resource_predictions
+
+        for data_type in PREDICTION_MODELS:
+            try:
+                forecast, neighbours = cold_start_forecast(hospital, data_type)
+            except (ImportError, ValueError) as e:
+                print(f"⚠️ No cold-start {data_type} forecast: {e}")
+                continue
+            save_resource_predictions(ForecastJob(hospital.id, data_type), forecast)
+            print(f"✅ Cold-start {data_type} forecast from hospitals {neighbours}")
     
     def create_pilot_users(self, hospital):
         """Create pilot users for the hospital."""
@@ -0,0 +1,110 @@
+"""
+HUTANO Prediction Writer
+Bulk writes of forecast DataFrames into the prediction tables.
+
+A forecast frame (ds, yhat and optionally yhat_lower/yhat_upper) is converted
+column-wise and written with a single bulk_create inside one transaction,
+instead of one INSERT per forecast day.
+"""
+import time
+import logging
+
+import numpy as np
+import pandas as pd
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+
+def _forecast_columns(forecast):
+    """Convert a forecast frame to prediction dates and integer value arrays."""
+    dates = pd.to_datetime(forecast['ds']).dt.date.to_numpy()
+    yhat = forecast['yhat'].to_numpy(dtype=float)
+    lower = forecast['yhat_lower'].to_numpy(dtype=float) if 'yhat_lower' in forecast else yhat
+    upper = forecast['yhat_upper'].to_numpy(dtype=float) if 'yhat_upper' in forecast else yhat
+
+    # Casting NaN/inf to int gives huge garbage values, so they must never reach the cast
+    if not np.isfinite(yhat).all():
+        raise ValueError(f"Forecast has {int((~np.isfinite(yhat)).sum())} non-finite yhat values")
+    invalid = ~(np.isfinite(lower) & np.isfinite(upper))
+    if invalid.any():
+        logger.warning(f"Forecast has {int(invalid.sum())} non-finite interval bounds; using yhat for them")
+        lower = np.where(np.isfinite(lower), lower, yhat)
+        upper = np.where(np.isfinite(upper), upper, yhat)
+
+    # Truncate like int() did when rows were written one at a time
+    return (
+        dates,
+        np.trunc(yhat).astype(int).tolist(),
+        np.trunc(lower).astype(int).tolist(),
+        np.trunc(upper).astype(int).tolist(),
+    )
+
+
+def _bulk_upsert(model_cls, key, value_field, forecast, replace):
+    """Delete the rows a forecast supersedes and bulk insert it, in one transaction."""
+    start_time = time.perf_counter()
+    dates, yhat, lower, upper = _forecast_columns(forecast)
+
+    rows = [
+        model_cls(
+            prediction_date=prediction_date,
+            confidence_interval_lower=low,
+            confidence_interval_upper=high,
+            **{value_field: value},
+            **key
+        )
+        for prediction_date, value, low, high in zip(dates, yhat, lower, upper)
+    ]
+
+    with transaction.atomic():
+        existing = model_cls.objects.filter(**key)
+        if not replace:
+            existing = existing.filter(prediction_date__in=set(dates))
+        rows_deleted, _ = existing.delete()
+        model_cls.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+
+    return {
+        'rows_written': len(rows),
+        'rows_deleted': rows_deleted,
+        'elapsed': time.perf_counter() - start_time,
+    }
+
+
+def write_resource_predictions(hospital, prediction_model, resource_type, forecast, replace=True):
+    """
+    Write a forecast to ResourceDemandPrediction keyed on
+    (hospital, prediction_model, resource_type, prediction_date).
+
+    With replace=True every existing row for the hospital, model and resource
+    type is removed first, matching the old delete-then-create scripts. With
+    replace=False only rows on the forecast's dates are replaced.
+
+    Returns a dict with rows_written, rows_deleted and elapsed (seconds).
+    """
+    from prediction.models import ResourceDemandPrediction
+
+    key = {
+        'hospital_id': getattr(hospital, 'id', hospital),
+        'prediction_model_id': getattr(prediction_model, 'id', prediction_model),
+        'resource_type': resource_type,
+    }
+    return _bulk_upsert(ResourceDemandPrediction, key, 'predicted_demand', forecast, replace)
+
+
+def write_admission_predictions(hospital, prediction_model, forecast, replace=True):
+    """
+    Write a forecast to PatientAdmissionPrediction keyed on
+    (hospital, prediction_model, prediction_date).
+
+    Returns a dict with rows_written, rows_deleted and elapsed (seconds).
+    """
+    from prediction.models import PatientAdmissionPrediction
+
+    key = {
+        'hospital_id': getattr(hospital, 'id', hospital),
+        'prediction_model_id': getattr(prediction_model, 'id', prediction_model),
+    }
+    return _bulk_upsert(PatientAdmissionPrediction, key, 'predicted_admissions', forecast, replace)
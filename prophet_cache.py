@@ -0,0 +1,177 @@
+"""
+HUTANO Prophet Model Cache
+Serialized fitted Prophet models per hospital and data type.
+
+The nightly jobs refit the same hospitals and resource types every run even
+though the parameters barely move. The cache keeps the latest fitted model
+of each (hospital, data type, model configuration) as Prophet JSON, so
+linear, logistic (capacity-bounded) and differently seasoned models of one
+series never replace or warm-start each other:
+
+- fitting on exactly the same data returns the cached model without fitting,
+- fitting on new data warm-starts the optimizer from the cached model's
+  parameters (Prophet's stan init), which needs far fewer iterations,
+- the dashboard can load a cached model and forecast without fitting at all.
+
+Usage:
+    cache = HutanoProphetCache()
+    model = cache.fit(lambda: Prophet(weekly_seasonality=True), data, hospital_id=1, data_type='medication')
+
+    # Dashboard / API: no fitting
+    forecast = cache.forecast(hospital_id=1, data_type='medication', periods=30)
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+
+from model_registry import frame_fingerprint
+from prophet_fast import fast_prophet_forecast
+
+try:
+    from prophet.serialize import model_to_json, model_from_json
+    PROPHET_AVAILABLE = True
+except ImportError:
+    PROPHET_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+PROPHET_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prediction', 'prophet_models')
+
+# Constructor settings that must match for a cached model to be reused or warm-started from
+CONFIG_ATTRS = [
+    'growth', 'n_changepoints', 'changepoint_range', 'yearly_seasonality', 'weekly_seasonality',
+    'daily_seasonality', 'seasonality_mode', 'seasonality_prior_scale', 'changepoint_prior_scale',
+    'holidays_prior_scale', 'interval_width',
+]
+AUTO_SEASONALITIES = {'yearly', 'weekly', 'daily'}
+
+
+def stan_init(model):
+    """Fitted Prophet parameters in the form Prophet.fit(init=...) expects."""
+    return {
+        name: model.params[name][0][0] if name in ('k', 'm', 'sigma_obs') else model.params[name][0]
+        for name in ('k', 'm', 'sigma_obs', 'delta', 'beta')
+    }
+
+
+def config_digest(model, data=None):
+    """
+    Short hash of a Prophet model's growth, seasonalities, priors and cap,
+    identical for a model before and after fitting. The cap is read from the
+    fitted history, or from data for an unfitted model.
+    """
+    config = {name: getattr(model, name, None) for name in CONFIG_ATTRS}
+    # Fitting adds the automatic seasonalities; only the ones added explicitly are configuration
+    config['seasonalities'] = {name: props for name, props in model.seasonalities.items()
+                               if name not in AUTO_SEASONALITIES}
+    frame = model.history if model.history is not None else data
+    if frame is not None and 'cap' in frame:
+        config['cap'] = float(frame['cap'].iloc[-1])
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()[:12]
+
+
+class HutanoProphetCache:
+    """Latest fitted Prophet model per (hospital, data type, configuration), stored as JSON."""
+
+    def __init__(self, cache_dir=PROPHET_CACHE_DIR):
+        if not PROPHET_AVAILABLE:
+            raise ImportError("prophet is required for the Prophet model cache")
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, hospital_id, data_type, digest):
+        return os.path.join(self.cache_dir, f"{data_type}_{hospital_id}_{digest}.json")
+
+    def _latest_path(self, hospital_id, data_type):
+        """Most recently saved model of a series in any configuration, or None."""
+        prefix = f"{data_type}_{hospital_id}_"
+        paths = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.startswith(prefix) and entry.name.endswith('.json'):
+                try:
+                    paths.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:
+                    continue
+        return max(paths)[1] if paths else None
+
+    def load(self, hospital_id, data_type, digest=None):
+        """
+        Return (model, metadata) for the cached model with the configuration
+        digest, or the latest model of the series if digest is None;
+        (None, None) if there is none.
+        """
+        path = self._path(hospital_id, data_type, digest) if digest else self._latest_path(hospital_id, data_type)
+        if path is None:
+            return None, None
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            return model_from_json(entry['model']), entry['meta']
+        except FileNotFoundError:
+            return None, None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable Prophet model for {data_type} hospital {hospital_id}: {e}")
+            return None, None
+
+    def save(self, model, hospital_id, data_type, data=None, fit_time=None, warm_start=False):
+        """Write a fitted model atomically, with the fingerprint of the data it was fitted on."""
+        path = self._path(hospital_id, data_type, config_digest(model))
+        entry = {
+            'model': model_to_json(model),
+            'meta': {
+                'fingerprint': frame_fingerprint(data) if data is not None else None,
+                'trained_until': str(model.history['ds'].max()),
+                'fit_time': fit_time,
+                'warm_start': warm_start,
+                'saved': time.time(),
+            },
+        }
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def fit(self, make_model, data, hospital_id, data_type):
+        """
+        Fit a Prophet model on data, reusing the cache where possible.
+
+        make_model() must return a new, unfitted Prophet with the desired
+        configuration. Only a cached model with the same configuration is
+        used: unchanged data returns it as is; new data warm-starts from its
+        parameters and falls back to a cold fit if the warm start fails.
+        """
+        previous, meta = self.load(hospital_id, data_type, config_digest(make_model(), data))
+        if previous is not None and meta['fingerprint'] == frame_fingerprint(data):
+            logger.info(f"Reusing cached Prophet model for {data_type} hospital {hospital_id}")
+            return previous
+
+        start_time = time.perf_counter()
+        model, warm_start = None, False
+        if previous is not None:
+            try:
+                model = make_model().fit(data, init=stan_init(previous))
+                warm_start = True
+            except Exception as e:
+                logger.warning(f"Warm start failed for {data_type} hospital {hospital_id}, fitting cold: {e}")
+                model = None
+        if model is None:
+            model = make_model().fit(data)
+        fit_time = time.perf_counter() - start_time
+
+        logger.info(f"Fitted Prophet for {data_type} hospital {hospital_id} in {fit_time:.2f}s"
+                    f"{' (warm start)' if warm_start else ''}")
+        self.save(model, hospital_id, data_type, data, fit_time, warm_start)
+        return model
+
+    def forecast(self, hospital_id, data_type, periods=30, uncertainty_samples=0):
+        """Forecast from the cached model without fitting; None if no model is cached."""
+        model, _ = self.load(hospital_id, data_type)
+        if model is None:
+            return None
+        return fast_prophet_forecast(model, periods=periods, uncertainty_samples=uncertainty_samples)
@@ -0,0 +1,116 @@
+"""
+HUTANO Fast Prophet Prediction
+Future-only Prophet forecasts without full trajectory sampling.
+
+Prophet's predict() runs over every row of make_future_dataframe (the whole
+history plus the horizon) and simulates `uncertainty_samples` trajectories
+(1000 by default) to get yhat_lower/yhat_upper. Nightly jobs only store the
+future rows, so the fast predictor:
+
+- builds features for the future dates only,
+- computes trend and seasonal components directly, caching the seasonal
+  arrays per model and date range at module level, so repeated calls
+  (dashboards, several horizons of the same run, fast_prophet_forecast on
+  the same model) skip that work,
+- gives intervals analytically from the fitted observation noise
+  (sigma_obs), or from a small number of Prophet's own trajectory samples.
+
+The analytic band covers observation noise only, so it does not widen with
+the horizon the way Prophet's trend-uncertainty simulation does; pass
+uncertainty_samples (e.g. 100) where that matters.
+
+Usage:
+    predictor = HutanoFastProphetPredictor(model)
+    forecast = predictor.predict(periods=30)  # ds, yhat, yhat_lower, yhat_upper
+
+    forecast = fast_prophet_forecast(model, periods=30, uncertainty_samples=100)
+"""
+import logging
+import weakref
+
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+logger = logging.getLogger(__name__)
+
+SEASONAL_CACHE_RANGES = 32  # date ranges kept per model
+
+# fitted model -> {date range key: (additive, multiplicative)}; entries go away with their model
+_seasonal_cache = weakref.WeakKeyDictionary()
+
+
+class HutanoFastProphetPredictor:
+    """Fast future-only predictions from a fitted Prophet model."""
+
+    def __init__(self, model, uncertainty_samples=0, interval_width=None):
+        if model.history is None:
+            raise ValueError("Prophet model has not been fitted")
+        self.model = model
+        self.uncertainty_samples = uncertainty_samples
+        self.interval_width = interval_width or model.interval_width
+
+    def future_dataframe(self, periods):
+        """Daily dates for the `periods` days after the training history."""
+        last_date = self.model.history['ds'].max()
+        return pd.DataFrame({'ds': pd.date_range(last_date + pd.Timedelta(days=1), periods=periods, freq='D')})
+
+    def _seasonal_components(self, df):
+        """Additive and multiplicative seasonal terms for df, cached per date range."""
+        extra = [name for name in self.model.extra_regressors if name in df]
+        key = (df['ds'].iloc[0], df['ds'].iloc[-1], len(df),
+               pd.util.hash_pandas_object(df[extra], index=False).sum() if extra else None)
+        cache = _seasonal_cache.setdefault(self.model, {})
+        if key not in cache:
+            if len(cache) >= SEASONAL_CACHE_RANGES:
+                cache.pop(next(iter(cache)))
+            components = self.model.predict_seasonal_components(df)
+            cache[key] = (
+                components['additive_terms'].to_numpy(),
+                components['multiplicative_terms'].to_numpy(),
+            )
+        return cache[key]
+
+    def predict(self, periods=30, future=None):
+        """
+        Forecast `periods` days after the history, or the rows of `future`
+        (needed for cap/floor or extra regressor columns).
+        Returns ds, trend, yhat, yhat_lower, yhat_upper.
+        """
+        if future is None:
+            future = self.future_dataframe(periods)
+
+        if self.uncertainty_samples:
+            return self._sampled_predict(future)
+
+        df = self.model.setup_dataframe(future.copy())
+        trend = self.model.predict_trend(df).to_numpy()
+        additive, multiplicative = self._seasonal_components(df)
+        yhat = trend * (1 + multiplicative) + additive
+
+        # sigma_obs is fitted on the scaled target; convert back to data units
+        sigma = float(np.mean(self.model.params['sigma_obs'])) * self.model.y_scale
+        half_width = norm.ppf(0.5 + self.interval_width / 2) * sigma
+        return pd.DataFrame({
+            'ds': df['ds'].to_numpy(),
+            'trend': trend,
+            'yhat': yhat,
+            'yhat_lower': yhat - half_width,
+            'yhat_upper': yhat + half_width,
+        })
+
+    def _sampled_predict(self, future):
+        """Prophet's own predict on the future rows only, with a reduced sample count."""
+        original = (self.model.uncertainty_samples, self.model.interval_width)
+        self.model.uncertainty_samples, self.model.interval_width = self.uncertainty_samples, self.interval_width
+        try:
+            forecast = self.model.predict(future)
+        finally:
+            self.model.uncertainty_samples, self.model.interval_width = original
+        return forecast[['ds', 'trend', 'yhat', 'yhat_lower', 'yhat_upper']]
+
+
+def fast_prophet_forecast(model, periods=30, uncertainty_samples=0, interval_width=None, future=None):
+    """One-off fast forecast of the `periods` days after a fitted model's history."""
+    predictor = HutanoFastProphetPredictor(model, uncertainty_samples, interval_width)
+    return predictor.predict(periods, future=future)
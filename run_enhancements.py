@@ -1,7 +1,8 @@
 """
 Script to run all enhancements for the HUTANO system.
 This script will:
-1. Implement staff forecasting
+1. Implement staff forecasting (only hospitals whose staff data has drifted;
+   pass --retrain-all to retrain every hospital)
 2. Run anomaly detection on existing data
 3. Set up automated data collection
 """
@@ -23,43 +24,30 @@ django.setup()
 
 # Import models after Django setup
 from core.models import Hospital
-from prediction.models import PredictionModel, ResourceDemandPrediction
 from prediction.anomaly_detection import AnomalyDetector, detect_anomalies
 from prediction.data_collector import HospitalDataCollector, collect_data_for_all_hospitals
+from prophet_cache import HutanoProphetCache
+from prophet_fast import fast_prophet_forecast
+from forecast_runner import (HutanoForecastRunner, ForecastJob, get_prediction_model, load_processed_data,
+                             save_resource_predictions)
+from drift_detection import HutanoDriftMonitor
+from series_store import list_series, read_series, write_series
 
-def implement_staff_forecasting():
-    """Implement staff forecasting for all hospitals."""
-    logger.info("Implementing staff forecasting...")
+def staff_forecast_job(job):
+    """Fit a staff requirement Prophet model for one hospital (runs in a worker process)."""
+    from prophet import Prophet
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
     
-    # Create staff forecasting model
-    model, created = PredictionModel.objects.get_or_create(
-        name="Prophet Staff Requirement Forecast",
-        model_type="prophet",
-        defaults={
-            'description': "Facebook Prophet model for forecasting staff requirements",
-            'parameters': {'seasonality_mode': 'additive', 'horizon': 30}
-        }
-    )
-    
-    if created:
-        logger.info("Created new staff requirement model")
-    else:
-        logger.info("Using existing staff requirement model")
+    hospital = Hospital.objects.get(id=job.hospital_id)
     
-    # Get all hospitals
-    hospitals = Hospital.objects.all()
-    logger.info(f"Found {hospitals.count()} hospitals")
+    # Train on the stored staff series, the same data the drift monitor scans
+    data = load_processed_data(hospital.id, 'staff')
     
-    for hospital in hospitals:
-        logger.info(f"Processing hospital: {hospital.name} (ID: {hospital.id})")
-        
-        # Generate sample staff data
-        collector = HospitalDataCollector(hospital.id)
-        data = collector.collect_staff_data()
-        
-        # Create a simple Prophet model
-        from prophet import Prophet
-        prophet_model = Prophet(
+    # Create a simple Prophet model
+    def make_model():
+        return Prophet(
             yearly_seasonality=True,
             weekly_seasonality=True,
             daily_seasonality=False,
@@ -67,86 +55,96 @@ def implement_staff_forecasting():
             changepoint_prior_scale=0.05,
             seasonality_prior_scale=10.0
         )
-        
-        # Fit the model
-        logger.info(f"Fitting model with {len(data)} records")
-        prophet_model.fit(data)
-        
-        # Generate forecast
-        logger.info(f"Generating forecast for 30 periods")
-        future = prophet_model.make_future_dataframe(periods=30)
-        forecast = prophet_model.predict(future)
-        logger.info(f"Forecast generated with {len(forecast)} records")
-        
-        # Save forecast plots
-        logger.info(f"Saving forecast plots")
-        import matplotlib.pyplot as plt
-        
-        # Create forecasts directory if it doesn't exist
-        forecasts_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prediction', 'forecasts')
-        os.makedirs(forecasts_dir, exist_ok=True)
-        
-        # Save forecast plot
-        fig = prophet_model.plot(forecast)
-        plt.title(f'Staff Requirement Forecast for {hospital.name}')
-        plt.savefig(os.path.join(forecasts_dir, f"staff_{hospital.id}_forecast.png"), dpi=300, bbox_inches='tight')
-        
-        # Save components plot
-        fig = prophet_model.plot_components(forecast)
-        plt.savefig(os.path.join(forecasts_dir, f"staff_{hospital.id}_components.png"), dpi=300, bbox_inches='tight')
-        
-        # Save predictions to database
-        logger.info(f"Saving predictions to database")
-        future_forecast = forecast.tail(30)  # Only future predictions
-        
-        # Delete existing predictions
-        ResourceDemandPrediction.objects.filter(
-            hospital=hospital,
-            prediction_model=model,
-            resource_type='staff'
-        ).delete()
-        
-        for i, (_, row) in enumerate(future_forecast.iterrows()):
-            prediction_date = row['ds'].date()
-            
-            # Create prediction
-            prediction = ResourceDemandPrediction.objects.create(
-                hospital=hospital,
-                prediction_model=model,
-                resource_type='staff',
-                prediction_date=prediction_date,
-                predicted_demand=int(row['yhat']),
-                confidence_interval_lower=int(row['yhat_lower']),
-                confidence_interval_upper=int(row['yhat_upper'])
-            )
-            
-            if i < 5:  # Print first 5 predictions for debugging
-                logger.info(f"Created prediction for {prediction_date}: {int(row['yhat'])}")
-        
-        logger.info(f"Created {len(future_forecast)} staff requirement predictions for {hospital.name}")
+    
+    # Fit the model, warm-starting from the hospital's previous staff fit
+    logger.info(f"Fitting model with {len(data)} records for {hospital.name}")
+    prophet_model = HutanoProphetCache().fit(make_model, data, hospital.id, 'staff')
+    
+    if not job.save_plots:
+        # Only future rows are returned, so predict just those with analytic intervals
+        return fast_prophet_forecast(prophet_model, periods=job.periods)[['ds', 'yhat', 'yhat_lower', 'yhat_upper']]
+    
+    # Generate forecast
+    future = prophet_model.make_future_dataframe(periods=job.periods)
+    forecast = prophet_model.predict(future)
+    
+    # Create forecasts directory if it doesn't exist
+    forecasts_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prediction', 'forecasts')
+    os.makedirs(forecasts_dir, exist_ok=True)
+    
+    # Save forecast plot
+    fig = prophet_model.plot(forecast)
+    plt.title(f'Staff Requirement Forecast for {hospital.name}')
+    plt.savefig(os.path.join(forecasts_dir, f"staff_{hospital.id}_forecast.png"), dpi=300, bbox_inches='tight')
+    
+    # Save components plot
+    fig = prophet_model.plot_components(forecast)
+    plt.savefig(os.path.join(forecasts_dir, f"staff_{hospital.id}_components.png"), dpi=300, bbox_inches='tight')
+
+    # Only future predictions go back to the parent process
+    return forecast.tail(job.periods)[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].reset_index(drop=True)
+
+def implement_staff_forecasting(max_workers=None, retrain_all=False):
+    """Implement staff forecasting for hospitals whose staff data has drifted (or all of them)."""
+    logger.info("Implementing staff forecasting...")
+    
+    # Create staff forecasting model
+    model = get_prediction_model('staff')
+    logger.info(f"Using staff requirement model: {model.name}")
+    
+    # Get all hospitals
+    hospitals = Hospital.objects.all()
+    logger.info(f"Found {hospitals.count()} hospitals")
+    
+    # Only retrain series whose data has drifted since their last training
+    monitor = HutanoDriftMonitor()
+    hospital_ids = list(hospitals.values_list('id', flat=True))
+    for hospital_id in hospital_ids:
+        # Collect fresh staff data every run and merge it into the stored series (new values win),
+        # so the scan and the fit see the same, current data
+        collected = HospitalDataCollector(hospital_id).collect_staff_data()
+        collected = collected.assign(ds=pd.to_datetime(collected['ds']))
+        stored = read_series(hospital_id, 'staff')
+        if stored is not None:
+            collected = pd.concat([stored, collected], ignore_index=True).drop_duplicates('ds', keep='last')
+        write_series(hospital_id, 'staff', collected.sort_values('ds').reset_index(drop=True))
+    if not retrain_all:
+        hospital_ids = [hospital_id for hospital_id, _ in monitor.scan(hospital_ids, ['staff'])]
+        logger.info(f"{len(hospital_ids)} hospitals need staff retraining")
+    
+    # Fit one model per hospital in parallel; predictions are saved by this process
+    jobs = [ForecastJob(hospital_id, 'staff', periods=30, save_plots=True) for hospital_id in hospital_ids]
+    runner = HutanoForecastRunner(job_func=staff_forecast_job, max_workers=max_workers)
+    results = runner.run(jobs, on_result=save_resource_predictions)
+    
+    for r in results:
+        if r['status'] == 'success':
+            monitor.mark_retrained(r['hospital_id'], 'staff')
+    monitor.save()
+    
+    created = sum(1 for r in results if r['status'] == 'success')
+    logger.info(f"Created staff requirement predictions for {created} of {len(results)} hospitals")
+    return results
 
 def run_anomaly_detection():
     """Run anomaly detection on existing data."""
     logger.info("Running anomaly detection...")
     
-    # Get data directory
-    data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prediction', 'data')
+    # Get output directory
     output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prediction', 'anomalies')
     os.makedirs(output_dir, exist_ok=True)
     
-    # Find all processed data files
-    import glob
-    data_files = glob.glob(os.path.join(data_dir, "*_processed.csv"))
-    logger.info(f"Found {len(data_files)} data files")
+    # Find all processed series
+    data_series = list_series()
+    logger.info(f"Found {len(data_series)} data files")
     
-    for data_file in data_files:
-        file_name = os.path.basename(data_file)
+    for hospital_id, data_type in data_series:
+        file_name = data_type if hospital_id is None else f"{data_type}_{hospital_id}"
         logger.info(f"Detecting anomalies in {file_name}...")
         
         try:
-            # Load data
-            data = pd.read_csv(data_file)
-            data['ds'] = pd.to_datetime(data['ds'])
+            # Load data (dates are already typed in the store)
+            data = read_series(hospital_id, data_type)
             
             # Initialize anomaly detector
             detector = AnomalyDetector(contamination=0.05)
@@ -156,11 +154,11 @@ def run_anomaly_detection():
             result = detector.predict(data)
             
             # Save results
-            output_file = os.path.join(output_dir, file_name.replace('_processed.csv', '_anomalies.csv'))
+            output_file = os.path.join(output_dir, f"{file_name}_anomalies.csv")
             result.to_csv(output_file, index=False)
             
             # Plot anomalies
-            output_plot = os.path.join(output_dir, file_name.replace('_processed.csv', '_anomalies.png'))
+            output_plot = os.path.join(output_dir, f"{file_name}_anomalies.png")
             detector.plot_anomalies(result, output_plot)
             
             # Log results
@@ -182,12 +180,12 @@ def setup_automated_data_collection():
     
     logger.info("Automated data collection set up successfully")
 
-def main():
+def main(retrain_all=False):
     """Main function to run all enhancements."""
     logger.info("Running all enhancements for HUTANO system...")
     
-    # Implement staff forecasting
-    implement_staff_forecasting()
+    # Implement staff forecasting (drifted hospitals only unless retrain_all)
+    implement_staff_forecasting(retrain_all=retrain_all)
     
     # Run anomaly detection
     run_anomaly_detection()
@@ -198,4 +196,4 @@ def main():
     logger.info("All enhancements completed successfully!")
 
 if __name__ == "__main__":
-    main()
+    main(retrain_all='--retrain-all' in sys.argv)
@@ -0,0 +1,158 @@
+"""
+HUTANO Series Store
+Processed forecast inputs stored as typed columnar partitions.
+
+Processed series used to live in prediction/data/{data_type}_{hospital_id}_processed.csv
+and every reader re-parsed the text and converted the dates with
+pd.to_datetime. The store keeps each series as a NumPy .npz partition per
+hospital:
+
+    prediction/data/hospital_{hospital_id}/{data_type}.npz
+
+with one typed array per column (datetime64 dates, numeric values), so a
+load is a binary read with no parsing, and date conversion happens once,
+when the series is written. Series not tied to one hospital (e.g. the
+per-medication usage frame) go to the 'all' partition.
+
+Existing CSV files are still read: the first read of a legacy CSV converts
+it into a partition, and a CSV written after its partition (by an older
+script) is picked up again.
+
+Usage:
+    write_series(hospital_id, 'bed_occupancy', data)
+    data = read_series(hospital_id, 'bed_occupancy')   # ds is already datetime64
+    for hospital_id, data_type in list_series('admissions'): ...
+"""
+import os
+import re
+import glob
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prediction', 'data')
+DATE_COLUMNS = ['ds', 'date']
+COLUMNS_KEY = '__columns__'
+
+_LEGACY_CSV = re.compile(r'^(?P<data_type>.+?)(?:_(?P<hospital_id>\d+))?_processed\.csv$')
+_PARTITION = re.compile(r'^hospital_(?P<hospital_id>\d+|all)$')
+
+
+def _partition(hospital_id):
+    return 'all' if hospital_id is None else str(hospital_id)
+
+
+def series_path(hospital_id, data_type, data_dir=DATA_DIR):
+    """Path of a series partition (hospital_id=None for the cross-hospital partition)."""
+    return os.path.join(data_dir, f"hospital_{_partition(hospital_id)}", f"{data_type}.npz")
+
+
+def legacy_csv_path(hospital_id, data_type, data_dir=DATA_DIR):
+    name = f"{data_type}_processed.csv" if hospital_id is None else f"{data_type}_{hospital_id}_processed.csv"
+    return os.path.join(data_dir, name)
+
+
+def _column_array(column):
+    """Typed array for one frame column: datetime64, numeric, or fixed-width unicode."""
+    if pd.api.types.is_datetime64_any_dtype(column):
+        return column.to_numpy(dtype='datetime64[ns]')
+    if pd.api.types.is_numeric_dtype(column) or pd.api.types.is_bool_dtype(column):
+        if isinstance(column.dtype, pd.api.extensions.ExtensionDtype):
+            # Nullable Int64/boolean columns convert to object arrays, which np.load refuses without pickle
+            return column.to_numpy(dtype=float, na_value=np.nan)
+        return column.to_numpy()
+    return column.astype(str).to_numpy(dtype=str)
+
+
+def _parse_dates(data):
+    data = data.copy()
+    for name in DATE_COLUMNS:
+        if name in data and not pd.api.types.is_datetime64_any_dtype(data[name]):
+            data[name] = pd.to_datetime(data[name])
+    return data
+
+
+def write_series(hospital_id, data_type, data, data_dir=DATA_DIR):
+    """Write a frame as a typed partition; date columns are converted here, once. Returns the path."""
+    data = _parse_dates(data)
+    path = series_path(hospital_id, data_type, data_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    arrays = {str(name): _column_array(data[name]) for name in data.columns}
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **{COLUMNS_KEY: np.array(list(arrays), dtype=str)}, **arrays)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _read_partition(path):
+    with np.load(path) as stored:
+        return pd.DataFrame({str(name): stored[str(name)] for name in stored[COLUMNS_KEY]})
+
+
+def _csv_is_newer(path, csv_path):
+    """True if a legacy CSV exists and its partition is missing or older."""
+    return os.path.exists(csv_path) and (not os.path.exists(path) or os.path.getmtime(csv_path) > os.path.getmtime(path))
+
+
+def _convert_csv(hospital_id, data_type, csv_path, data_dir):
+    """Read a legacy CSV and write it as a partition; returns (data, whether the partition was written)."""
+    data = _parse_dates(pd.read_csv(csv_path))
+    try:
+        write_series(hospital_id, data_type, data, data_dir)
+    except OSError as e:
+        logger.warning(f"Could not convert {csv_path} to a series partition: {e}")
+        return data, False
+    return data, True
+
+
+def read_series(hospital_id, data_type, data_dir=DATA_DIR):
+    """Load a series as a DataFrame, converting a newer legacy CSV on the way; None if absent."""
+    path = series_path(hospital_id, data_type, data_dir)
+    csv_path = legacy_csv_path(hospital_id, data_type, data_dir)
+    if _csv_is_newer(path, csv_path):
+        return _convert_csv(hospital_id, data_type, csv_path, data_dir)[0]
+    if not os.path.exists(path):
+        return None
+    return _read_partition(path)
+
+
+def series_exists(hospital_id, data_type, data_dir=DATA_DIR):
+    return (os.path.exists(series_path(hospital_id, data_type, data_dir))
+            or os.path.exists(legacy_csv_path(hospital_id, data_type, data_dir)))
+
+
+def list_series(data_type=None, data_dir=DATA_DIR):
+    """Sorted (hospital_id, data_type) pairs of every stored series (hospital_id None for 'all')."""
+    found = set()
+    for path in glob.glob(os.path.join(data_dir, 'hospital_*', '*.npz')):
+        match = _PARTITION.match(os.path.basename(os.path.dirname(path)))
+        if match:
+            hospital_id = match['hospital_id']
+            found.add((None if hospital_id == 'all' else int(hospital_id),
+                       os.path.splitext(os.path.basename(path))[0]))
+    for path in glob.glob(os.path.join(data_dir, '*_processed.csv')):
+        match = _LEGACY_CSV.match(os.path.basename(path))
+        if match:
+            found.add((int(match['hospital_id']) if match['hospital_id'] else None, match['data_type']))
+
+    pairs = [pair for pair in found if data_type is None or pair[1] == data_type]
+    return sorted(pairs, key=lambda pair: (pair[1], -1 if pair[0] is None else pair[0]))
+
+
+def migrate_csv(data_dir=DATA_DIR):
+    """Convert every legacy processed CSV newer than its partition; returns the number written."""
+    converted = 0
+    for hospital_id, data_type in list_series(data_dir=data_dir):
+        csv_path = legacy_csv_path(hospital_id, data_type, data_dir)
+        if _csv_is_newer(series_path(hospital_id, data_type, data_dir), csv_path):
+            converted += _convert_csv(hospital_id, data_type, csv_path, data_dir)[1]
+    return converted
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    print(f"Converted {migrate_csv()} processed CSV files in {DATA_DIR}")
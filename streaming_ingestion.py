@@ -0,0 +1,265 @@
+"""
+HUTANO Streaming Ingestion
+Chunked processing of large DocumentUpload files at constant memory.
+
+DataProcessor.process_document reads a whole upload into memory before
+processing it, which stalls the web worker on multi-year patient-level
+exports of several hundred MB. The streaming ingestor never holds more than
+one chunk:
+
+- CSV files are read with pandas in fixed-size chunks,
+- Excel files are read through openpyxl's read-only row iterator,
+- each chunk is validated, transformed and bulk written before the next one
+  is read,
+- progress (rows processed / failed, percent done) is recorded on the
+  DocumentUpload row after every chunk.
+
+Each chunk is committed in its own transaction. Once it commits, the
+number of source rows done is stored in a checkpoint file for the upload.
+A failed upload that is run again resumes after that row, so patient-level
+rows (which have no key to upsert on) are never inserted twice. The
+checkpoint is removed when the upload completes.
+
+The result has the same shape as DataProcessor.process_document
+({'success', 'result': {'created', 'updated', 'failed'}}), so callers can
+switch between the two; process_upload() streams files above
+STREAMING_THRESHOLD_BYTES and leaves small ones to DataProcessor.
+
+Usage:
+    result = HutanoStreamingIngestor(document_upload).process_document()
+    result = process_upload(document_upload)
+"""
+import os
+import json
+import time
+import logging
+
+import pandas as pd
+from django.db import models, transaction
+
+from daily_metrics import upsert_daily_metrics
+
+logger = logging.getLogger(__name__)
+
+CHUNK_ROWS = 5000
+BATCH_SIZE = 500
+STREAMING_THRESHOLD_BYTES = 20 * 1024 * 1024
+CHECKPOINT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prediction', 'upload_checkpoints')
+
+# DocumentUpload progress columns, written when the model has them
+PROGRESS_FIELDS = ['records_processed', 'records_failed', 'processing_progress']
+
+# document_type -> (model name in core.models, required columns, date columns, upsert key date field)
+DOCUMENT_TYPES = {
+    'daily_metrics': ('DailyMetrics', ['date', 'admissions'], ['date'], 'date'),
+    'patient_data': ('PatientAdmission', ['admission_date'], ['admission_date', 'discharge_date'], None),
+}
+
+
+def iter_csv_chunks(fileobj, chunksize=CHUNK_ROWS):
+    """DataFrames of up to chunksize rows from a CSV file object."""
+    yield from pd.read_csv(fileobj, chunksize=chunksize)
+
+
+def iter_excel_chunks(fileobj, chunksize=CHUNK_ROWS):
+    """DataFrames of up to chunksize rows from the first sheet, via openpyxl's read-only iterator."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(name).strip() if name is not None else f'column_{i}'
+                  for i, name in enumerate(next(rows, []))]
+        chunk = []
+        for row in rows:
+            if any(value is not None for value in row):
+                chunk.append(row[:len(header)])
+            if len(chunk) >= chunksize:
+                yield pd.DataFrame(chunk, columns=header)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header)
+    finally:
+        workbook.close()
+
+
+def excel_row_count(fileobj):
+    """Data rows of the first sheet from its stored dimensions (no rows are read), or None."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(fileobj, read_only=True)
+    try:
+        max_row = workbook.worksheets[0].max_row
+        return max_row - 1 if max_row else None
+    finally:
+        workbook.close()
+
+
+class HutanoStreamingIngestor:
+    """Validates, transforms and writes a DocumentUpload file one chunk at a time."""
+
+    def __init__(self, document_upload, chunksize=CHUNK_ROWS):
+        if document_upload.document_type not in DOCUMENT_TYPES:
+            raise ValueError(f"Streaming ingestion does not support {document_upload.document_type} uploads")
+        from django.apps import apps
+
+        self.upload = document_upload
+        self.chunksize = chunksize
+        model_name, self.required, self.date_columns, self.key_field = DOCUMENT_TYPES[document_upload.document_type]
+        self.model_cls = apps.get_model('core', model_name)
+        fields = [field for field in self.model_cls._meta.concrete_fields if field.name not in ('id', 'hospital')]
+        self.model_fields = {field.name for field in fields}
+        self.numeric_fields = [field.name for field in fields
+                               if isinstance(field, (models.IntegerField, models.FloatField, models.DecimalField))]
+
+        upload_fields = {field.name for field in type(document_upload)._meta.concrete_fields}
+        self.progress_fields = [name for name in PROGRESS_FIELDS if name in upload_fields]
+        self.counts = {'created': 0, 'updated': 0, 'failed': 0}
+
+    @property
+    def is_excel(self):
+        return os.path.splitext(self.upload.original_filename or self.upload.file.name)[1].lower() in ('.xlsx', '.xlsm')
+
+    def _set_status(self, status, **fields):
+        type(self.upload).objects.filter(pk=self.upload.pk).update(processing_status=status, **fields)
+
+    def _record_progress(self, fraction):
+        values = {
+            'records_processed': self.counts['created'] + self.counts['updated'],
+            'records_failed': self.counts['failed'],
+            'processing_progress': round(100 * min(fraction, 1.0), 1),
+        }
+        fields = {name: values[name] for name in self.progress_fields}
+        if fields:
+            type(self.upload).objects.filter(pk=self.upload.pk).update(**fields)
+
+    def validate(self, chunk):
+        """Normalize column names, parse dates and numbers; return (valid rows, number of invalid rows)."""
+        chunk = chunk.rename(columns=lambda name: str(name).strip().lower().replace(' ', '_'))
+        missing = [column for column in self.required if column not in chunk.columns]
+        if missing:
+            raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+        chunk = chunk[[column for column in chunk.columns if column in self.model_fields]].copy()
+        for column in self.date_columns:
+            if column in chunk:
+                chunk[column] = pd.to_datetime(chunk[column], errors='coerce')
+        for column in self.numeric_fields:
+            if column in chunk:
+                chunk[column] = pd.to_numeric(chunk[column], errors='coerce')
+
+        valid = chunk[self.required].notna().all(axis=1).to_numpy()
+        return chunk[valid], int((~valid).sum())
+
+    def _records(self, chunk):
+        """Model field values per row, with NaN/NaT as None and dates as dates."""
+        chunk = chunk.astype(object).where(chunk.notna(), None)
+        if self.key_field is not None:
+            chunk[self.key_field] = [value.date() for value in chunk[self.key_field]]
+        return chunk.to_dict('records')
+
+    def write(self, chunk):
+        """Bulk write one validated chunk; daily rows replace existing rows for the same date."""
+        records = self._records(chunk)
+        hospital_id = self.upload.hospital_id
+        if self.key_field is not None:
+            # Daily aggregates are upserted with one lookup for the whole chunk
+            created, updated = upsert_daily_metrics(hospital_id, records)
+            self.counts['created'] += created
+            self.counts['updated'] += updated
+            return
+
+        self.model_cls.objects.bulk_create(
+            [self.model_cls(hospital_id=hospital_id, **record) for record in records],
+            batch_size=BATCH_SIZE)
+        self.counts['created'] += len(records)
+
+    @property
+    def checkpoint_path(self):
+        return os.path.join(CHECKPOINT_DIR, f"{self.upload.pk}.json")
+
+    def load_checkpoint(self):
+        """(source rows already committed, counts at that point) from an earlier run, or (0, None)."""
+        try:
+            with open(self.checkpoint_path) as f:
+                checkpoint = json.load(f)
+            return checkpoint['rows_committed'], checkpoint['counts']
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return 0, None
+
+    def _save_checkpoint(self, rows_committed, counts):
+        os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+        tmp_path = f"{self.checkpoint_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'rows_committed': rows_committed, 'counts': counts}, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _clear_checkpoint(self):
+        try:
+            os.remove(self.checkpoint_path)
+        except FileNotFoundError:
+            pass
+
+    def process_document(self):
+        """Stream the upload through validate and write, chunk by chunk, resuming after committed rows."""
+        start_time = time.perf_counter()
+        self._set_status('processing')
+        resume_from, counts = self.load_checkpoint()
+        if counts is not None:
+            self.counts = counts
+            logger.info(f"Resuming upload {self.upload.pk} after {resume_from} committed rows")
+        try:
+            with self.upload.file.open('rb') as fileobj:
+                if self.is_excel:
+                    total_rows = excel_row_count(fileobj)
+                    fileobj.seek(0)
+                    chunks = iter_excel_chunks(fileobj, self.chunksize)
+                else:
+                    total_rows = None
+                    chunks = iter_csv_chunks(fileobj, self.chunksize)
+                file_size = self.upload.file_size or self.upload.file.size
+
+                rows_read = 0
+                for chunk in chunks:
+                    chunk_start = rows_read
+                    rows_read += len(chunk)
+                    if rows_read <= resume_from:
+                        # Committed by an earlier run of this upload
+                        continue
+                    chunk = chunk.iloc[max(resume_from - chunk_start, 0):]
+
+                    valid, failed = self.validate(chunk)
+                    with transaction.atomic():
+                        self.write(valid)
+                        self.counts['failed'] += failed
+                        # Record the offset only once the chunk's rows are really committed
+                        transaction.on_commit(
+                            lambda rows=rows_read, counts=dict(self.counts): self._save_checkpoint(rows, counts))
+
+                    if total_rows:
+                        fraction = rows_read / total_rows
+                    else:
+                        # The CSV reader buffers ahead, so the file position slightly overestimates
+                        fraction = fileobj.tell() / file_size if file_size else 0.0
+                    self._record_progress(fraction)
+        except Exception as e:
+            logger.exception(f"Streaming ingestion of upload {self.upload.pk} failed")
+            self._set_status('failed')
+            return {'success': False, 'error': str(e), 'result': dict(self.counts)}
+
+        self._record_progress(1.0)
+        self._set_status('completed')
+        self._clear_checkpoint()
+        elapsed = time.perf_counter() - start_time
+        logger.info(f"Streamed upload {self.upload.pk}: {self.counts} in {elapsed:.1f}s")
+        return {'success': True, 'result': dict(self.counts), 'elapsed': elapsed}
+
+
+def process_upload(document_upload, chunksize=CHUNK_ROWS):
+    """Stream large supported uploads; small ones keep DataProcessor's full pipeline (insights, predictions)."""
+    size = document_upload.file_size or 0
+    if size > STREAMING_THRESHOLD_BYTES and document_upload.document_type in DOCUMENT_TYPES:
+        return HutanoStreamingIngestor(document_upload, chunksize).process_document()
+
+    from core.services.data_processor import DataProcessor
+    return DataProcessor(document_upload).process_document()
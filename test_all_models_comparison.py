@@ -21,6 +21,9 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from prediction.xgboost_forecasting import HutanoXGBoostForecaster
 from prediction.random_forest_forecasting import HutanoRandomForestForecaster
 from prediction.ensemble_forecasting import HutanoEnsembleForecaster
+from direct_forecasting import HutanoDirectXGBoostForecaster
+from backtesting import HutanoBacktester
+from forecast_metrics import forecast_metrics
 
 try:
     from prediction.prophet_forecasting import HutanoProphetForecaster
@@ -108,9 +111,8 @@ class ComprehensiveModelTester:
         actual = test_data['y'].values
         predicted = forecast['yhat'].values
         
-        rmse = np.sqrt(np.mean((actual - predicted) ** 2))
-        mae = np.mean(np.abs(actual - predicted))
-        mape = np.mean(np.abs((actual - predicted) / actual)) * 100
+        metrics = forecast_metrics(actual, predicted)
+        rmse, mae, mape = metrics['rmse'], metrics['mae'], metrics['mape']
         
         print(f"XGBoost Performance:")
         print(f"RMSE: {rmse:.4f}, MAE: {mae:.4f}, MAPE: {mape:.2f}%")
@@ -130,6 +132,53 @@ class ComprehensiveModelTester:
         self.models_tested.append('XGBoost')
         return forecaster, forecast
     
+    def test_direct_xgboost(self, hospital_id=1):
+        """Test direct multi-horizon XGBoost forecasting."""
+        print(f"\n{'='*50}")
+        print(f"TESTING DIRECT XGBOOST - Hospital {hospital_id}")
+        print(f"{'='*50}")
+        
+        data = self.create_sample_hospital_data(hospital_id)
+        train_size = int(len(data) * 0.8)
+        train_data = data.iloc[:train_size].copy()
+        test_data = data.iloc[train_size:].copy()
+        
+        forecaster = HutanoDirectXGBoostForecaster(
+            hospital_id=hospital_id, data_type='admissions', max_horizon=len(test_data), interval_width=0.8
+        )
+        
+        start_time = datetime.now()
+        model = forecaster.train_model(train_data, tune_hyperparameters=False)
+        training_time = (datetime.now() - start_time).total_seconds()
+        
+        forecast = forecaster.generate_forecast(train_data, periods=len(test_data))
+        
+        # Calculate metrics
+        actual = test_data['y'].values
+        predicted = forecast['yhat'].values
+        
+        metrics = forecast_metrics(actual, predicted, forecast['yhat_lower'], forecast['yhat_upper'])
+        rmse, mae, mape = metrics['rmse'], metrics['mae'], metrics['mape']
+        
+        print(f"Direct XGBoost Performance:")
+        print(f"RMSE: {rmse:.4f}, MAE: {mae:.4f}, MAPE: {mape:.2f}%")
+        print(f"80% interval coverage: {metrics['coverage'] * 100:.1f}%")
+        
+        self.results[f'direct_xgboost_h{hospital_id}'] = {
+            'model': 'Direct XGBoost',
+            'hospital': hospital_id,
+            'rmse': rmse,
+            'mae': mae,
+            'mape': mape,
+            'training_time': training_time,
+            'forecast': forecast,
+            'actual': test_data,
+            'feature_importance': forecaster.feature_importance.head(10)
+        }
+        
+        self.models_tested.append('Direct XGBoost')
+        return forecaster, forecast
+    
     def test_random_forest(self, hospital_id=1):
         """Test Random Forest forecasting."""
         print(f"\n{'='*50}")
@@ -153,9 +202,8 @@ class ComprehensiveModelTester:
         actual = test_data['y'].values
         predicted = forecast['yhat'].values
         
-        rmse = np.sqrt(np.mean((actual - predicted) ** 2))
-        mae = np.mean(np.abs(actual - predicted))
-        mape = np.mean(np.abs((actual - predicted) / actual)) * 100
+        metrics = forecast_metrics(actual, predicted)
+        rmse, mae, mape = metrics['rmse'], metrics['mae'], metrics['mape']
         
         print(f"Random Forest Performance:")
         print(f"RMSE: {rmse:.4f}, MAE: {mae:.4f}, MAPE: {mape:.2f}%")
@@ -198,9 +246,8 @@ class ComprehensiveModelTester:
         actual = test_data['y'].values
         predicted = forecast['yhat'].values
         
-        rmse = np.sqrt(np.mean((actual - predicted) ** 2))
-        mae = np.mean(np.abs(actual - predicted))
-        mape = np.mean(np.abs((actual - predicted) / actual)) * 100
+        metrics = forecast_metrics(actual, predicted)
+        rmse, mae, mape = metrics['rmse'], metrics['mae'], metrics['mape']
         
         print(f"Ensemble Performance:")
         print(f"RMSE: {rmse:.4f}, MAE: {mae:.4f}, MAPE: {mape:.2f}%")
@@ -354,6 +401,9 @@ class ComprehensiveModelTester:
             # Test XGBoost
             self.test_xgboost(hospital_id)
             
+            # Test direct multi-horizon XGBoost against the recursive one
+            self.test_direct_xgboost(hospital_id)
+            
             # Test Random Forest
             self.test_random_forest(hospital_id)
             
@@ -380,10 +430,32 @@ class ComprehensiveModelTester:
         print(f"Total test runs: {len(self.results)}")
         
         return comparison_df
+    
+    def run_backtest(self, hospital_ids=(1, 2), horizon=30):
+        """Rolling-origin backtest of all models instead of a single 80/20 split."""
+        print(f"\n{'='*70}")
+        print("ROLLING-ORIGIN BACKTEST")
+        print(f"{'='*70}")
+        
+        models = ['xgboost', 'random_forest', 'direct_xgboost', 'direct_random_forest']
+        if PROPHET_AVAILABLE:
+            models += ['prophet', 'ensemble']
+        
+        series = {hospital_id: self.create_sample_hospital_data(hospital_id) for hospital_id in hospital_ids}
+        backtester = HutanoBacktester(models, horizon=horizon, initial_train=180, step=horizon)
+        folds = backtester.run(series)
+        
+        print("\nBacktest Summary (mean over folds):")
+        print(backtester.summary(folds).to_string(float_format='%.4f'))
+        
+        return folds
 
 def main():
     """Main function to run comprehensive model comparison."""
     tester = ComprehensiveModelTester()
+    if '--backtest' in sys.argv:
+        return tester.run_backtest()
+    
     results = tester.run_comprehensive_test()
     
     print("\n🎯 KEY FINDINGS:")
@@ -27,6 +27,9 @@ django.setup()
 from django.contrib.auth.models import User
 from core.models import Hospital, PatientAdmission
 from prediction.models import PredictionModel, PatientAdmissionPrediction, ResourceDemandPrediction
+from prediction_writer import write_admission_predictions
+from forecast_metrics import forecast_metrics
+from daily_metrics import save_daily_metrics, load_daily_series
 
 # Import our forecasting modules
 from prediction.xgboost_forecasting import HutanoXGBoostForecaster
@@ -42,9 +45,10 @@ except ImportError:
 class CompleteSystemDemo:
     """Comprehensive demonstration of the HUTANO system."""
     
-    def __init__(self):
+    def __init__(self, create_patient_records=False):
         self.results = {}
         self.demo_hospital = None
+        self.create_patient_records = create_patient_records
         
     def check_database_connection(self):
         """Check if database is responding."""
@@ -122,33 +126,19 @@ class CompleteSystemDemo:
             df['ds'] = pd.to_datetime(df['date'])
             df['y'] = df['admissions']  # Use admissions as primary target
             
-            # Clear existing demo data
-            PatientAdmission.objects.filter(hospital=self.demo_hospital).delete()
-            print("✅ Cleared existing demo data")
+            # Store the daily aggregates the models read directly
+            created, updated = save_daily_metrics(self.demo_hospital.id, df)
+            print(f"✅ Saved {created + updated} daily metrics records ({created} new)")
             
-            # Create admission records
-            admission_count = 0
-            for _, row in df.iterrows():
-                date = pd.to_datetime(row['date']).date()
-                admissions = int(row['admissions'])
-                
-                # Create individual admission records
-                for i in range(admissions):
-                    PatientAdmission.objects.create(
-                        hospital=self.demo_hospital,
-                        admission_date=date,
-                        patient_name=f"Demo Patient {admission_count + i + 1}",
-                        patient_age=np.random.randint(18, 80),
-                        diagnosis=f"Demo Diagnosis {(admission_count + i) % 10 + 1}",
-                        admission_type='emergency' if i % 3 == 0 else 'elective'
-                    )
-                
-                admission_count += admissions
-            
-            print(f"✅ Created {admission_count} patient admission records")
+            if self.create_patient_records:
+                # Patient-level rows only on request (--patient-records)
+                PatientAdmission.objects.filter(hospital=self.demo_hospital).delete()
+                print("✅ Cleared existing demo data")
+                admission_count = self.create_patient_admissions(df)
+                print(f"✅ Created {admission_count} patient admission records")
             
-            # Save processed data for models
-            model_data = df[['ds', 'y']].copy()
+            # Models read the daily series straight from the aggregates
+            model_data = load_daily_series(self.demo_hospital.id, 'admissions')
             model_data.to_csv('demo_admissions_data.csv', index=False)
             print("✅ Saved processed data for models")
             
@@ -160,6 +150,26 @@ class CompleteSystemDemo:
             traceback.print_exc()
             return False
     
+    def create_patient_admissions(self, df):
+        """Individual PatientAdmission rows matching the daily admission counts, in bulk."""
+        counts = df['admissions'].astype(int).to_numpy()
+        dates = np.repeat(pd.to_datetime(df['date']).dt.date.to_numpy(), counts)
+        ages = np.random.randint(18, 80, size=len(dates))
+        day_index = np.arange(len(dates)) - np.repeat(np.cumsum(counts) - counts, counts)
+        
+        PatientAdmission.objects.bulk_create([
+            PatientAdmission(
+                hospital=self.demo_hospital,
+                admission_date=date,
+                patient_name=f"Demo Patient {n + 1}",
+                patient_age=int(age),
+                diagnosis=f"Demo Diagnosis {n % 10 + 1}",
+                admission_type='emergency' if i % 3 == 0 else 'elective'
+            )
+            for n, (date, age, i) in enumerate(zip(dates, ages, day_index))
+        ], batch_size=1000)
+        return len(dates)
+    
     def test_all_models(self, data):
         """Test all 5 models with the loaded data."""
         print("\n🤖 TESTING ALL MODELS")
@@ -203,9 +213,8 @@ class CompleteSystemDemo:
                 actual = test_data['y'].values
                 predicted = forecast['yhat'].values
                 
-                rmse = np.sqrt(np.mean((actual - predicted) ** 2))
-                mae = np.mean(np.abs(actual - predicted))
-                mape = np.mean(np.abs((actual - predicted) / actual)) * 100
+                metrics = forecast_metrics(actual, predicted)
+                rmse, mae, mape = metrics['rmse'], metrics['mae'], metrics['mape']
                 
                 # Store results
                 self.results[model_name] = {
@@ -250,26 +259,15 @@ class CompleteSystemDemo:
                     }
                 )
                 
-                # Clear existing predictions
-                PatientAdmissionPrediction.objects.filter(
-                    hospital=self.demo_hospital,
-                    prediction_model=model_obj
-                ).delete()
-                
-                # Save new predictions
-                forecast = result['forecast']
-                for _, row in forecast.iterrows():
-                    prediction_date = row['ds'].date()
-                    PatientAdmissionPrediction.objects.create(
-                        hospital=self.demo_hospital,
-                        prediction_model=model_obj,
-                        prediction_date=prediction_date,
-                        predicted_admissions=int(row['yhat']),
-                        confidence_interval_lower=int(row['yhat'] * 0.8),
-                        confidence_interval_upper=int(row['yhat'] * 1.2)
-                    )
+                # Replace existing predictions in a single transaction
+                forecast = result['forecast'].assign(
+                    yhat_lower=lambda df: df['yhat'] * 0.8,
+                    yhat_upper=lambda df: df['yhat'] * 1.2
+                )
+                write_result = write_admission_predictions(self.demo_hospital, model_obj, forecast)
                 
-                print(f"✅ Saved {len(forecast)} predictions for {model_name}")
+                print(f"✅ Saved {write_result['rows_written']} predictions for {model_name} "
+                      f"in {write_result['elapsed']:.2f}s")
             
             return True
             
@@ -449,7 +447,7 @@ class CompleteSystemDemo:
 
 def main():
     """Main function to run the complete demo."""
-    demo = CompleteSystemDemo()
+    demo = CompleteSystemDemo(create_patient_records='--patient-records' in sys.argv)
     success = demo.run_complete_demo()
     
     if success:
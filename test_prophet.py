@@ -3,10 +3,11 @@ Script to test Prophet forecasting directly.
 """
 import os
 import sys
-import pandas as pd
 from prophet import Prophet
 import matplotlib.pyplot as plt
 
+from series_store import DATA_DIR, read_series, series_path
+
 # Enable verbose output
 print("Starting Prophet test script...")
 print(f"Python version: {sys.version}")
@@ -18,7 +19,7 @@ except Exception as e:
     print(f"Error importing prophet package: {e}")
 
 # Set up paths
-data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prediction', 'data')
+data_dir = DATA_DIR
 output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prediction', 'forecasts')
 os.makedirs(output_dir, exist_ok=True)
 
@@ -27,18 +28,14 @@ hospital_id = 1
 data_type = 'admissions'
 
 # Load data
-data_file = os.path.join(data_dir, f'{data_type}_{hospital_id}_processed.csv')
+data_file = series_path(hospital_id, data_type)
 print(f"Loading data from {data_file}")
-print(f"File exists: {os.path.exists(data_file)}")
+data = read_series(hospital_id, data_type)
+print(f"Series exists: {data is not None}")
 
-if os.path.exists(data_file):
-    # Load the data
-    data = pd.read_csv(data_file)
+if data is not None:
     print(f"Loaded {len(data)} records")
 
-    # Ensure date column is in datetime format
-    data['ds'] = pd.to_datetime(data['ds'])
-
     # Create and train Prophet model
     model = Prophet(
         yearly_seasonality=True,
@@ -8,9 +8,13 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from prophet import Prophet
 import numpy as np
+import time
+
+from prophet_fast import HutanoFastProphetPredictor
+from series_store import DATA_DIR, read_series, series_path
 
 # Set up paths
-data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prediction', 'data')
+data_dir = DATA_DIR
 output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prediction', 'forecasts')
 os.makedirs(output_dir, exist_ok=True)
 
@@ -19,19 +23,16 @@ hospital_id = 1
 data_type = 'admissions'
 
 # Load data
-data_file = os.path.join(data_dir, f'{data_type}_{hospital_id}_processed.csv')
+data_file = series_path(hospital_id, data_type)
 print(f"Loading data from {data_file}")
-print(f"File exists: {os.path.exists(data_file)}")
+data = read_series(hospital_id, data_type)
+print(f"Series exists: {data is not None}")
 
-if os.path.exists(data_file):
-    # Load the data
-    data = pd.read_csv(data_file)
+if data is not None:
     print(f"Loaded {len(data)} records")
     print(f"First 5 rows: {data.head()}")
     print(f"Data types: {data.dtypes}")
     
-    # Ensure date column is in datetime format
-    data['ds'] = pd.to_datetime(data['ds'])
     print(f"Data range: {data['ds'].min()} to {data['ds'].max()}")
     print(f"Value range: min={data['y'].min()}, max={data['y'].max()}, mean={data['y'].mean()}")
     
@@ -63,6 +64,18 @@ if os.path.exists(data_file):
     print("Future predictions:")
     print(forecast.tail(5)[['ds', 'yhat', 'yhat_lower', 'yhat_upper']])
     
+    # Compare with fast future-only prediction
+    print("Timing full vs fast prediction...")
+    start = time.perf_counter()
+    model.predict(future)
+    full_time = time.perf_counter() - start
+    predictor = HutanoFastProphetPredictor(model)
+    start = time.perf_counter()
+    fast_forecast = predictor.predict(periods=periods)
+    fast_time = time.perf_counter() - start
+    print(f"Full predict: {full_time:.3f}s, fast predict: {fast_time:.3f}s")
+    print(f"Max yhat difference: {np.abs(fast_forecast['yhat'].values - forecast['yhat'].tail(periods).values).max():.6f}")
+    
     # Save forecast plot
     print("Generating forecast plot...")
     fig = model.plot(forecast)
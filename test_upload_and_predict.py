@@ -21,7 +21,8 @@ django.setup()
 
 from django.contrib.auth.models import User
 from core.models import Hospital, DocumentUpload
-from core.services.data_processor import DataProcessor
+from streaming_ingestion import process_upload
+from upload_dedup import process_once
 
 def test_upload_and_prediction():
     """Test the complete upload and prediction workflow"""
@@ -42,6 +43,15 @@ def test_upload_and_prediction():
     )
     print(f"✅ Hospital: {hospital.name} (ID: {hospital.id})")
 
+    # New hospitals have no history yet; borrow forecasts from similar hospitals
+    try:
+        from cold_start import cold_start_forecast
+        forecast, neighbours = cold_start_forecast(hospital, 'bed_occupancy')
+        print(f"✅ Cold-start bed occupancy forecast from hospitals {neighbours}: "
+              f"{forecast['yhat'].mean():.1f} beds/day")
+    except (ImportError, ValueError) as e:
+        print(f"⚠️ No cold-start forecast: {e}")
+
     # Step 2: Get or create test user
     print("\n2️⃣ Setting up test user...")
     user, created = User.objects.get_or_create(
@@ -93,11 +103,21 @@ def test_upload_and_prediction():
 
     print(f"✅ Upload record created: ID {document_upload.id}")
 
+    if '--queue' in sys.argv:
+        # What the upload view does: leave the upload pending for the background workers
+        from upload_worker import enqueue_upload
+        enqueue_upload(document_upload)
+        print("✅ Upload queued; run 'python upload_worker.py --once' to process it")
+        return True
+
     # Step 5: Process the document
     print("\n5️⃣ Processing document...")
     try:
-        processor = DataProcessor(document_upload)
-        result = processor.process_document()
+        # Large exports are streamed in chunks; small files get the full DataProcessor pipeline.
+        # Re-uploads of an already processed file return the earlier result.
+        result = process_once(document_upload, process_upload)
+        if result.get('duplicate_of'):
+            print(f"♻️ Same file already processed as upload {result['duplicate_of']}; reusing its results")
 
         if result['success']:
             print("✅ Document processing: SUCCESS")
@@ -20,6 +20,7 @@ django.setup()
 
 from prediction.xgboost_forecasting import HutanoXGBoostForecaster
 from prediction.ensemble_forecasting import HutanoEnsembleForecaster
+from forecast_metrics import forecast_metrics
 
 try:
     from prediction.prophet_forecasting import HutanoProphetForecaster
@@ -128,9 +129,8 @@ class XGBoostIntegrationTester:
         actual = test_data['y'].values
         predicted = forecast['yhat'].values
         
-        rmse = np.sqrt(np.mean((actual - predicted) ** 2))
-        mae = np.mean(np.abs(actual - predicted))
-        mape = np.mean(np.abs((actual - predicted) / actual)) * 100
+        metrics = forecast_metrics(actual, predicted)
+        rmse, mae, mape = metrics['rmse'], metrics['mae'], metrics['mape']
         
         print(f"\nXGBoost Performance:")
         print(f"RMSE: {rmse:.4f}")
@@ -193,9 +193,8 @@ class XGBoostIntegrationTester:
         actual = test_data['y'].values
         predicted = forecast['yhat'].values
         
-        rmse = np.sqrt(np.mean((actual - predicted) ** 2))
-        mae = np.mean(np.abs(actual - predicted))
-        mape = np.mean(np.abs((actual - predicted) / actual)) * 100
+        metrics = forecast_metrics(actual, predicted)
+        rmse, mae, mape = metrics['rmse'], metrics['mae'], metrics['mape']
         
         print(f"\nEnsemble Performance:")
         print(f"RMSE: {rmse:.4f}")
@@ -0,0 +1,160 @@
+"""
+HUTANO Upload Deduplication
+Skips reprocessing of files that have already been processed.
+
+Users re-upload the same sample_hospital_data.csv or monthly export again
+and again, and every upload used to be parsed, stored and trained on from
+scratch. Each upload's content is hashed (SHA-256, streamed in blocks so
+large files are never held in memory) and looked up in an index of
+processed files per (hospital, document_type). A repeat returns the
+original upload's processing result together with the ids of the
+hospital's stored predictions.
+
+An entry is only trusted while the file's data is still what is stored:
+
+- processing any other file of the same hospital and document type drops
+  the entries of that type (the new file may overwrite the same dates),
+- an entry whose hospital now has fewer stored rows than when it was
+  recorded (e.g. after a demo reset) is dropped on lookup.
+
+The index is one small JSON file per processed file, so concurrent upload
+workers never rewrite a shared index.
+
+Usage:
+    result = process_once(document_upload, process_upload)
+
+    index = HutanoUploadIndex()
+    previous = index.lookup(hospital_id, 'daily_metrics', hash_upload(document_upload))
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prediction', 'upload_index')
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_sha256(fileobj, block_size=HASH_BLOCK_SIZE):
+    """Hex SHA-256 of a binary file object, read in blocks."""
+    digest = hashlib.sha256()
+    for block in iter(lambda: fileobj.read(block_size), b''):
+        digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_upload(document_upload):
+    """Content hash of a DocumentUpload's stored file."""
+    with document_upload.file.open('rb') as fileobj:
+        return file_sha256(fileobj)
+
+
+def stored_row_count(hospital_id, document_type):
+    """Rows of the model a document type is ingested into for a hospital, or None for other types."""
+    from django.apps import apps
+    from streaming_ingestion import DOCUMENT_TYPES
+
+    if document_type not in DOCUMENT_TYPES:
+        return None
+    return apps.get_model('core', DOCUMENT_TYPES[document_type][0]).objects.filter(hospital_id=hospital_id).count()
+
+
+def prediction_ids(hospital_id):
+    """Ids of a hospital's stored admission and resource predictions."""
+    from prediction.models import PatientAdmissionPrediction, ResourceDemandPrediction
+
+    return {
+        'admission_prediction_ids': list(PatientAdmissionPrediction.objects.filter(
+            hospital_id=hospital_id).values_list('id', flat=True)),
+        'resource_prediction_ids': list(ResourceDemandPrediction.objects.filter(
+            hospital_id=hospital_id).values_list('id', flat=True)),
+    }
+
+
+class HutanoUploadIndex:
+    """Processed-file records keyed on (hospital, document_type, content hash)."""
+
+    def __init__(self, index_dir=UPLOAD_INDEX_DIR):
+        self.index_dir = index_dir
+        os.makedirs(self.index_dir, exist_ok=True)
+
+    def _path(self, hospital_id, document_type, digest):
+        return os.path.join(self.index_dir, f"{document_type}_{hospital_id}_{digest}.json")
+
+    def lookup(self, hospital_id, document_type, digest):
+        """
+        Record of the earlier processing of this content ({'upload_id', 'result', ...}),
+        or None if there is none or its data is no longer stored.
+        """
+        path = self._path(hospital_id, document_type, digest)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        recorded_rows = entry.get('stored_rows')
+        if recorded_rows is not None and stored_row_count(hospital_id, document_type) < recorded_rows:
+            logger.info(f"Stored {document_type} rows of hospital {hospital_id} were removed since upload "
+                        f"{entry['upload_id']}; it will be processed again")
+            self._remove(path)
+            return None
+        return entry
+
+    def invalidate(self, hospital_id, document_type):
+        """Drop every entry of a hospital and document type, before another file of that type is processed."""
+        prefix = f"{document_type}_{hospital_id}_"
+        for entry in os.scandir(self.index_dir):
+            if entry.name.startswith(prefix) and entry.name.endswith('.json'):
+                self._remove(entry.path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def record(self, document_upload, digest, result):
+        """Remember a successfully processed upload and its result."""
+        path = self._path(document_upload.hospital_id, document_upload.document_type, digest)
+        entry = {
+            'upload_id': document_upload.pk,
+            'original_filename': document_upload.original_filename,
+            'sha256': digest,
+            'result': result,
+            'stored_rows': stored_row_count(document_upload.hospital_id, document_upload.document_type),
+            'processed_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f, indent=2, default=str)
+        os.replace(tmp_path, path)
+
+
+def process_once(document_upload, process, index=None):
+    """
+    Run process(document_upload) unless the same content was already
+    processed for this hospital and document type, in which case the
+    earlier result is returned with 'duplicate_of' and the ids of the
+    hospital's stored predictions ('predictions') set.
+    """
+    index = index or HutanoUploadIndex()
+    hospital_id, document_type = document_upload.hospital_id, document_upload.document_type
+    digest = hash_upload(document_upload)
+    previous = index.lookup(hospital_id, document_type, digest)
+    if previous is not None:
+        logger.info(f"Upload {document_upload.pk} duplicates upload {previous['upload_id']}; not reprocessing")
+        type(document_upload).objects.filter(pk=document_upload.pk).update(processing_status='completed')
+        return {**previous['result'], 'duplicate_of': previous['upload_id'],
+                'predictions': prediction_ids(hospital_id)}
+
+    # This file may overwrite what earlier files of the same type stored
+    index.invalidate(hospital_id, document_type)
+    result = process(document_upload)
+    if result.get('success'):
+        index.record(document_upload, digest, result)
+    return result
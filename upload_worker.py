@@ -0,0 +1,302 @@
+"""
+HUTANO Upload Worker
+Database-backed job queue that processes uploads outside the web request.
+
+The upload view used to parse the file, create the patient records, train
+the models and save their predictions inside one HTTP request, which blocks
+request threads and times out behind nginx. Now the view only saves the
+DocumentUpload with processing_status='pending' (see enqueue_upload) and
+returns. Worker processes poll the table for pending uploads:
+
+- a worker claims an upload with a conditional UPDATE
+  (pending -> processing), so several workers never process the same
+  upload twice and no broker is needed,
+- a claimed upload holds a lease file that its worker renews while it runs;
+  uploads left in 'processing' by a crashed or killed worker (e.g. on a
+  deploy restart) are put back to 'pending' once their lease expires,
+- each upload runs as a pipeline of stages: ingest (streamed for large
+  files), then forecast (only the series the drift monitor flags),
+- the status ends as 'completed' or 'failed'; a failed stage (or an
+  unreadable file) stops the pipeline and the error is logged,
+- uploads whose content was already processed for the same hospital and
+  document type are completed without running any stage.
+
+Leases and the deduplication index are files under prediction/, so all
+workers must run on one machine (or share that directory).
+
+Usage:
+    python upload_worker.py --workers 4          # run until interrupted
+    python upload_worker.py --once               # drain the queue and exit
+"""
+import os
+import time
+import signal
+import logging
+import threading
+import argparse
+import multiprocessing
+
+from forecast_runner import PREDICTION_MODELS, ForecastJob, setup_django
+from upload_dedup import HutanoUploadIndex, hash_upload, prediction_ids
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 5  # seconds between polls of an empty queue
+CLAIM_BATCH = 10  # pending uploads read per poll; each one is still claimed individually
+LEASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prediction', 'upload_leases')
+LEASE_SECONDS = 300  # a lease not renewed for this long belongs to a dead worker
+
+
+def enqueue_upload(document_upload):
+    """Queue an upload for the workers; the caller returns without processing it."""
+    type(document_upload).objects.filter(pk=document_upload.pk).update(processing_status='pending')
+    document_upload.processing_status = 'pending'
+    return document_upload
+
+
+def ingest_stage(document_upload):
+    """Parse and store the uploaded file."""
+    from streaming_ingestion import process_upload
+
+    result = process_upload(document_upload)
+    if not result.get('success'):
+        raise RuntimeError(result.get('error', 'Processing failed'))
+    return result.get('result')
+
+
+def forecast_stage(document_upload):
+    """Refresh the forecasts of the uploading hospital's series that drifted."""
+    from capacity_constraints import CAPACITY_BOUNDED, load_bed_capacities
+    from drift_detection import HutanoDriftMonitor
+    from forecast_runner import prophet_forecast_job, save_resource_predictions
+
+    hospital_id = document_upload.hospital_id
+    monitor = HutanoDriftMonitor()
+    drifted = [data_type for _, data_type in monitor.scan([hospital_id], list(PREDICTION_MODELS))]
+    cap = load_bed_capacities([hospital_id]).get(hospital_id)
+
+    refreshed = []
+    for data_type in drifted:
+        job = ForecastJob(hospital_id, data_type, cap=cap if data_type in CAPACITY_BOUNDED else None)
+        try:
+            forecast = prophet_forecast_job(job)
+        except FileNotFoundError:
+            continue
+        save_resource_predictions(job, forecast)
+        monitor.mark_retrained(hospital_id, data_type)
+        refreshed.append(data_type)
+    monitor.save()
+    return refreshed
+
+
+STAGES = [
+    ('ingest', ingest_stage),
+    ('forecast', forecast_stage),
+]
+
+
+def _lease_path(pk):
+    return os.path.join(LEASE_DIR, f"{pk}.lease")
+
+
+def renew_lease(pk):
+    """Create or refresh the lease of an upload."""
+    path = _lease_path(pk)
+    with open(path, 'a'):
+        pass
+    os.utime(path)
+
+
+def release_lease(pk):
+    try:
+        os.remove(_lease_path(pk))
+    except FileNotFoundError:
+        pass
+
+
+class _LeaseHeartbeat(threading.Thread):
+    """Renews an upload's lease in the background while its stages run."""
+
+    def __init__(self, pk):
+        super().__init__(daemon=True)
+        self.pk = pk
+        self.finished = threading.Event()
+
+    def run(self):
+        while not self.finished.wait(LEASE_SECONDS / 3):
+            try:
+                renew_lease(self.pk)
+            except OSError as e:
+                logger.warning(f"Could not renew lease of upload {self.pk}: {e}")
+
+    def stop(self):
+        self.finished.set()
+        self.join()
+
+
+class HutanoUploadWorker:
+    """Claims pending DocumentUpload rows and runs them through the pipeline stages."""
+
+    def __init__(self, worker_id=0, stages=STAGES, poll_interval=POLL_INTERVAL):
+        setup_django()
+        from core.models import DocumentUpload
+
+        self.model = DocumentUpload
+        self.worker_id = worker_id
+        self.stages = stages
+        self.poll_interval = poll_interval
+        self.index = HutanoUploadIndex()
+        self.stopping = False
+        os.makedirs(LEASE_DIR, exist_ok=True)
+
+    def claim(self):
+        """Claim the oldest pending upload, or return None. Safe with concurrent workers."""
+        pending = self.model.objects.filter(processing_status='pending').order_by('pk')
+        for pk in pending.values_list('pk', flat=True)[:CLAIM_BATCH]:
+            # The lease exists before the claim, so a claimed upload is never without one
+            renew_lease(pk)
+            # Only one worker's UPDATE can match the row while it is still pending
+            if self.model.objects.filter(pk=pk, processing_status='pending').update(processing_status='processing'):
+                return self.model.objects.get(pk=pk)
+        return None
+
+    def reclaim_expired(self):
+        """Put uploads whose worker died back in the queue; returns how many."""
+        reclaimed = 0
+        for pk in self.model.objects.filter(processing_status='processing').values_list('pk', flat=True):
+            try:
+                age = time.time() - os.path.getmtime(_lease_path(pk))
+            except FileNotFoundError:
+                # Not claimed by a worker (e.g. processed inside a request)
+                continue
+            if age > LEASE_SECONDS and self.model.objects.filter(
+                    pk=pk, processing_status='processing').update(processing_status='pending'):
+                logger.warning(f"Worker {self.worker_id}: lease of upload {pk} expired {age:.0f}s ago; requeued")
+                reclaimed += 1
+        return reclaimed
+
+    def _set_status(self, upload, status):
+        self.model.objects.filter(pk=upload.pk).update(processing_status=status)
+
+    def process(self, upload):
+        """Run every stage for one claimed upload, renewing its lease; returns True if all succeeded."""
+        heartbeat = _LeaseHeartbeat(upload.pk)
+        heartbeat.start()
+        try:
+            succeeded = self._process(upload)
+        finally:
+            heartbeat.stop()
+        # An upload an error left in 'processing' keeps its lease, so it is requeued when the lease expires
+        release_lease(upload.pk)
+        return succeeded
+
+    def _process(self, upload):
+        start_time = time.perf_counter()
+        try:
+            digest = hash_upload(upload)
+            previous = self.index.lookup(upload.hospital_id, upload.document_type, digest)
+        except Exception:
+            logger.exception(f"Worker {self.worker_id}: could not read upload {upload.pk}")
+            self._set_status(upload, 'failed')
+            return False
+        if previous is not None:
+            self._set_status(upload, 'completed')
+            predictions = prediction_ids(upload.hospital_id)
+            logger.info(f"Worker {self.worker_id}: upload {upload.pk} duplicates upload "
+                        f"{previous['upload_id']}; reusing its results and "
+                        f"{sum(len(ids) for ids in predictions.values())} stored predictions")
+            return True
+
+        # This file may overwrite what earlier files of the same type stored
+        self.index.invalidate(upload.hospital_id, upload.document_type)
+        results = {}
+        for name, stage in self.stages:
+            stage_start = time.perf_counter()
+            # Stages such as DataProcessor may mark the upload finished; it stays in progress until the last one
+            self._set_status(upload, 'processing')
+            try:
+                result = stage(upload)
+            except Exception:
+                logger.exception(f"Worker {self.worker_id}: upload {upload.pk} failed in stage '{name}'")
+                self._set_status(upload, 'failed')
+                return False
+            results[name] = result
+            upload.refresh_from_db()
+            logger.info(f"Worker {self.worker_id}: upload {upload.pk} {name} done in "
+                        f"{time.perf_counter() - stage_start:.1f}s: {result}")
+
+        self._set_status(upload, 'completed')
+        try:
+            self.index.record(upload, digest, {'success': True, 'stages': results})
+        except Exception as e:
+            # The upload is processed; a repeat of it just will not be recognized
+            logger.warning(f"Worker {self.worker_id}: could not index upload {upload.pk}: {e}")
+        logger.info(f"Worker {self.worker_id}: upload {upload.pk} completed in "
+                    f"{time.perf_counter() - start_time:.1f}s")
+        return True
+
+    def run(self, once=False):
+        """Process uploads until stopped (or until the queue is empty with once=True)."""
+        processed = 0
+        while not self.stopping:
+            try:
+                upload = self.claim()
+                if upload is None and self.reclaim_expired():
+                    upload = self.claim()
+                if upload is None:
+                    if once:
+                        break
+                    time.sleep(self.poll_interval)
+                    continue
+                self.process(upload)
+                processed += 1
+            except Exception:
+                # A database outage or similar must not end the worker; its claims are reclaimed by lease
+                logger.exception(f"Worker {self.worker_id}: error in the polling loop")
+                if once:
+                    break
+                time.sleep(self.poll_interval)
+        return processed
+
+    def stop(self, *args):
+        self.stopping = True
+
+
+def _worker_main(worker_id, once):
+    """Entry point of one worker process."""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    worker = HutanoUploadWorker(worker_id)
+    signal.signal(signal.SIGTERM, worker.stop)
+    try:
+        worker.run(once=once)
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    """Start upload worker processes."""
+    parser = argparse.ArgumentParser(description="Process queued HUTANO uploads")
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--once', action='store_true', help="Exit when the queue is empty")
+    args = parser.parse_args()
+
+    if args.workers == 1:
+        _worker_main(0, args.once)
+        return
+
+    # Django connections must not be shared across processes; each worker sets up its own
+    processes = [multiprocessing.Process(target=_worker_main, args=(i, args.once)) for i in range(args.workers)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()